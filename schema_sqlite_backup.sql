@@ -1,4 +1,5 @@
--- Create all tables with SQLite compatible syntax
+-- SQLite version of src/db/schema.sql, used by DB_BACKEND=sqlite.
+-- Keep the two in step: same tables, columns, unique keys and indexes.
 PRAGMA foreign_keys = OFF;
 
 -- output1_url
@@ -9,7 +10,7 @@ CREATE TABLE IF NOT EXISTS output1_url (
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    passID TEXT NOT NULL,
     pageTypeID TEXT NOT NULL,
     time_stamp TEXT NOT NULL,
     unixTime INTEGER NOT NULL,
@@ -17,12 +18,13 @@ CREATE TABLE IF NOT EXISTS output1_url (
     url TEXT NOT NULL,
     pageTitle TEXT NOT NULL
 );
+CREATE INDEX IF NOT EXISTS idx_output1_url_sid_uid_page ON output1_url (sid, uid, pageTypeID);
 
 -- tb1_user
 CREATE TABLE IF NOT EXISTS tb1_user (
     uid INTEGER PRIMARY KEY AUTOINCREMENT,
     sid TEXT NOT NULL,
-    topIDorder TEXT,
+    topIDorder TEXT DEFAULT NULL,
     subtopIDorder TEXT NOT NULL,
     conIDorder TEXT NOT NULL,
     taskDone INTEGER NOT NULL,
@@ -30,12 +32,14 @@ CREATE TABLE IF NOT EXISTS tb1_user (
     signedConsent TEXT NOT NULL,
     signedDate TEXT NOT NULL
 );
+CREATE INDEX IF NOT EXISTS idx_user_sid ON tb1_user (sid);
 
 -- tb2_topic
 CREATE TABLE IF NOT EXISTS tb2_topic (
-    topID TEXT PRIMARY KEY,
+    topID TEXT NOT NULL,
     topTitle TEXT NOT NULL,
-    topIdeasBonusWords TEXT NOT NULL
+    topIdeasBonusWords TEXT NOT NULL,
+    PRIMARY KEY (topID)
 );
 
 -- tb3_subtopic
@@ -43,12 +47,6 @@ CREATE TABLE IF NOT EXISTS tb3_subtopic (
     subtopID TEXT NOT NULL,
     topID TEXT NOT NULL,
     subtopTitle TEXT NOT NULL,
-    subtopQuesOne TEXT NOT NULL,
-    subtopAnsOne TEXT NOT NULL,
-    subtopQuesTwo TEXT NOT NULL,
-    subtopAnsTwo TEXT NOT NULL,
-    subtopQuesThr TEXT NOT NULL,
-    subtopAnsThr TEXT NOT NULL,
     PRIMARY KEY (subtopID, topID)
 );
 
@@ -57,7 +55,7 @@ CREATE TABLE IF NOT EXISTS tb4_passage (
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    passID TEXT NOT NULL,
     passOrder TEXT NOT NULL,
     passTitle TEXT NOT NULL,
     passText TEXT NOT NULL,
@@ -72,13 +70,15 @@ CREATE TABLE IF NOT EXISTS tb5_passQop (
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    passID TEXT NOT NULL,
     passOrder TEXT NOT NULL,
     c1Ans INTEGER NOT NULL,
     c2Ans INTEGER NOT NULL DEFAULT 0,
     c3Ans INTEGER NOT NULL DEFAULT 0,
+    c4Ans INTEGER NOT NULL DEFAULT 0,
     passRT INTEGER NOT NULL DEFAULT 0
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_passqop ON tb5_passQop (uid, sid, passID);
 
 -- tb6_taskTime
 CREATE TABLE IF NOT EXISTS tb6_taskTime (
@@ -91,6 +91,7 @@ CREATE TABLE IF NOT EXISTS tb6_taskTime (
     timeStartStamp TEXT NOT NULL,
     timeEndStamp TEXT NOT NULL
 );
+CREATE INDEX IF NOT EXISTS idx_tasktime_uid_sid_top ON tb6_taskTime (uid, sid, topID, timeStart);
 
 -- tb7_topicSummary
 CREATE TABLE IF NOT EXISTS tb7_topicSummary (
@@ -121,8 +122,8 @@ CREATE TABLE IF NOT EXISTS tb9_topicBonus (
     quesID TEXT NOT NULL,
     quesAns TEXT NOT NULL,
     bonusWord TEXT NOT NULL,
-    bonusWordCnt INTEGER DEFAULT 0,
-    bonusMoney REAL DEFAULT 0.00
+    bonusWordCnt INTEGER NOT NULL DEFAULT 0,
+    bonusMoney REAL NOT NULL DEFAULT 0.00
 );
 
 -- tb10_subtopQos
@@ -154,58 +155,69 @@ CREATE TABLE IF NOT EXISTS tb11_profile (
     edu TEXT NOT NULL,
     natEng TEXT NOT NULL,
     firLan TEXT NOT NULL,
-    ageEng TEXT NOT NULL,
+    reading TEXT NOT NULL DEFAULT '',
+    writing TEXT NOT NULL DEFAULT '',
     hisLat TEXT NOT NULL,
     race TEXT NOT NULL,
-    lc1 TEXT DEFAULT '',
-    lc2 TEXT DEFAULT '',
-    lc3 TEXT DEFAULT '',
-    lc4 TEXT DEFAULT '',
-    lc5 TEXT DEFAULT '',
-    lc6 TEXT DEFAULT '',
-    lc7 TEXT DEFAULT '',
-    lc8 TEXT DEFAULT '',
-    lc9 TEXT DEFAULT '',
-    lc10 TEXT DEFAULT '',
-    lcOneScore REAL DEFAULT 0.0,
-    lcOneRT INTEGER DEFAULT 0,
-    lc11 TEXT DEFAULT '',
-    lc12 TEXT DEFAULT '',
-    lc13 TEXT DEFAULT '',
-    lc14 TEXT DEFAULT '',
-    lc15 TEXT DEFAULT '',
-    lc16 TEXT DEFAULT '',
-    lc17 TEXT DEFAULT '',
-    lc18 TEXT DEFAULT '',
-    lc19 TEXT DEFAULT '',
-    lc20 TEXT DEFAULT '',
-    lcTwoScore REAL DEFAULT 0.0,
-    lcTwoRT INTEGER DEFAULT 0,
-    voc1 TEXT DEFAULT '',
-    voc2 TEXT DEFAULT '',
-    voc3 TEXT DEFAULT '',
-    voc4 TEXT DEFAULT '',
-    voc5 TEXT DEFAULT '',
-    voc6 TEXT DEFAULT '',
-    voc7 TEXT DEFAULT '',
-    voc8 TEXT DEFAULT '',
-    voc9 TEXT DEFAULT '',
-    voc10 TEXT DEFAULT '',
-    voc11 TEXT DEFAULT '',
-    voc12 TEXT DEFAULT '',
-    voc13 TEXT DEFAULT '',
-    voc14 TEXT DEFAULT '',
-    voc15 TEXT DEFAULT '',
-    vocScore REAL DEFAULT 0.0
+    lc1 TEXT NOT NULL DEFAULT '',
+    lc2 TEXT NOT NULL DEFAULT '',
+    lc3 TEXT NOT NULL DEFAULT '',
+    lc4 TEXT NOT NULL DEFAULT '',
+    lc5 TEXT NOT NULL DEFAULT '',
+    lc6 TEXT NOT NULL DEFAULT '',
+    lc7 TEXT NOT NULL DEFAULT '',
+    lc8 TEXT NOT NULL DEFAULT '',
+    lc9 TEXT NOT NULL DEFAULT '',
+    lc10 TEXT NOT NULL DEFAULT '',
+    lcOneScore REAL NOT NULL DEFAULT 0.0,
+    lcOneRT INTEGER NOT NULL DEFAULT 0,
+    lc11 TEXT NOT NULL DEFAULT '',
+    lc12 TEXT NOT NULL DEFAULT '',
+    lc13 TEXT NOT NULL DEFAULT '',
+    lc14 TEXT NOT NULL DEFAULT '',
+    lc15 TEXT NOT NULL DEFAULT '',
+    lc16 TEXT NOT NULL DEFAULT '',
+    lc17 TEXT NOT NULL DEFAULT '',
+    lc18 TEXT NOT NULL DEFAULT '',
+    lc19 TEXT NOT NULL DEFAULT '',
+    lc20 TEXT NOT NULL DEFAULT '',
+    lcTwoScore REAL NOT NULL DEFAULT 0.0,
+    lcTwoRT INTEGER NOT NULL DEFAULT 0,
+    voc1 TEXT NOT NULL DEFAULT '',
+    voc2 TEXT NOT NULL DEFAULT '',
+    voc3 TEXT NOT NULL DEFAULT '',
+    voc4 TEXT NOT NULL DEFAULT '',
+    voc5 TEXT NOT NULL DEFAULT '',
+    voc6 TEXT NOT NULL DEFAULT '',
+    voc7 TEXT NOT NULL DEFAULT '',
+    voc8 TEXT NOT NULL DEFAULT '',
+    voc9 TEXT NOT NULL DEFAULT '',
+    voc10 TEXT NOT NULL DEFAULT '',
+    voc11 TEXT NOT NULL DEFAULT '',
+    voc12 TEXT NOT NULL DEFAULT '',
+    voc13 TEXT NOT NULL DEFAULT '',
+    voc14 TEXT NOT NULL DEFAULT '',
+    voc15 TEXT NOT NULL DEFAULT '',
+    vocScore REAL NOT NULL DEFAULT 0.0,
+    -- Prior knowledge per-topic ratings (1-7)
+    pk_bone_grafts TEXT NOT NULL DEFAULT '',
+    pk_hypertension TEXT NOT NULL DEFAULT '',
+    pk_blood_donation TEXT NOT NULL DEFAULT '',
+    pk_multiple_sclerosis TEXT NOT NULL DEFAULT '',
+    pk_corneal_transplants TEXT NOT NULL DEFAULT '',
+    pk_kidney_dialysis TEXT NOT NULL DEFAULT '',
+    pk_liver_cancer TEXT NOT NULL DEFAULT '',
+    pk_vaccine TEXT NOT NULL DEFAULT '',
+    pk_colorectal_cancer TEXT NOT NULL DEFAULT '',
+    pk_alzheimers_disease TEXT NOT NULL DEFAULT ''
 );
 
--- tb12_prac_topic to tb22_multiQop follow similar patterns
-
 -- tb12_prac_topic
 CREATE TABLE IF NOT EXISTS tb12_prac_topic (
-    topID TEXT PRIMARY KEY,
+    topID TEXT NOT NULL,
     topTitle TEXT NOT NULL,
-    topIdeasBonusWords TEXT NOT NULL
+    topIdeasBonusWords TEXT NOT NULL,
+    PRIMARY KEY (topID)
 );
 
 -- tb13_prac_subtopic
@@ -213,12 +225,6 @@ CREATE TABLE IF NOT EXISTS tb13_prac_subtopic (
     subtopID TEXT NOT NULL,
     topID TEXT NOT NULL,
     subtopTitle TEXT NOT NULL,
-    subtopQuesOne TEXT NOT NULL,
-    subtopAnsOne TEXT NOT NULL,
-    subtopQuesTwo TEXT NOT NULL,
-    subtopAnsTwo TEXT NOT NULL,
-    subtopQuesThr TEXT NOT NULL,
-    subtopAnsThr TEXT NOT NULL,
     PRIMARY KEY (subtopID, topID)
 );
 
@@ -227,7 +233,7 @@ CREATE TABLE IF NOT EXISTS tb14_prac_passage (
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    passID TEXT NOT NULL,
     passOrder TEXT NOT NULL,
     passTitle TEXT NOT NULL,
     passText TEXT NOT NULL,
@@ -242,13 +248,15 @@ CREATE TABLE IF NOT EXISTS tb15_prac_passQop (
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    passID TEXT NOT NULL,
     passOrder TEXT NOT NULL,
     c1Ans INTEGER NOT NULL,
     c2Ans INTEGER NOT NULL,
     c3Ans INTEGER NOT NULL,
+    c4Ans INTEGER NOT NULL DEFAULT 0,
     passRT INTEGER NOT NULL
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_prac_passqop ON tb15_prac_passQop (uid, sid, passID);
 
 -- tb16_prac_taskTime
 CREATE TABLE IF NOT EXISTS tb16_prac_taskTime (
@@ -261,6 +269,7 @@ CREATE TABLE IF NOT EXISTS tb16_prac_taskTime (
     timeStartStamp TEXT NOT NULL,
     timeEndStamp TEXT NOT NULL
 );
+CREATE INDEX IF NOT EXISTS idx_prac_tasktime_uid_sid_top ON tb16_prac_taskTime (uid, sid, topID, timeStart);
 
 -- tb17_prac_topicSummary
 CREATE TABLE IF NOT EXISTS tb17_prac_topicSummary (
@@ -282,38 +291,10 @@ CREATE TABLE IF NOT EXISTS tb18_prac_topicIdeas (
     quesAns TEXT NOT NULL
 );
 
--- tb19_prac_topicBonus
-CREATE TABLE IF NOT EXISTS tb19_prac_topicBonus (
-    tb19id INTEGER PRIMARY KEY AUTOINCREMENT,
-    uid INTEGER NOT NULL,
-    sid TEXT NOT NULL,
-    topID TEXT NOT NULL,
-    quesID TEXT NOT NULL,
-    quesAns TEXT NOT NULL,
-    bonusWord TEXT NOT NULL,
-    bonusWordCnt INTEGER DEFAULT 0,
-    bonusMoney REAL DEFAULT 0.00
-);
-
--- tb20_prac_subtopQos
-CREATE TABLE IF NOT EXISTS tb20_prac_subtopQos (
-    tb20id INTEGER PRIMARY KEY AUTOINCREMENT,
-    uid INTEGER NOT NULL,
-    sid TEXT NOT NULL,
-    topID TEXT NOT NULL,
-    subtopID TEXT NOT NULL,
-    conID TEXT NOT NULL,
-    pageTypeID TEXT NOT NULL,
-    quesAns1 TEXT NOT NULL,
-    quesAns2 TEXT NOT NULL,
-    quesAns3 TEXT NOT NULL,
-    subtopScore REAL NOT NULL
-);
-
--- Example for tb21_questions
+-- tb21_questions
 CREATE TABLE IF NOT EXISTS tb21_questions (
-    questionID TEXT PRIMARY KEY,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    questionID TEXT NOT NULL,
+    passID TEXT NOT NULL,
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
@@ -324,8 +305,10 @@ CREATE TABLE IF NOT EXISTS tb21_questions (
     choiceB TEXT NOT NULL,
     choiceC TEXT NOT NULL,
     choiceD TEXT NOT NULL,
-    correctAns TEXT NOT NULL
+    correctAns TEXT NOT NULL,
+    PRIMARY KEY (questionID)
 );
+CREATE INDEX IF NOT EXISTS idx_questions_passid ON tb21_questions (passID);
 
 -- tb22_multiQop
 CREATE TABLE IF NOT EXISTS tb22_multiQop (
@@ -336,11 +319,13 @@ CREATE TABLE IF NOT EXISTS tb22_multiQop (
     topID TEXT NOT NULL,
     subtopID TEXT NOT NULL,
     conID TEXT NOT NULL,
-    passID TEXT NOT NULL CHECK (LENGTH(passID) = 6),
+    passID TEXT NOT NULL,
     passOrder TEXT NOT NULL,
     choice TEXT NOT NULL,
     isCorrect INTEGER NOT NULL
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_multiqop_question ON tb22_multiQop (uid, sid, questionID);
+CREATE INDEX IF NOT EXISTS idx_multiqop_uid_sid_pass ON tb22_multiQop (uid, sid, passID);
 
 -- tb27_letter_item
 CREATE TABLE IF NOT EXISTS tb27_letter_item (
@@ -354,8 +339,10 @@ CREATE TABLE IF NOT EXISTS tb27_letter_item (
     correct_answer TEXT NOT NULL,
     response TEXT NOT NULL,
     is_correct INTEGER NOT NULL,
-    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    client_rt_ms INTEGER DEFAULT NULL,
+    client_ts_ms INTEGER DEFAULT NULL,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
 );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_letter_item ON tb27_letter_item (uid, sid, round_number, item_index);
 
-PRAGMA foreign_keys = ON;
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""Time the data-layer hot paths against a local database.
+
+Each benchmark runs the app's own code inside a request context, exactly
+as a route would, including the unit-of-work commit and the connection
+release at the end of the request:
+
+* save_url                     - one page view, written synchronously
+* save_pass_answer:<table>:<q> - c1..c4 into tb5_passQop / tb15_prac_passQop
+* save_letter_item             - `_save_letter_item_response`
+* finalize_letter_round        - `_finalize_letter_round` (rounds 1 and 2)
+* finalize_study               - the /done finalization job (`_finalize_study`)
+* finalize_study_backfill      - the same, with the end-of-study interval
+                                 backfill (URL_LOG_INCREMENTAL_INTERVALS=0)
+
+They run once per scale, against a synthetic participant that already has
+100, 1,000 or 10,000 `output1_url` rows (see --scales). The participant
+also has letter comparison items and passage answers. The participant is
+deleted afterwards unless --keep is given.
+
+Results are written as JSON. Compare them against a stored baseline with
+--baseline: a benchmark whose median is more than --threshold slower
+than the baseline counts as a regression, and the exit status is 1.
+The run is repeatable because the participant is rebuilt for every
+scale; run it on an idle machine, with the same schema and server
+settings as the baseline.
+
+Usage example:
+
+    export MYSQL_HOST=localhost
+    export MYSQL_USER=root
+    export MYSQL_PASSWORD=secret
+    python scripts/benchmark.py --schema cogsearch_bench --output bench.json
+    python scripts/benchmark.py --schema cogsearch_bench --baseline bench.json --threshold 0.15
+
+    # or against an embedded SQLite file instead of a server
+    DB_BACKEND=sqlite SQLITE_PATH=/tmp/bench.sqlite3 python scripts/benchmark.py --output bench-sqlite.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SCHEMA = os.getenv("MYSQL_DB", "cogsearch_textsearch3")
+DEFAULT_SCALES = (100, 1000, 10000)
+PAGE_CYCLE = ("a", "b", "c1", "c2", "c3", "c4")
+PARTICIPANT_TABLES = (
+    "output1_url", "tb5_passQop", "tb15_prac_passQop", "tb22_multiQop", "tb27_letter_item", "tb11_profile",
+    "tb1_user",
+)
+
+
+def load_app(schema: str):
+    # The app reads its database from the environment when it is created.
+    os.environ["MYSQL_DB"] = schema
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    sys.path.insert(0, str(ROOT))
+    import src
+
+    app = src.app
+    # Time the writes themselves, not a hand-off to the background logger.
+    app.config["URL_LOG_ASYNC"] = False
+    return app
+
+
+class Bench:
+    """Runs one synthetic participant's benchmarks at one `output1_url` scale."""
+
+    def __init__(self, app, scale: int, args):
+        from src import db
+        from src.routes import core
+
+        self.app = app
+        self.db = db
+        self.core = core
+        self.scale = scale
+        self.args = args
+        self.sid = f"9{scale:07d}{os.getpid() % 1000:03d}"
+        self.uid = None
+        self.pass_ids: List[str] = []
+        self.answers: Dict[str, str] = {}
+
+    # -- synthetic participant ----------------------------------------------
+
+    def setup(self) -> None:
+        with self.app.app_context():
+            conn = self.db.get_pool().acquire()
+            try:
+                cursor = conn.cursor()
+                self._delete(cursor)
+                cursor.execute(
+                    """
+                    INSERT INTO tb1_user
+                        (sid, topIDorder, subtopIDorder, conIDorder, taskDone, conDone, signedConsent, signedDate)
+                    VALUES (%s, '01#', '', '1#2#3#1#2#3#', 0, 0, 'TRUE', 'benchmark')
+                    """,
+                    (self.sid,),
+                )
+                self.uid = cursor.lastrowid
+                cursor.execute(
+                    """
+                    INSERT INTO tb11_profile
+                        (uid, sid, dobMonth, dobDay, dobYear, dobSum, age, gender, edu, natEng, firLan,
+                         reading, writing, hisLat, race)
+                    VALUES (%s, %s, '1', '1', '1990', '1/1/1990', '35', '1', '4', '1', 'English', '5', '5', '2', '1')
+                    """,
+                    (self.uid, self.sid),
+                )
+
+                answer_key = self.db.get_stimulus_cache(self.app).answer_key()
+                self.pass_ids = sorted({str(entry["passID"]) for entry in answer_key.values()})[:12]
+                self.answers = {
+                    qid: "abcd"[i % 4]
+                    for i, (qid, entry) in enumerate(sorted(answer_key.items()))
+                    if str(entry["passID"]) in self.pass_ids
+                }
+                self._seed_page_views(cursor)
+                self._seed_letter_items(cursor)
+                cursor.close()
+                conn.commit()
+            finally:
+                self.db.get_pool().release(conn)
+
+    def _seed_page_views(self, cursor) -> None:
+        from src.services.url_logger import OUTPUT1_URL_COLUMNS
+
+        start = int(time.time()) - 2 * self.scale
+        rows = []
+        for i in range(self.scale):
+            page = PAGE_CYCLE[i % len(PAGE_CYCLE)]
+            pass_id = self.pass_ids[(i // len(PAGE_CYCLE)) % len(self.pass_ids)] if self.pass_ids else "001101"
+            on_passage = page != "a"
+            rows.append((
+                self.uid, self.sid, "1", pass_id[:3] if on_passage else "", pass_id[3:4] if on_passage else "",
+                pass_id if on_passage else "", page, "benchmark", start + 2 * i, 0,
+                f"http://localhost/task_{page}", f"Benchmark {page}",
+            ))
+        placeholders = "(" + ", ".join(["%s"] * len(OUTPUT1_URL_COLUMNS)) + ")"
+        for offset in range(0, len(rows), 1000):
+            batch = rows[offset:offset + 1000]
+            cursor.execute(
+                f"INSERT INTO output1_url ({', '.join(OUTPUT1_URL_COLUMNS)}) VALUES "
+                + ", ".join([placeholders] * len(batch)),
+                [value for row in batch for value in row],
+            )
+
+    def _seed_letter_items(self, cursor) -> None:
+        for round_number in (1, 2):
+            for index, item in enumerate(self.core._letter_round_items(round_number), start=1):
+                cursor.execute(
+                    """
+                    INSERT INTO tb27_letter_item
+                        (uid, sid, round_number, item_index, left_str, right_str, correct_answer, response, is_correct)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (self.uid, self.sid, round_number, index, item["left"], item["right"], item["answer"],
+                     item["answer"], 1),
+                )
+
+    def teardown(self) -> None:
+        if self.args.keep:
+            print(f"  kept participant uid={self.uid} sid={self.sid}")
+            return
+        with self.app.app_context():
+            conn = self.db.get_pool().acquire()
+            try:
+                cursor = conn.cursor()
+                self._delete(cursor)
+                cursor.close()
+                conn.commit()
+            finally:
+                self.db.get_pool().release(conn)
+
+    def _delete(self, cursor) -> None:
+        for table in PARTICIPANT_TABLES:
+            cursor.execute(f"DELETE FROM {table} WHERE sid=%s", (self.sid,))
+
+    # -- timing ---------------------------------------------------------------
+
+    def in_request(self, operation: Callable, **session_values) -> float:
+        """Run `operation` as one request would and return its wall time."""
+        app = self.app
+        with app.test_request_context("/benchmark"):
+            from flask import session
+
+            session.update(uid=self.uid, sid=self.sid, topID="1", practice_topID="1", **session_values)
+            started = time.perf_counter()
+            operation()
+            self.db.complete_unit_of_work(app.response_class())
+            self.db.release_db_connection()
+            return time.perf_counter() - started
+
+    def measure(self, operation: Callable, **session_values) -> dict:
+        for _ in range(self.args.warmup):
+            self.in_request(operation, **session_values)
+        samples = [self.in_request(operation, **session_values) for _ in range(self.args.repeat)]
+        samples.sort()
+        return {
+            "iterations": len(samples),
+            "median_ms": statistics.median(samples) * 1000,
+            "mean_ms": statistics.fmean(samples) * 1000,
+            "min_ms": samples[0] * 1000,
+            "p95_ms": samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000,
+        }
+
+    def run(self) -> Dict[str, dict]:
+        core = self.core
+        from src.services.utils import PASS_ANSWER_COLUMNS, save_pass_answer
+
+        pass_id = self.pass_ids[0] if self.pass_ids else "001101"
+        results = {}
+        page = itertools.count()
+        results["save_url"] = self.measure(
+            lambda: self.db.save_url(
+                self.uid, self.sid, "1", pass_id[:3], pass_id[3:4], pass_id,
+                PAGE_CYCLE[next(page) % len(PAGE_CYCLE)], "Benchmark", "http://localhost/benchmark",
+            )
+        )
+        for table in ("tb5_passQop", "tb15_prac_passQop"):
+            for qid in PASS_ANSWER_COLUMNS:
+                results[f"save_pass_answer:{table}:{qid}"] = self.measure(
+                    lambda qid=qid, table=table: save_pass_answer(qid, "50", table=table, pass_id=pass_id),
+                    passID=pass_id,
+                )
+
+        items = core._letter_round_items(1)
+        item_index = itertools.count()
+
+        def save_item():
+            index = next(item_index) % len(items)
+            item = items[index]
+            core._save_letter_item_response(self.uid, self.sid, 1, index + 1, item, item["answer"], 1)
+
+        results["save_letter_item"] = self.measure(save_item)
+        for round_number in (1, 2):
+            results[f"finalize_letter_round:{round_number}"] = self.measure(
+                lambda round_number=round_number: core._finalize_letter_round(self.uid, self.sid, round_number)
+            )
+
+        payload = {"uid": self.uid, "sid": self.sid, "pass_ids": self.pass_ids, "answers": self.answers}
+        results["finalize_study"] = self.measure(lambda: core._finalize_study(payload))
+        incremental = self.app.config.get("URL_LOG_INCREMENTAL_INTERVALS", True)
+        self.app.config["URL_LOG_INCREMENTAL_INTERVALS"] = False
+        try:
+            results["finalize_study_backfill"] = self.measure(lambda: core._finalize_study(payload))
+        finally:
+            self.app.config["URL_LOG_INCREMENTAL_INTERVALS"] = incremental
+        return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Print current vs baseline medians; return the names that regressed."""
+    regressions = []
+    base_results = baseline.get("results", {})
+    print(f"\n{'benchmark':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, current in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"{name:<48} {'-':>10} {current['median_ms']:>10.3f} {'new':>8}")
+            continue
+        change = current["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<48} {base['median_ms']:>10.3f} {current['median_ms']:>10.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="Database/schema to benchmark against")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(DEFAULT_SCALES),
+                        help="output1_url rows of the synthetic participant")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed iterations per benchmark")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed iterations per benchmark")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed median slowdown vs the baseline (0.10 = 10%%)")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic participants")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    args.repeat = max(args.repeat, 1)
+    app = load_app(args.schema)
+
+    results: Dict[str, dict] = {}
+    for scale in args.scales:
+        print(f"Scale {scale} output1_url rows ...")
+        bench = Bench(app, scale, args)
+        bench.setup()
+        try:
+            for name, stats in bench.run().items():
+                results[f"{name}@{scale}"] = stats
+                print(f"  {name:<44} median {stats['median_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms")
+        finally:
+            bench.teardown()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": app.config["DB_BACKEND"],
+            "schema": args.schema,
+            "scales": args.scales,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than the baseline")
+            return 1
+        print(f"\nNo benchmark more than {args.threshold:.0%} slower than the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,527 @@
+#!/usr/bin/env python3
+"""Drive concurrent virtual participants through the full study flow.
+
+Each virtual participant keeps its own cookies and walks the real route
+sequence of a running app, filling in forms the way the pages do:
+
+    /consent -> /demographic -> /prac_instruction -> prac_a -> prac_b ->
+    prac_c1..c4 (per practice subtopic) -> prac_k2 -> /instruction ->
+    task_a -> task_b -> task_c1..c4 (per passage, per subtopic) -> /k2 ->
+    letter comparison rounds 1 and 2 -> /vocab -> /questions -> /done
+
+Links and form fields are read from the served HTML, so the combined
+ratings page (RATINGS_COMBINED=1) is followed as well. Redirects are
+followed by hand and every hop is timed as its own request. Between user
+actions a participant "thinks" for --think-time +/- --think-jitter
+seconds.
+
+At the end the script prints throughput and p50/p95/p99 latency per
+endpoint. Database connection use is sampled from the app's /metrics
+pool gauges while the run lasts (start the app with
+STATS_ENDPOINTS_ENABLED=1; --stats-token sends its STATS_TOKEN). Pass
+--mysql-status to also sample the server's Threads_connected, which
+covers every app process.
+--mysql-status reads the same MYSQL_* variables as the app.
+
+Run it against the app served on a local database, never production;
+each virtual participant writes a full set of study rows.
+
+Usage example:
+
+    flask --app src run --with-threads &
+    python scripts/loadtest.py --participants 20 --think-time 0.5
+    python scripts/loadtest.py -n 50 --ramp-up 30 --passages 1 --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Tuple
+
+RATING_PAGES = {
+    "/task_c1", "/task_c2", "/task_c3", "/task_c4", "/task_ratings",
+    "/prac_c1", "/prac_c2", "/prac_c3", "/prac_c4", "/prac_ratings",
+}
+RATING_FIELDS = ("ans", "c1", "c2", "c3", "c4")
+POOL_GAUGE = re.compile(r'^cogsearch_db_pool_connections\{state="(\w+)"\} (\S+)$', re.M)
+POOL_OPENED = re.compile(r"^cogsearch_db_connections_opened_total (\S+)$", re.M)
+POOL_CHECKOUTS = re.compile(r"^cogsearch_request_db_checkouts_total\{[^}]*\} (\S+)$", re.M)
+
+
+class FlowError(Exception):
+    """The app answered in a way the participant cannot continue from."""
+
+
+class _Page(HTMLParser):
+    """Links and forms of one HTML page."""
+
+    def __init__(self, html: str):
+        super().__init__()
+        self.links: List[str] = []
+        self.forms: List[dict] = []
+        self._form: Optional[dict] = None
+        self.feed(html)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self.links.append(attrs["href"])
+        elif tag == "form":
+            self._form = {
+                "action": attrs.get("action") or "",
+                "method": (attrs.get("method") or "get").upper(),
+                "inputs": [],
+            }
+            self.forms.append(self._form)
+        elif tag in ("input", "select", "textarea") and self._form is not None and attrs.get("name"):
+            self._form["inputs"].append((attrs["name"], (attrs.get("type") or "text").lower(), attrs.get("value")))
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+
+    def link(self, path: str, **params) -> Optional[str]:
+        """First link to `path` whose query has all of `params`."""
+        for href in self.links:
+            parsed = urllib.parse.urlsplit(href)
+            query = dict(urllib.parse.parse_qsl(parsed.query))
+            if parsed.path.endswith(path) and all(query.get(k) == v for k, v in params.items()):
+                return href
+        return None
+
+    def form(self, method: str = "POST") -> Optional[dict]:
+        return next((f for f in self.forms if f["method"] == method), None)
+
+    def radio_groups(self, prefix: str) -> List[str]:
+        names = []
+        for form in self.forms:
+            for name, kind, _ in form["inputs"]:
+                if kind == "radio" and name.startswith(prefix) and name not in names:
+                    names.append(name)
+        return names
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Recorder:
+    """Latencies per endpoint, shared by all participants."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+class Participant:
+    """One virtual participant with its own cookie jar."""
+
+    def __init__(self, args, index: int, recorder: Recorder):
+        self.args = args
+        self.base = args.base_url.rstrip("/")
+        self.sid = str(args.sid_base + index)
+        self.recorder = recorder
+        self.rng = random.Random(args.seed + index if args.seed is not None else None)
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+        self.url = self.base + "/"
+
+    # -- HTTP -----------------------------------------------------------------
+
+    def request(self, method: str, url: str, data: Optional[dict] = None) -> Tuple[str, _Page]:
+        """Send one request, following redirects; returns the final path and page."""
+        url = urllib.parse.urljoin(self.url, url)
+        body = urllib.parse.urlencode(data or {}).encode() if method == "POST" else None
+        for _ in range(10):
+            path = urllib.parse.urlsplit(url).path
+            endpoint = f"{method} {path}"
+            req = urllib.request.Request(url, data=body, method=method)
+            started = time.perf_counter()
+            try:
+                with self.opener.open(req, timeout=self.args.timeout) as response:
+                    html = response.read().decode("utf-8", "replace")
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                e.read()
+                status = e.code
+                if status in (301, 302, 303, 307, 308):
+                    self.recorder.add(endpoint, time.perf_counter() - started, True)
+                    url = urllib.parse.urljoin(url, e.headers.get("Location", "/"))
+                    if status in (301, 302, 303):
+                        method, body = "GET", None
+                    continue
+                self.recorder.add(endpoint, time.perf_counter() - started, False)
+                raise FlowError(f"{endpoint} returned {status}")
+            except (urllib.error.URLError, OSError) as e:
+                self.recorder.add(endpoint, time.perf_counter() - started, False)
+                raise FlowError(f"{endpoint} failed: {e}")
+            self.recorder.add(endpoint, time.perf_counter() - started, status < 400)
+            self.url = url
+            return path, _Page(html)
+        raise FlowError(f"too many redirects from {method} {url}")
+
+    def get(self, url: str) -> Tuple[str, _Page]:
+        return self.request("GET", url)
+
+    def post(self, url: str, data: dict) -> Tuple[str, _Page]:
+        return self.request("POST", url, data)
+
+    def think(self) -> None:
+        delay = self.args.think_time + self.rng.uniform(-self.args.think_jitter, self.args.think_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    # -- study flow ------------------------------------------------------------
+
+    def run(self) -> None:
+        duration = f"?duration={self.args.duration}" if self.args.duration else ""
+        self.get(f"/consent{duration}")
+        self.think()
+        self.post("/demographic", {"participant_id": self.sid, "consentCheck": "Yes"})
+        self.think()
+        self.post("/prac_instruction", self.demographics())
+        self.think()
+
+        _, page = self.post("/prac_a?fid=begin", {"begin_task": "yes"})
+        self.read_subtopics(page, "/prac_b", self.args.practice_subtopics)
+        self.get("/prac_k2?lastPage=a")
+        self.think()
+        self.get("/instruction")
+        self.think()
+
+        _, page = self.post("/task_a?fid=begin", {"begin_task": "yes"})
+        self.read_subtopics(page, "/task_b", self.args.subtopics)
+        self.get("/k2?lastPage=complete")
+        self.think()
+
+        for round_number, inst in ((1, "/let_comp_one_inst"), (2, "/let_comp_two_inst")):
+            _, page = self.get(inst)
+            self.think()
+            form = page.form("GET")
+            path, page = self.get((form["action"] if form else inst.replace("_inst", "")) + "?item=1")
+            self.think()
+            self.letter_round(path, page)
+            self.think()
+
+        self.get("/vocab")
+        self.think()
+        voc = {f"voc{i}": str(self.rng.randint(1, 6)) for i in range(1, 16)}
+        _, page = self.post("/questions", voc)
+        self.think()
+        answers = {name: self.rng.choice("abcd") for name in page.radio_groups("q_")}
+        self.post("/done", answers)
+
+    def demographics(self) -> dict:
+        rng = self.rng
+        form = {
+            "demog_bm": str(rng.randint(1, 12)),
+            "demog_bd": str(rng.randint(1, 28)),
+            "demog_by": str(rng.randint(1950, 2005)),
+            "demog_age": str(rng.randint(18, 75)),
+            "demog_gen": rng.choice(["1", "2"]),
+            "demog_edu": str(rng.randint(1, 6)),
+            "demog_eng": rng.choice(["1", "2"]),
+            "demog_firlan": "English",
+            "demog_eng_read": str(rng.randint(1, 5)),
+            "demog_eng_write": str(rng.randint(1, 5)),
+            "demog_hislat": rng.choice(["1", "2"]),
+            "demog_race": str(rng.randint(1, 6)),
+        }
+        for topic in (
+            "bone_grafts", "hypertension", "blood_donation", "multiple_sclerosis", "corneal_transplants",
+            "kidney_dialysis", "liver_cancer", "vaccine", "colorectal_cancer", "alzheimers_disease",
+        ):
+            form[topic] = str(rng.randint(1, 5))
+        return form
+
+    def read_subtopics(self, page: _Page, passage_path: str, limit: Optional[int]) -> None:
+        """From a task_a/prac_a page, read --passages passages of each subtopic and rate them."""
+        entries = []
+        for href in page.links:
+            parsed = urllib.parse.urlsplit(href)
+            if parsed.path.endswith(passage_path) and "lastPage=a" in parsed.query and href not in entries:
+                entries.append(href)
+        if not entries:
+            raise FlowError(f"no subtopic links to {passage_path} on {self.url}")
+        for href in entries[:limit]:
+            self.think()
+            path, page = self.get(href)
+            for number in range(1, self.args.passages + 1):
+                if not path.endswith(passage_path):
+                    break  # the app sent us back to the subtopic list
+                self.think()
+                exit_fid = "same" if number < self.args.passages else "back"
+                rating = next(filter(None, (page.link(p, fid=exit_fid) for p in sorted(RATING_PAGES))), None)
+                if rating is None:
+                    raise FlowError(f"no rating link on {self.url}")
+                path, page = self.get(rating)
+                path, page = self.rate(path, page)
+
+    def rate(self, path: str, page: _Page) -> Tuple[str, _Page]:
+        """Fill in rating pages (C1-C4 or the combined page) until the app moves on."""
+        while path in RATING_PAGES:
+            form = page.form("POST")
+            if form is None:
+                raise FlowError(f"no rating form on {self.url}")
+            data = {}
+            for name, kind, value in form["inputs"]:
+                if name in RATING_FIELDS:
+                    data[name] = str(self.rng.randint(0, 100))
+                elif kind == "hidden" and value is not None:
+                    data[name] = value
+            self.think()
+            path, page = self.post(form["action"] or self.url, data)
+        return path, page
+
+    def letter_round(self, path: str, page: _Page) -> None:
+        choices = page.radio_groups("choice_")
+        if not choices:
+            raise FlowError(f"no letter comparison items on {self.url}")
+        data = {}
+        total_ms = 0
+        for name in choices:
+            rt_ms = self.rng.randint(400, 2500)
+            total_ms += rt_ms
+            data[name] = self.rng.choice("SD")
+            data["client_rt_ms_" + name.split("_", 1)[1]] = str(rt_ms)
+        data["total_time_ms"] = str(total_ms)
+        form = page.form("POST")
+        self.post(form["action"] if form else path, data)
+
+
+class PoolSampler(threading.Thread):
+    """Polls the app's /metrics (and optionally MySQL) for connection use."""
+
+    def __init__(self, base_url: str, interval: float, mysql_status: bool, token: str = ""):
+        super().__init__(name="pool-sampler", daemon=True)
+        self.url = base_url.rstrip("/") + "/metrics"
+        self.token = token
+        self.interval = interval
+        self.mysql_status = mysql_status
+        self.stop_event = threading.Event()
+        self.peaks: Dict[str, float] = {}
+        self.first: Optional[dict] = None
+        self.last: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._mysql = None
+
+    def scrape(self) -> Optional[dict]:
+        try:
+            req = urllib.request.Request(self.url, headers={"X-Stats-Token": self.token} if self.token else {})
+            with urllib.request.urlopen(req, timeout=5) as response:
+                text = response.read().decode()
+        except (urllib.error.URLError, OSError) as e:
+            self.error = f"/metrics unavailable ({e})"
+            return None
+        sample = {state: float(value) for state, value in POOL_GAUGE.findall(text)}
+        opened = POOL_OPENED.search(text)
+        sample["opened_total"] = float(opened.group(1)) if opened else 0.0
+        sample["checkouts_total"] = sum(float(v) for v in POOL_CHECKOUTS.findall(text))
+        return sample
+
+    def threads_connected(self) -> Optional[float]:
+        try:
+            if self._mysql is None:
+                import mysql.connector
+
+                self._mysql = mysql.connector.connect(
+                    host=os.getenv("MYSQL_HOST", "localhost"),
+                    user=os.getenv("MYSQL_USER", "root"),
+                    password=os.getenv("MYSQL_PASSWORD", ""),
+                    database=os.getenv("MYSQL_DB", "cogsearch_textsearch3"),
+                )
+            cursor = self._mysql.cursor()
+            cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_connected'")
+            row = cursor.fetchone()
+            cursor.close()
+            return float(row[1]) if row else None
+        except Exception as e:
+            self.error = f"MySQL status unavailable ({e})"
+            self.mysql_status = False
+            return None
+
+    def sample(self) -> None:
+        current = self.scrape()
+        if current is not None:
+            self.first = self.first or current
+            self.last = current
+            for key in ("checked_out", "open"):
+                if key in current:
+                    self.peaks[key] = max(self.peaks.get(key, 0.0), current[key])
+        if self.mysql_status:
+            connected = self.threads_connected()
+            if connected is not None:
+                self.peaks["mysql_threads_connected"] = max(self.peaks.get("mysql_threads_connected", 0.0), connected)
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            self.sample()
+            self.stop_event.wait(self.interval)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.join()
+        self.sample()
+        if self._mysql is not None:
+            self._mysql.close()
+
+    def summary(self) -> dict:
+        summary = {"peak_" + key: value for key, value in self.peaks.items()}
+        if self.first and self.last:
+            summary["connections_opened"] = self.last["opened_total"] - self.first["opened_total"]
+            summary["request_checkouts"] = self.last["checkouts_total"] - self.first["checkouts_total"]
+        if self.error:
+            summary["note"] = self.error
+        return summary
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> List[dict]:
+    rows = []
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        rows.append(
+            {
+                "endpoint": endpoint,
+                "requests": len(values),
+                "errors": recorder.errors.get(endpoint, 0),
+                "rps": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+            }
+        )
+    return rows
+
+
+def print_report(rows: List[dict], totals: dict, pool: dict) -> None:
+    width = max([len(row["endpoint"]) for row in rows] + [8])
+    print(f"\n{'endpoint':<{width}} {'reqs':>6} {'errs':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for row in rows:
+        print(
+            f"{row['endpoint']:<{width}} {row['requests']:>6} {row['errors']:>5} {row['rps']:>7.2f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}"
+        )
+    print(
+        f"\n{totals['completed']}/{totals['participants']} participants completed in {totals['elapsed']:.1f}s; "
+        f"{totals['requests']} requests ({totals['rps']:.2f}/s), {totals['errors']} errors"
+    )
+    if pool:
+        print("DB connections: " + ", ".join(f"{key}={value:g}" if isinstance(value, float) else f"{key}={value}"
+                                             for key, value in pool.items()))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="URL of the running app")
+    parser.add_argument("-n", "--participants", type=int, default=10, help="Virtual participants to run")
+    parser.add_argument("--concurrency", type=int, default=0, help="Participants at a time (default: all)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which participants start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between actions, seconds")
+    parser.add_argument("--think-jitter", type=float, default=0.5, help="Uniform +/- jitter on the pause")
+    parser.add_argument("--passages", type=int, default=2, help="Passages read per subtopic")
+    parser.add_argument("--subtopics", type=int, default=None, help="Formal subtopics visited (default: all)")
+    parser.add_argument("--practice-subtopics", type=int, default=None, help="Practice subtopics visited")
+    parser.add_argument("--duration", type=int, default=None, help="Formal task length passed to /consent")
+    parser.add_argument("--sid-base", type=int, default=None, help="First participant ID (digits)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout, seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for answers and think times")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between /metrics samples")
+    parser.add_argument(
+        "--stats-token", default=os.environ.get("STATS_TOKEN", ""), help="STATS_TOKEN sent when sampling /metrics"
+    )
+    parser.add_argument("--mysql-status", action="store_true", help="Also sample MySQL Threads_connected")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+    if args.sid_base is None:
+        # Distinct from earlier runs, so rows are easy to find and delete.
+        args.sid_base = int(time.time()) % 10_000_000 * 1000
+    args.passages = max(args.passages, 1)
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    recorder = Recorder()
+    sampler = PoolSampler(args.base_url, args.sample_interval, args.mysql_status, args.stats_token)
+    slots = threading.BoundedSemaphore(args.concurrency or args.participants)
+    failures: List[str] = []
+    failures_lock = threading.Lock()
+
+    def run_participant(index: int) -> None:
+        with slots:
+            participant = Participant(args, index, recorder)
+            try:
+                participant.run()
+            except FlowError as e:
+                with failures_lock:
+                    failures.append(f"sid {participant.sid}: {e}")
+
+    print(f"Running {args.participants} participant(s) against {args.base_url} (sids from {args.sid_base})")
+    sampler.start()
+    started = time.perf_counter()
+    threads = []
+    for index in range(args.participants):
+        if args.ramp_up and index:
+            time.sleep(args.ramp_up / args.participants)
+        thread = threading.Thread(target=run_participant, args=(index,), name=f"participant-{index}")
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+
+    rows = summarize(recorder, elapsed)
+    requests = sum(row["requests"] for row in rows)
+    totals = {
+        "participants": args.participants,
+        "completed": args.participants - len(failures),
+        "elapsed": elapsed,
+        "requests": requests,
+        "errors": sum(row["errors"] for row in rows),
+        "rps": requests / elapsed if elapsed else 0.0,
+    }
+    pool = sampler.summary()
+    print_report(rows, totals, pool)
+    for failure in failures[:20]:
+        print(f"failed: {failure}", file=sys.stderr)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"totals": totals, "endpoints": rows, "db_connections": pool, "failures": failures}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
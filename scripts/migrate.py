@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Apply numbered, idempotent schema migrations and verify hot-query indexes.
+
+Migrations live in `scripts/migrations/NNNN_<name>.py`; each module exposes an
+`upgrade(ctx)` function that uses the helpers on `MigrationContext` (which
+check `INFORMATION_SCHEMA` before changing anything, so re-running a
+migration against a schema that already has the change is a no-op). Applied
+versions are recorded in the `schema_migrations` tracking table.
+
+`--verify` runs `EXPLAIN` on each query in `HOT_QUERIES` and fails if MySQL
+would answer it with a full table scan.
+
+Usage example:
+
+    export MYSQL_HOST=localhost
+    export MYSQL_USER=root
+    export MYSQL_PASSWORD=secret
+    export MYSQL_DB=cogsearch_textsearch3
+    python scripts/migrate.py --status
+    python scripts/migrate.py            # apply pending migrations
+    python scripts/migrate.py --verify   # EXPLAIN the hot queries
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import re
+import sys
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+import mysql.connector
+
+DEFAULT_SCHEMA = os.getenv("MYSQL_DB", "cogsearch_textsearch3")
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+MIGRATION_FILE_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.py$")
+
+# (label, query, params) for every per-request query that must be index-backed.
+HOT_QUERIES: Tuple[Tuple[str, str, tuple], ...] = (
+    (
+        "done: participant page log",
+        "SELECT * FROM output1_url WHERE sid=%s AND uid=%s ORDER BY op1ID DESC",
+        ("1", 1),
+    ),
+    (
+        "done: reading-page intervals",
+        "SELECT passID, time_interval FROM output1_url WHERE sid=%s AND uid=%s AND pageTypeID='b'",
+        ("1", 1),
+    ),
+    (
+        "save_pass_answer / questions: participant passages",
+        "SELECT passID FROM tb5_passQop WHERE sid=%s AND uid=%s AND passID=%s",
+        ("1", 1, "001101"),
+    ),
+    (
+        "prac: participant passages",
+        "SELECT passID FROM tb15_prac_passQop WHERE sid=%s AND uid=%s AND passID=%s",
+        ("1", 1, "001101"),
+    ),
+    (
+        "task_b / task_c4: latest task time row",
+        "SELECT tb6id FROM tb6_taskTime WHERE uid=%s AND sid=%s AND topID=%s ORDER BY timeStart DESC LIMIT 1",
+        (1, "1", "1"),
+    ),
+    (
+        "prac_b / prac_c4: latest practice task time row",
+        "SELECT tb16id FROM tb16_prac_taskTime WHERE uid=%s AND sid=%s AND topID=%s ORDER BY timeStart DESC LIMIT 1",
+        (1, "1", "1"),
+    ),
+    (
+        "questions / done: question bank",
+        "SELECT * FROM tb21_questions WHERE passID IN (%s, %s) ORDER BY passID, questionID",
+        ("001101", "001102"),
+    ),
+    (
+        "questions / done: existing answers",
+        "SELECT questionID, choice FROM tb22_multiQop WHERE uid=%s AND sid=%s AND passID IN (%s)",
+        (1, "1", "001101"),
+    ),
+    (
+        "demographic: newest uid for sid",
+        "SELECT MAX(uid) FROM tb1_user WHERE sid=%s",
+        ("1",),
+    ),
+)
+
+
+def get_connection(schema: str):
+    """Open a MySQL connection using env vars (mirrors Flask config defaults)."""
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "root"),
+        database=schema,
+        auth_plugin="mysql_native_password",
+    )
+
+
+class MigrationContext:
+    """Idempotent DDL helpers handed to each migration's `upgrade()`."""
+
+    def __init__(self, cursor, schema: str, dry_run: bool = False):
+        self.cursor = cursor
+        self.schema = schema
+        self.dry_run = dry_run
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        print(f"    {' '.join(sql.split())}")
+        if self.dry_run:
+            return 0
+        self.cursor.execute(sql, params)
+        return self.cursor.rowcount
+
+    def index_columns(self, table: str, index_name: str) -> List[str]:
+        self.cursor.execute(
+            """
+            SELECT COLUMN_NAME
+            FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s
+            ORDER BY SEQ_IN_INDEX
+            """,
+            (self.schema, table, index_name),
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def ensure_index(self, table: str, index_name: str, columns: Sequence[str], unique: bool = False) -> bool:
+        """Create the index unless one with that name already exists. Returns True if created."""
+        existing = self.index_columns(table, index_name)
+        if existing:
+            if [c.lower() for c in existing] != [c.lower() for c in columns]:
+                print(
+                    f"  ! {table}.{index_name} exists on ({', '.join(existing)}), "
+                    f"expected ({', '.join(columns)}); leaving it unchanged"
+                )
+            return False
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        cols = ", ".join(f"`{c}`" for c in columns)
+        self.execute(f"CREATE {kind} `{index_name}` ON `{table}` ({cols})")
+        return True
+
+    def column_exists(self, table: str, column: str) -> bool:
+        self.cursor.execute(
+            """
+            SELECT 1
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s
+            """,
+            (self.schema, table, column),
+        )
+        return self.cursor.fetchone() is not None
+
+    def ensure_column(self, table: str, column: str, definition: str) -> bool:
+        """Add the column unless it already exists. Returns True if added."""
+        if self.column_exists(table, column):
+            return False
+        self.execute(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}")
+        return True
+
+    def delete_duplicates(self, table: str, id_column: str, key_columns: Sequence[str]) -> int:
+        """Remove rows sharing `key_columns`, keeping the newest (highest id) one."""
+        join = " AND ".join(f"newer.`{c}` = t.`{c}`" for c in key_columns)
+        removed = self.execute(
+            f"""
+            DELETE t FROM `{table}` t
+            JOIN `{table}` newer ON {join} AND newer.`{id_column}` > t.`{id_column}`
+            """
+        )
+        if removed:
+            print(f"  - {table}: removed {removed} duplicate row(s)")
+        return removed
+
+
+def ensure_tracking_table(cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS `schema_migrations` (
+            `version` char(4) NOT NULL,
+            `name` varchar(100) NOT NULL,
+            `applied_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (`version`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> List[Tuple[str, str, Path]]:
+    found = []
+    for path in sorted(directory.glob("*.py")):
+        match = MIGRATION_FILE_RE.match(path.name)
+        if match:
+            found.append((match.group(1), match.group(2), path))
+    versions = [version for version, _, _ in found]
+    if len(versions) != len(set(versions)):
+        raise SystemExit(f"Duplicate migration version numbers in {directory}")
+    return found
+
+
+def load_migration(path: Path):
+    spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "upgrade"):
+        raise SystemExit(f"{path.name} does not define upgrade(ctx)")
+    return module
+
+
+def applied_versions(cursor) -> set:
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_pending(conn, schema: str, dry_run: bool = False) -> int:
+    cursor = conn.cursor()
+    ensure_tracking_table(cursor)
+    done = applied_versions(cursor)
+    pending = [m for m in discover_migrations() if m[0] not in done]
+    if not pending:
+        print("Schema is up to date.")
+        return 0
+
+    for version, name, path in pending:
+        module = load_migration(path)
+        print(f"Applying {version}_{name}{' (dry run)' if dry_run else ''}")
+        module.upgrade(MigrationContext(cursor, schema, dry_run=dry_run))
+        if not dry_run:
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+            # MySQL DDL auto-commits; this commits any data fixes and the record.
+            conn.commit()
+    return len(pending)
+
+
+def print_status(conn) -> None:
+    cursor = conn.cursor()
+    ensure_tracking_table(cursor)
+    done = applied_versions(cursor)
+    for version, name, _ in discover_migrations():
+        print(f"  [{'x' if version in done else ' '}] {version}_{name}")
+
+
+def verify_hot_queries(conn) -> int:
+    """EXPLAIN every hot query; returns the number that would full-scan."""
+    cursor = conn.cursor(dictionary=True)
+    failures = 0
+    for label, query, params in HOT_QUERIES:
+        cursor.execute(f"EXPLAIN {query}", params)
+        plan = cursor.fetchall()
+        scans = [row for row in plan if (row.get("type") or "").upper() == "ALL" or not row.get("key")]
+        # "Select tables optimized away" (e.g. MAX over an index) has no table row at all.
+        scans = [row for row in scans if row.get("table")]
+        if scans:
+            failures += 1
+            tables = ", ".join(sorted({row["table"] for row in scans}))
+            print(f"  FAIL {label}: full scan on {tables}")
+        else:
+            keys = ", ".join(sorted({row["key"] for row in plan if row.get("key")})) or "optimized away"
+            print(f"  ok   {label}: {keys}")
+    return failures
+
+
+def main(argv: Iterable[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="Database/schema name (default: %(default)s)")
+    parser.add_argument("--status", action="store_true", help="List migrations and whether they are applied")
+    parser.add_argument("--dry-run", action="store_true", help="Print the statements pending migrations would run")
+    parser.add_argument("--verify", action="store_true", help="EXPLAIN the hot queries and fail on full scans")
+    args = parser.parse_args(argv)
+
+    conn = None
+    try:
+        conn = get_connection(args.schema)
+        if args.status:
+            print_status(conn)
+            return 0
+        if not args.verify:
+            apply_pending(conn, args.schema, dry_run=args.dry_run)
+        else:
+            print("Verifying hot queries:")
+            failures = verify_hot_queries(conn)
+            if failures:
+                print(f"{failures} hot quer{'y' if failures == 1 else 'ies'} would full-scan.", file=sys.stderr)
+                return 1
+        return 0
+    except mysql.connector.Error as exc:  # pragma: no cover - manual script
+        print(f"MySQL error: {exc}", file=sys.stderr)
+        if conn:
+            conn.rollback()
+        return 1
+    finally:
+        if conn and conn.is_connected():
+            conn.close()
+
+
+if __name__ == "__main__":  # pragma: no cover - manual script
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Secondary indexes for the per-request queries and (uid, sid, passID) answer keys.
+
+Until now the schema only had primary keys, so every participant lookup
+full-scanned its table. tb5_passQop/tb15_prac_passQop also get the unique
+key that `upsert_pass_answers` relies on; duplicate rows left behind by
+double-submits are collapsed to the newest one first.
+"""
+
+
+def upgrade(ctx):
+    ctx.ensure_index("output1_url", "idx_output1_url_sid_uid_page", ["sid", "uid", "pageTypeID"])
+
+    ctx.delete_duplicates("tb5_passQop", "tb5id", ["uid", "sid", "passID"])
+    ctx.ensure_index("tb5_passQop", "uq_passqop", ["uid", "sid", "passID"], unique=True)
+    ctx.delete_duplicates("tb15_prac_passQop", "tb15id", ["uid", "sid", "passID"])
+    ctx.ensure_index("tb15_prac_passQop", "uq_prac_passqop", ["uid", "sid", "passID"], unique=True)
+
+    ctx.ensure_index("tb6_taskTime", "idx_tasktime_uid_sid_top", ["uid", "sid", "topID", "timeStart"])
+    ctx.ensure_index("tb16_prac_taskTime", "idx_prac_tasktime_uid_sid_top", ["uid", "sid", "topID", "timeStart"])
+
+    ctx.ensure_index("tb21_questions", "idx_questions_passid", ["passID"])
+    ctx.ensure_index("tb22_multiQop", "idx_multiqop_uid_sid_pass", ["uid", "sid", "passID"])
+    ctx.ensure_index("tb1_user", "idx_user_sid", ["sid"])
@@ -0,0 +1,10 @@
+"""Per-item client-side response times for the letter comparison rounds.
+
+`client_rt_ms` is the time in milliseconds from page load to the
+participant's (latest) choice for the item, as measured in the browser.
+Per-item RTs are the differences between consecutive items in time order.
+"""
+
+
+def upgrade(ctx):
+    ctx.ensure_column("tb27_letter_item", "client_rt_ms", "int(11) DEFAULT NULL AFTER `is_correct`")
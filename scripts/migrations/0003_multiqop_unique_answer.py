@@ -0,0 +1,11 @@
+"""One graded row per participant and question in tb22_multiQop.
+
+Without a unique key the `/done` upsert never matched an existing row, so
+every resubmission inserted a fresh copy of each answer. Duplicates are
+collapsed to the newest row before the key is added.
+"""
+
+
+def upgrade(ctx):
+    ctx.delete_duplicates("tb22_multiQop", "tb22id", ["uid", "sid", "questionID"])
+    ctx.ensure_index("tb22_multiQop", "uq_multiqop_question", ["uid", "sid", "questionID"], unique=True)
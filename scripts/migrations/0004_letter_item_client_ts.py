@@ -0,0 +1,11 @@
+"""Browser epoch time of each letter comparison choice.
+
+`client_rt_ms` counts from page load and restarts when the page is
+reloaded, so it cannot order autosaves across a reload. `client_ts_ms`
+(`Date.now()` in the browser) decides which of two autosaved choices for
+an item is newer; `client_rt_ms` keeps the time since page load.
+"""
+
+
+def upgrade(ctx):
+    ctx.ensure_column("tb27_letter_item", "client_ts_ms", "bigint DEFAULT NULL AFTER `client_rt_ms`")
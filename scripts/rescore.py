@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Rescore vocabulary, letter comparison and comprehension answers in bulk.
+
+Use this after correcting an answer key (in `src/services/scoring.py` or in
+`tb21_questions.correctAns`). Every participant's stored responses are read
+in one pass per table, graded with vectorised NumPy comparisons against the
+compiled keys, and only the rows whose score actually changes are written
+back, one multi-row UPDATE per `--batch-size` rows:
+
+* vocab    - `tb11_profile.vocScore` from voc1..voc15
+* letters  - `tb27_letter_item.correct_answer` / `is_correct`, then the
+             per-round totals in `tb11_profile.lcOneScore` / `lcTwoScore`
+* mc       - `tb22_multiQop.isCorrect` against `tb21_questions.correctAns`
+
+Each batch is committed on its own; rescoring is idempotent, so an
+interrupted run is finished by running it again.
+
+Usage example:
+
+    export MYSQL_HOST=localhost
+    export MYSQL_USER=root
+    export MYSQL_PASSWORD=secret
+    export MYSQL_DB=cogsearch_textsearch3
+    python scripts/rescore.py --dry-run          # report what would change
+    python scripts/rescore.py --only vocab mc    # rescore selected parts
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import mysql.connector
+import numpy as np
+
+DEFAULT_SCHEMA = os.getenv("MYSQL_DB", "cogsearch_textsearch3")
+SCORING_MODULE = Path(__file__).resolve().parent.parent / "src" / "services" / "scoring.py"
+PARTS = ("vocab", "letters", "mc")
+
+
+def load_scoring():
+    # Load the answer keys by path: importing `src` would create the app.
+    spec = importlib.util.spec_from_file_location("cogsearch_scoring", SCORING_MODULE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_connection(schema: str):
+    return mysql.connector.connect(
+        host=os.getenv("MYSQL_HOST", "localhost"),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", ""),
+        database=schema,
+    )
+
+
+def _strings(values, width: int) -> np.ndarray:
+    return np.array(["" if v is None else str(v).strip() for v in values], dtype=f"U{width}")
+
+
+def batch_update(
+    conn,
+    table: str,
+    key_columns: Sequence[str],
+    set_columns: Sequence[str],
+    rows: List[tuple],
+    batch_size: int,
+) -> None:
+    """UPDATE `table` from `rows` of (*set values, *key values), one statement per batch."""
+    columns = list(set_columns) + list(key_columns)
+    select = "SELECT " + ", ".join(f"%s AS `{c}`" for c in columns)
+    join_on = " AND ".join(f"t.`{c}` = u.`{c}`" for c in key_columns)
+    assignments = ", ".join(f"t.`{c}` = u.`{c}`" for c in set_columns)
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            derived = " UNION ALL ".join([select] * len(batch))
+            cursor.execute(
+                f"UPDATE `{table}` t JOIN ({derived}) u ON {join_on} SET {assignments}",
+                [value for row in batch for value in row],
+            )
+            conn.commit()
+    finally:
+        cursor.close()
+
+
+def rescore_vocab(cursor, scoring) -> List[tuple]:
+    """(vocScore, uid, sid) for every participant whose vocabulary score changes."""
+    voc_columns = ", ".join(f"voc{i}" for i in range(1, 16))
+    cursor.execute(f"SELECT uid, sid, {voc_columns}, vocScore FROM tb11_profile")
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+
+    answers = np.array([_strings(row[2:17], 8) for row in rows])
+    key = np.array(scoring.VOCAB_ANSWER_KEY, dtype="U8")
+    correct = answers == key
+    wrong = ~correct & (answers != scoring.VOCAB_NOT_SURE)
+    scores = np.round(correct.sum(axis=1) - scoring.VOCAB_WRONG_PENALTY * wrong.sum(axis=1), 1)
+    stored = np.array([float(row[17] or 0) for row in rows])
+
+    # Participants who never reached the vocabulary page have all-blank answers.
+    taken = (answers != "").any(axis=1)
+    changed = np.flatnonzero(taken & ~np.isclose(scores, stored))
+    return [(float(scores[i]), rows[i][0], rows[i][1]) for i in changed]
+
+
+def rescore_letters(cursor, scoring) -> Tuple[List[tuple], List[tuple]]:
+    """Changed tb27_letter_item grades and the tb11_profile round totals they move."""
+    rounds = scoring.LETTER_COMPARISON_ROUNDS
+    score_columns = scoring.LETTER_SCORE_COLUMNS
+    n_rounds = max(rounds) + 1
+    n_items = max(len(items) for items in rounds.values()) + 1
+    # key[round, item_index]; item_index is 1-based, "" marks unknown items.
+    key = np.full((n_rounds, n_items), "", dtype="U1")
+    for round_number, items in rounds.items():
+        for index, item in enumerate(items, start=1):
+            key[round_number, index] = item["answer"]
+
+    cursor.execute(
+        "SELECT id, uid, sid, round_number, item_index, response, correct_answer, is_correct "
+        "FROM tb27_letter_item"
+    )
+    rows = cursor.fetchall()
+    if not rows:
+        return [], []
+
+    round_numbers = np.array([int(row[3]) for row in rows])
+    item_indexes = np.array([int(row[4]) for row in rows])
+    known = (
+        (round_numbers > 0) & (round_numbers < n_rounds)
+        & (item_indexes > 0) & (item_indexes < n_items)
+    )
+    expected = np.full(len(rows), "", dtype="U1")
+    expected[known] = key[round_numbers[known], item_indexes[known]]
+    known &= expected != ""
+
+    responses = _strings((row[5] for row in rows), 1)
+    graded = (responses == expected).astype(np.int64)
+    stored_answers = _strings((row[6] for row in rows), 1)
+    stored_grades = np.array([int(row[7] or 0) for row in rows])
+    changed = np.flatnonzero(known & ((graded != stored_grades) | (expected != stored_answers)))
+    item_updates = [(str(expected[i]), int(graded[i]), rows[i][0]) for i in changed]
+
+    # Round totals: sum the new grades per (participant, round).
+    participants: Dict[tuple, int] = {}
+    participant_ids = np.array([participants.setdefault((row[1], row[2]), len(participants)) for row in rows])
+    groups = participant_ids * n_rounds + round_numbers
+    totals = np.bincount(groups[known], weights=graded[known], minlength=len(participants) * n_rounds)
+    present = np.bincount(groups[known], minlength=len(participants) * n_rounds) > 0
+
+    cursor.execute(f"SELECT uid, sid, {', '.join(score_columns.values())} FROM tb11_profile")
+    stored_totals = {}
+    for row in cursor.fetchall():
+        for offset, round_number in enumerate(score_columns):
+            stored_totals[(row[0], row[1], round_number)] = float(row[2 + offset] or 0)
+
+    profile_updates = []
+    for (uid, sid), pid in participants.items():
+        for round_number, column in score_columns.items():
+            group = pid * n_rounds + round_number
+            if group >= len(present) or not present[group]:
+                continue
+            stored = stored_totals.get((uid, sid, round_number))
+            if stored is not None and stored != totals[group]:
+                profile_updates.append((column, float(totals[group]), uid, sid))
+    return item_updates, profile_updates
+
+
+def rescore_mc(cursor) -> List[tuple]:
+    """(isCorrect, tb22id) for every comprehension answer whose grade changes."""
+    cursor.execute("SELECT questionID, correctAns FROM tb21_questions")
+    answer_key = {str(qid): str(ans or "").strip().lower() for qid, ans in cursor.fetchall()}
+
+    cursor.execute("SELECT tb22id, questionID, choice, isCorrect FROM tb22_multiQop")
+    rows = cursor.fetchall()
+    if not rows:
+        return []
+
+    question_ids, inverse = np.unique(_strings((row[1] for row in rows), 8), return_inverse=True)
+    compiled = np.array([answer_key.get(str(q), "") for q in question_ids], dtype="U8")
+    known = np.array([str(q) in answer_key for q in question_ids])[inverse]
+    expected = compiled[inverse]
+
+    choices = np.char.lower(_strings((row[2] for row in rows), 8))
+    graded = (choices == expected).astype(np.int64)
+    stored = np.array([int(row[3] or 0) for row in rows])
+    changed = np.flatnonzero(known & (graded != stored))
+    return [(int(graded[i]), rows[i][0]) for i in changed]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA, help="Database/schema name to rescore")
+    parser.add_argument("--only", nargs="+", choices=PARTS, default=list(PARTS), help="Parts to rescore")
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per UPDATE statement")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    scoring = load_scoring()
+    conn = get_connection(args.schema)
+    batch_size = max(args.batch_size, 1)
+    try:
+        cursor = conn.cursor()
+        try:
+            if "vocab" in args.only:
+                updates = rescore_vocab(cursor, scoring)
+                print(f"vocab: {len(updates)} vocScore value(s) change")
+                if updates and not args.dry_run:
+                    batch_update(conn, "tb11_profile", ("uid", "sid"), ("vocScore",), updates, batch_size)
+
+            if "letters" in args.only:
+                item_updates, profile_updates = rescore_letters(cursor, scoring)
+                print(f"letters: {len(item_updates)} item grade(s), {len(profile_updates)} round total(s) change")
+                if not args.dry_run:
+                    if item_updates:
+                        batch_update(
+                            conn, "tb27_letter_item", ("id",), ("correct_answer", "is_correct"), item_updates, batch_size
+                        )
+                    for column in scoring.LETTER_SCORE_COLUMNS.values():
+                        rows = [row[1:] for row in profile_updates if row[0] == column]
+                        if rows:
+                            batch_update(conn, "tb11_profile", ("uid", "sid"), (column,), rows, batch_size)
+
+            if "mc" in args.only:
+                updates = rescore_mc(cursor)
+                print(f"mc: {len(updates)} isCorrect value(s) change")
+                if updates and not args.dry_run:
+                    batch_update(conn, "tb22_multiQop", ("tb22id",), ("isCorrect",), updates, batch_size)
+        finally:
+            cursor.close()
+    except mysql.connector.Error as exc:
+        conn.rollback()
+        print(f"Rescoring failed: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+
+    if args.dry_run:
+        print("Dry run: nothing written.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
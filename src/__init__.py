@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import os
+import time
 from flask import Flask
 
 
-def create_app() -> Flask:
-    """Application factory. Config is loaded from env and instance."""
+def create_app(config: dict | None = None, warm_start: bool | None = None) -> Flask:
+    """Application factory. Config is loaded from env and instance.
+
+    `config` overrides both. With `warm_start` (default: `WARM_START`) the
+    app is warmed up before it is returned (see services/warmup.py) and a
+    per-phase startup timing report is printed.
+    """
+    started = time.perf_counter()
     # Since templates, static, and instance are now in the src package
     template_folder = os.path.join(os.path.dirname(__file__), "templates")
     static_folder = os.path.join(os.path.dirname(__file__), "static")
@@ -27,20 +34,153 @@ def create_app() -> Flask:
         # 使用非空默认值避免出现 "using password: NO"；若不匹配，请在环境变量或 instance/config.py 中覆盖
         MYSQL_PASSWORD=os.environ.get("MYSQL_PASSWORD", ""),
         MYSQL_DB=os.environ.get("MYSQL_DB", "cogsearch_textsearch3"),
+        # DB_BACKEND is mysql (the MYSQL_* server) or sqlite: an embedded
+        # file (SQLITE_PATH, instance/cogsearch.sqlite3 by default) in WAL
+        # mode with one connection per thread, for single-node pilots, tests
+        # and benchmarks. Its tables come from schema_sqlite_backup.sql.
+        DB_BACKEND=os.environ.get("DB_BACKEND", "mysql"),
+        SQLITE_PATH=os.environ.get("SQLITE_PATH", ""),
+        SQLITE_BUSY_TIMEOUT=float(os.environ.get("SQLITE_BUSY_TIMEOUT", "30")),
+        SQLITE_CREATE_SCHEMA=os.environ.get("SQLITE_CREATE_SCHEMA", "1") != "0",
+        # Connection pool: DB_POOL_SIZE connections stay open, up to
+        # DB_POOL_MAX_OVERFLOW more are opened under load; times are seconds.
+        DB_POOL_SIZE=int(os.environ.get("DB_POOL_SIZE", "5")),
+        DB_POOL_MAX_OVERFLOW=int(os.environ.get("DB_POOL_MAX_OVERFLOW", "10")),
+        DB_POOL_TIMEOUT=float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        DB_POOL_IDLE_TIMEOUT=float(os.environ.get("DB_POOL_IDLE_TIMEOUT", "300")),
+        DB_POOL_MAX_LIFETIME=float(os.environ.get("DB_POOL_MAX_LIFETIME", "3600")),
+        DB_POOL_RESET_ON_RETURN=True,
+        # Commit each request's writes once, after the view returns; a 5xx
+        # response rolls them all back. Set to 0 to commit eagerly again.
+        DB_UNIT_OF_WORK=os.environ.get("DB_UNIT_OF_WORK", "1") != "0",
+        # Page-view logging (save_url): queued and written in batches by a
+        # background thread. URL_LOG_FULL_POLICY is one of block, drop_newest,
+        # drop_oldest or sync.
+        URL_LOG_ASYNC=os.environ.get("URL_LOG_ASYNC", "1") != "0",
+        URL_LOG_BATCH_SIZE=int(os.environ.get("URL_LOG_BATCH_SIZE", "100")),
+        URL_LOG_FLUSH_INTERVAL=float(os.environ.get("URL_LOG_FLUSH_INTERVAL", "1.0")),
+        URL_LOG_QUEUE_SIZE=int(os.environ.get("URL_LOG_QUEUE_SIZE", "10000")),
+        URL_LOG_FULL_POLICY=os.environ.get("URL_LOG_FULL_POLICY", "block"),
+        URL_LOG_BLOCK_TIMEOUT=float(os.environ.get("URL_LOG_BLOCK_TIMEOUT", "0.5")),
+        # Fill in each page view's time_interval/passRT when the next view is
+        # logged; set to 0 to fall back to the end-of-study backfill in /done.
+        URL_LOG_INCREMENTAL_INTERVALS=os.environ.get("URL_LOG_INCREMENTAL_INTERVALS", "1") != "0",
+        # Topics, subtopics, passages and questions are read once into memory;
+        # `flask --app src reload-stimuli` makes every process reload them.
+        STIMULUS_CACHE_PRELOAD=os.environ.get("STIMULUS_CACHE_PRELOAD", "1") != "0",
+        STIMULUS_CACHE_CHECK_INTERVAL=float(os.environ.get("STIMULUS_CACHE_CHECK_INTERVAL", "2")),
+        # Ask C1-C4 on one page and save them together (task_ratings /
+        # prac_ratings) instead of four separate pages.
+        RATINGS_COMBINED=os.environ.get("RATINGS_COMBINED", "0") == "1",
+        # Session data lives server-side and the cookie only holds an id.
+        # SESSION_BACKEND is sqlite (shared by all processes on the host,
+        # stored in the instance folder), memory (per-process LRU) or cookie
+        # (Flask's signed-cookie sessions).
+        SESSION_BACKEND=os.environ.get("SESSION_BACKEND", "sqlite"),
+        SESSION_SQLITE_PATH=os.environ.get("SESSION_SQLITE_PATH", ""),
+        SESSION_MEMORY_MAX_ENTRIES=int(os.environ.get("SESSION_MEMORY_MAX_ENTRIES", "10000")),
+        # Parsed tb1_user study plans (topic/condition order, progress) kept
+        # per process; the session tells each process when its copy is stale.
+        PARTICIPANT_CACHE_MAX_ENTRIES=int(os.environ.get("PARTICIPANT_CACHE_MAX_ENTRIES", "5000")),
+        # Per-endpoint latency, DB time/query counts and template render
+        # times, served in Prometheus text format at /metrics.
+        METRICS_ENABLED=os.environ.get("METRICS_ENABLED", "1") != "0",
+        METRICS_MERGE_INTERVAL=float(os.environ.get("METRICS_MERGE_INTERVAL", "1")),
+        # /metrics and the other stats endpoints expose process internals, so
+        # they answer 404 unless STATS_ENDPOINTS_ENABLED=1. With STATS_TOKEN
+        # set, callers must also send it in the X-Stats-Token header.
+        STATS_ENDPOINTS_ENABLED=os.environ.get("STATS_ENDPOINTS_ENABLED", "0") == "1",
+        STATS_TOKEN=os.environ.get("STATS_TOKEN", ""),
+        # Every statement is counted and timed by fingerprint (see
+        # /metrics/queries); ones taking SLOW_QUERY_THRESHOLD seconds or more
+        # are appended to SLOW_QUERY_LOG (instance/slow_queries.log by
+        # default, "" prints them) with the route that ran them. 0 disables.
+        QUERY_STATS_ENABLED=os.environ.get("QUERY_STATS_ENABLED", "1") != "0",
+        QUERY_STATS_MAX_FINGERPRINTS=int(os.environ.get("QUERY_STATS_MAX_FINGERPRINTS", "2000")),
+        SLOW_QUERY_THRESHOLD=float(os.environ.get("SLOW_QUERY_THRESHOLD", "0.25")),
+        SLOW_QUERY_LOG=os.environ.get("SLOW_QUERY_LOG"),
+        # Opt-in cProfile capture of single requests: a request is profiled
+        # when it sends a token from `flask --app src profile-token` in the
+        # X-Profile-Token header, or at random with PROFILER_SAMPLE_RATE
+        # (limited to the comma-separated PROFILER_PATHS if set). A .prof
+        # file and a top-PROFILER_TOP summary land in PROFILER_DIR
+        # (instance/profiles by default). Off, nothing is installed.
+        PROFILER_ENABLED=os.environ.get("PROFILER_ENABLED", "0") == "1",
+        PROFILER_SECRET=os.environ.get("PROFILER_SECRET", ""),
+        PROFILER_SAMPLE_RATE=float(os.environ.get("PROFILER_SAMPLE_RATE", "0")),
+        PROFILER_PATHS=os.environ.get("PROFILER_PATHS", ""),
+        PROFILER_DIR=os.environ.get("PROFILER_DIR", ""),
+        PROFILER_TOP=int(os.environ.get("PROFILER_TOP", "40")),
+        PROFILER_TOKEN_MAX_AGE=float(os.environ.get("PROFILER_TOKEN_MAX_AGE", "3600")),
+        # /done hands grading and end-of-study aggregation to the background
+        # job queue (a SQLite file in the instance folder) and returns at
+        # once; `flask --app src jobs` inspects, drains and replays it. Set
+        # FINALIZE_ASYNC to 0 to finalize inline again.
+        FINALIZE_ASYNC=os.environ.get("FINALIZE_ASYNC", "1") != "0",
+        JOB_QUEUE_PATH=os.environ.get("JOB_QUEUE_PATH", ""),
+        JOB_QUEUE_WORKERS=int(os.environ.get("JOB_QUEUE_WORKERS", "2")),
+        JOB_QUEUE_MAX_ATTEMPTS=int(os.environ.get("JOB_QUEUE_MAX_ATTEMPTS", "5")),
+        JOB_QUEUE_BACKOFF=float(os.environ.get("JOB_QUEUE_BACKOFF", "2")),
+        # Warm start: before the app is returned, compile every template, open
+        # WARMUP_DB_CONNECTIONS pool connections (DB_POOL_SIZE if 0) and load
+        # the stimulus cache, then print how long each startup phase took.
+        # Run it in each worker process, not before forking.
+        WARM_START=os.environ.get("WARM_START", "0") == "1",
+        WARMUP_DB_CONNECTIONS=int(os.environ.get("WARMUP_DB_CONNECTIONS", "0")),
     )
 
     # Load instance config if present
     app.config.from_pyfile("config.py", silent=True)
+    if config:
+        app.config.update(config)
+    if warm_start is None:
+        warm_start = app.config["WARM_START"]
+
+    from .services.warmup import StartupTimings, warm_up
+
+    timings = StartupTimings()
+    timings.add("config", time.perf_counter() - started)
+
+    with timings.phase("extensions"):
+        from . import db
+        from .services.metrics import init_metrics
+        from .services.session_store import init_session_store
+
+        init_session_store(app)
+        # Before db.init_app: after_request hooks run in reverse, so request
+        # timings then include the unit-of-work commit.
+        init_metrics(app)
+        db.init_app(app)
+    if app.config["STIMULUS_CACHE_PRELOAD"] and not warm_start:
+        with timings.phase("stimulus cache"):
+            # A failed preload is not fatal; the cache loads on first lookup.
+            db.get_stimulus_cache(app).load()
 
     # Register blueprints
-    from .routes.core import core_bp
-    from .routes.practice import practice_bp
+    with timings.phase("blueprints"):
+        from .routes.core import core_bp
+        from .routes.practice import practice_bp
+
+        app.register_blueprint(core_bp)
+        app.register_blueprint(practice_bp)
+
+    from .services.profiler import init_profiler
+
+    init_profiler(app)
 
-    app.register_blueprint(core_bp)
-    app.register_blueprint(practice_bp)
+    if warm_start:
+        warm_up(app, timings)
+        print(timings.report())
+    app.extensions["startup_timings"] = timings
 
     return app
 
 
-# For `flask --app src run`
-app = create_app()
+def __getattr__(name: str):
+    # For `flask --app src run`: the module-level app is built on first
+    # access, so importing the package (app.py, scripts) does not build one.
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,23 +1,341 @@
-import mysql.connector
+import os
+import threading
 import time
-from flask import current_app
+import click
+from flask import current_app, g, has_request_context, session
+
+from .services.backends import create_backend
+from .services.finalize import PASSAGE_RT_TABLES
+from .services.job_queue import JOB_STATUSES, JobQueue
+from .services.metrics import request_timings
+from .services.query_stats import init_query_stats
+from .services.stimulus_cache import StimulusCache
+from .services.unit_of_work import UnitOfWork
+from .services.url_logger import PageViewLogger, write_page_views
+
+
+_pool_lock = threading.Lock()
+
+
+def get_pool(app=None):
+    """Return the app-wide connection pool, creating it on first use.
+
+    The pool comes from the backend chosen by `DB_BACKEND` (see
+    services/backends.py); both hand out connections the same way.
+    """
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get("db_pool")
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get("db_pool")
+            if pool is None:
+                backend = create_backend(app)
+                pool = backend.create_pool()
+                app.extensions["db_backend"] = backend
+                app.extensions["db_pool"] = pool
+    return pool
+
+
+class InstrumentedCursor:
+    """Cursor wrapper that times each statement.
+
+    The time goes into the request's timings (for /metrics) and, with the
+    row count, into the per-fingerprint query stats and slow-query log.
+    """
+
+    def __init__(self, cursor, timings=None, query_stats=None):
+        self._cursor = cursor
+        self._timings = timings
+        self._query_stats = query_stats
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, *args, **kwargs)
+        finally:
+            self._record(operation, time.perf_counter() - started)
+
+    def executemany(self, operation, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, *args, **kwargs)
+        finally:
+            self._record(operation, time.perf_counter() - started)
+
+    def _record(self, operation, elapsed: float) -> None:
+        if self._timings is not None:
+            self._timings.db_seconds += elapsed
+            self._timings.queries += 1
+        if self._query_stats is not None:
+            # Connections are buffered, so this is the rows returned (or affected).
+            rows = getattr(self._cursor, "rowcount", -1)
+            self._query_stats.record(operation, elapsed, rows if isinstance(rows, int) and rows > 0 else 0)
+
+
+class RequestConnection:
+    """Request-scoped handle on a pooled connection.
+
+    Every `get_db_connection()` call within one request returns the same
+    handle, so routes and helpers such as `save_url` share a single
+    connection. `close()` is a no-op; the underlying connection goes back to
+    the pool in `release_db_connection` at app-context teardown.
+
+    With `DB_UNIT_OF_WORK` the handle's `commit()` / `rollback()` go through
+    a `UnitOfWork`, and the request's writes are committed once, in
+    `complete_unit_of_work`.
+
+    `on_rollback()` registers a callback for in-memory state derived from
+    the writes made since the last `commit()`; it runs if those writes are
+    undone instead (rollback, aborted unit of work, or never committed).
+    Inside a unit of work `commit()` only sets a savepoint, so callbacks are
+    kept until the real COMMIT in `complete_unit_of_work` succeeds.
+    """
+
+    def __init__(self, conn, unit_of_work: bool = False, query_stats=None):
+        self._conn = conn
+        self.unit_of_work = UnitOfWork(conn) if unit_of_work else None
+        self.query_stats = query_stats
+        self._rollback_callbacks: list = []
+        # Callbacks whose writes reached a savepoint but not a real COMMIT.
+        self._savepoint_callbacks: list = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        timings = request_timings()
+        if timings is None and self.query_stats is None:
+            return cursor
+        return InstrumentedCursor(cursor, timings, self.query_stats)
+
+    def commit(self) -> None:
+        if self.unit_of_work is None:
+            self._conn.commit()
+        else:
+            self.unit_of_work.commit()
+            self._savepoint_callbacks.extend(self._rollback_callbacks)
+        self._rollback_callbacks.clear()
+
+    def rollback(self) -> None:
+        if self.unit_of_work is None:
+            self._conn.rollback()
+        else:
+            # Back to the last commit()'s savepoint; writes before it survive.
+            self.unit_of_work.rollback()
+        self._run_callbacks(self._take_uncommitted())
+
+    def on_rollback(self, callback) -> None:
+        self._rollback_callbacks.append(callback)
+
+    def unit_of_work_completed(self) -> None:
+        """The request's COMMIT succeeded: savepointed writes are durable, later ones were dropped."""
+        self._savepoint_callbacks = []
+        self._run_callbacks(self._take_uncommitted())
+
+    def run_rollback_callbacks(self) -> None:
+        """Run every callback whose writes were not really committed."""
+        callbacks = self._take_uncommitted()
+        callbacks, self._savepoint_callbacks = self._savepoint_callbacks + callbacks, []
+        self._run_callbacks(callbacks)
+
+    def _take_uncommitted(self) -> list:
+        callbacks, self._rollback_callbacks = self._rollback_callbacks, []
+        return callbacks
+
+    @staticmethod
+    def _run_callbacks(callbacks) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error in rollback callback: {e}")
+
+    def is_connected(self) -> bool:
+        # Avoid the server ping mysql.connector does here; liveness is
+        # checked by the pool on checkout.
+        return self._conn is not None
+
+    def close(self) -> None:
+        pass
+
+    def detach(self):
+        conn, self._conn = self._conn, None
+        return conn
 
 
 def get_db_connection():
-    """Create a new DB connection using Flask config."""
-    connection_args = {
-        "host": current_app.config.get("MYSQL_HOST", "localhost"),
-        "user": current_app.config.get("MYSQL_USER", "root"),
-        "password": current_app.config.get("MYSQL_PASSWORD", ""),
-        "database": current_app.config.get("MYSQL_DB", "cogsearch_textsearch3"),
-    }
+    """Return the request-scoped pooled DB connection, checking it out on first use."""
+    link = g.get("_db_conn")
+    if link is None:
+        link = RequestConnection(
+            get_pool().acquire(),
+            unit_of_work=has_request_context() and current_app.config.get("DB_UNIT_OF_WORK", True),
+            query_stats=current_app.extensions.get("query_stats"),
+        )
+        g._db_conn = link
+        timings = request_timings()
+        if timings is not None:
+            timings.checkouts += 1
+    return link
+
+
+def complete_unit_of_work(response):
+    """after_request hook: commit the request's writes, or roll them all back on a 5xx."""
+    link = g.get("_db_conn")
+    uow = getattr(link, "unit_of_work", None)
+    if uow is None:
+        return response
+    try:
+        if response.status_code >= 500:
+            uow.abort()
+        else:
+            uow.complete()
+    except Exception as e:
+        print(f"DB Error committing request: {e}")
+        try:
+            uow.abort()
+        except Exception:
+            pass
+        link.run_rollback_callbacks()
+        return current_app.make_response((f"Database error: {e}", 500))
+    if response.status_code >= 500:
+        link.run_rollback_callbacks()
+    else:
+        link.unit_of_work_completed()
+    return response
+
+
+def release_db_connection(exc=None) -> None:
+    """Teardown hook: hand the request's connection back to the pool."""
+    link = g.pop("_db_conn", None)
+    if link is None:
+        return
+    # Whatever was not committed by now is rolled back.
+    link.run_rollback_callbacks()
+    conn = link.detach()
+    if conn is None:
+        return
+    discard = False
+    if exc is not None:
+        try:
+            conn.rollback()
+        except Exception:
+            discard = True
+    get_pool().release(conn, discard=discard)
+
+
+def init_app(app) -> None:
+    init_query_stats(app)
+    app.after_request(complete_unit_of_work)
+    app.teardown_appcontext(release_db_connection)
+    app.cli.add_command(reload_stimuli_command)
+    app.cli.add_command(jobs_command)
+
+
+def get_stimulus_cache(app=None) -> StimulusCache:
+    """Return the app-wide cache of topics, subtopics, passages and questions."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get("stimulus_cache")
+    if cache is None:
+        pool = get_pool(app)
+        with _pool_lock:
+            cache = app.extensions.get("stimulus_cache")
+            if cache is None:
+                cache = StimulusCache(
+                    pool.acquire,
+                    pool.release,
+                    stamp_path=os.path.join(app.instance_path, "stimulus_cache.stamp"),
+                    check_interval=app.config.get("STIMULUS_CACHE_CHECK_INTERVAL", 2.0),
+                )
+                app.extensions["stimulus_cache"] = cache
+    return cache
+
+
+@click.command("reload-stimuli")
+def reload_stimuli_command():
+    """Invalidate the stimulus cache in every running app process."""
+    cache = get_stimulus_cache()
+    cache.invalidate()
+    if cache.load():
+        click.echo(f"Stimulus cache invalidated; content version {cache.version}")
+    else:
+        click.echo("Stimulus cache invalidated; could not read the tables to report a version")
+
+
+def get_job_queue(app=None) -> JobQueue:
+    """Return the app-wide durable background job queue."""
+    app = app or current_app._get_current_object()
+    jobs = app.extensions.get("job_queue")
+    if jobs is None:
+        with _pool_lock:
+            jobs = app.extensions.get("job_queue")
+            if jobs is None:
+                config = app.config
+                jobs = JobQueue(
+                    config.get("JOB_QUEUE_PATH") or os.path.join(app.instance_path, "jobs.sqlite3"),
+                    workers=config.get("JOB_QUEUE_WORKERS", 2),
+                    max_attempts=config.get("JOB_QUEUE_MAX_ATTEMPTS", 5),
+                    backoff=config.get("JOB_QUEUE_BACKOFF", 2.0),
+                    context=app.app_context,
+                )
+                for kind, handler in app.extensions.get("job_handlers", {}).items():
+                    jobs.register(kind, handler)
+                app.extensions["job_queue"] = jobs
+    return jobs
+
+
+def register_job_handler(app, kind: str, handler) -> None:
+    """Run `handler` for jobs of `kind`, without opening the queue before it is used."""
+    with _pool_lock:
+        app.extensions.setdefault("job_handlers", {})[kind] = handler
+        jobs = app.extensions.get("job_queue")
+    if jobs is not None:
+        jobs.register(kind, handler)
+
 
-    # Only set auth_plugin if explicitly provided in config to avoid mismatches
-    auth_plugin = current_app.config.get("MYSQL_AUTH_PLUGIN")
-    if auth_plugin:
-        connection_args["auth_plugin"] = auth_plugin
+@click.group("jobs")
+def jobs_command():
+    """Inspect, drain and replay background jobs."""
 
-    return mysql.connector.connect(**connection_args)
+
+@jobs_command.command("status")
+@click.option("--status", "status", type=click.Choice(JOB_STATUSES), default=None, help="Only list jobs in this state.")
+@click.option("--limit", type=int, default=20, show_default=True)
+def jobs_status_command(status, limit):
+    """Show job counts and the most recently touched jobs."""
+    jobs = get_job_queue()
+    click.echo(" ".join(f"{name}={count}" for name, count in jobs.counts().items()))
+    for job in jobs.jobs(status, limit):
+        line = f"{job['key']}  {job['status']}  attempts={job['attempts']}"
+        if job["last_error"]:
+            line += f"  error={job['last_error']}"
+        click.echo(line)
+
+
+@jobs_command.command("drain")
+@click.option("--now", "ignore_backoff", is_flag=True, help="Also run jobs still waiting out a retry backoff.")
+def jobs_drain_command(ignore_backoff):
+    """Run every due job in this process until the queue is empty."""
+    ran = get_job_queue().run_pending(ignore_backoff=ignore_backoff)
+    click.echo(f"Ran {ran} job(s)")
+
+
+@jobs_command.command("replay")
+@click.argument("key", required=False)
+@click.option("--drain/--no-drain", default=True, show_default=True, help="Run the replayed jobs right away.")
+def jobs_replay_command(key, drain):
+    """Make failed jobs (or the job KEY) due again."""
+    jobs = get_job_queue()
+    click.echo(f"Replaying {jobs.replay(key)} job(s)")
+    if drain:
+        click.echo(f"Ran {jobs.run_pending()} job(s)")
 
 
 def get_time_stamp_cdt():
@@ -27,42 +345,88 @@ def get_time_stamp_cdt():
     return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - 3600*5))
 
 
+def get_page_logger(app=None) -> PageViewLogger:
+    """Return the app-wide background `output1_url` writer."""
+    app = app or current_app._get_current_object()
+    logger = app.extensions.get("page_logger")
+    if logger is None:
+        pool = get_pool(app)
+        with _pool_lock:
+            logger = app.extensions.get("page_logger")
+            if logger is None:
+                config = app.config
+                logger = PageViewLogger(
+                    pool.acquire,
+                    pool.release,
+                    batch_size=config.get("URL_LOG_BATCH_SIZE", 100),
+                    flush_interval=config.get("URL_LOG_FLUSH_INTERVAL", 1.0),
+                    max_queue=config.get("URL_LOG_QUEUE_SIZE", 10000),
+                    full_policy=config.get("URL_LOG_FULL_POLICY", "block"),
+                    block_timeout=config.get("URL_LOG_BLOCK_TIMEOUT", 0.5),
+                )
+                app.extensions["page_logger"] = logger
+    return logger
+
+
+def flush_page_log(timeout: float | None = 5.0) -> bool:
+    """Wait until queued page views are in `output1_url` (e.g. before reading them back)."""
+    if not current_app.config.get("URL_LOG_ASYNC", True):
+        return True
+    return get_page_logger().flush(timeout)
+
+
+def _advance_page_view_tail(uid, sid, unix_time: int, pageTypeID, passID):
+    """Swap the participant's last page view in the session for this one.
+
+    Returns the previous view as `(unixTime, pageTypeID, passID)` so the
+    logger can fill in its `time_interval` now instead of at `/done`. The
+    dwell time of a reading page is also remembered as `last_passRT`, so
+    the rating upsert can seed `passRT` when it creates the answer row.
+    """
+    if not has_request_context():
+        return None
+    tail = session.get("url_tail")
+    session["url_tail"] = [uid, sid, unix_time, pageTypeID, passID]
+    if not tail or tail[0] != uid or tail[1] != sid:
+        return None
+    previous = (tail[2], tail[3], tail[4])
+    if previous[1] in PASSAGE_RT_TABLES:
+        session["last_passRT"] = [previous[2], abs(unix_time - previous[0])]
+    return previous
+
+
 def save_url(uid, sid, topID, subtopID, conID, passID, pageTypeID, pageTitle, url):
+    """Record a page view in `output1_url`.
+
+    With `URL_LOG_ASYNC` (the default) the row is handed to the background
+    page logger and this returns without touching the database; otherwise
+    it is inserted on the request connection as before. Either way the
+    participant's previous view gets its `time_interval` as this one is
+    written.
+    """
+    unix_time = int(time.time())
+    row = (
+        uid,
+        sid,
+        topID,
+        subtopID,
+        conID,
+        passID,
+        pageTypeID,
+        get_time_stamp_cdt(),
+        unix_time,
+        0,
+        url,
+        pageTitle,
+    )
     try:
-        link = get_db_connection()
-        cursor = link.cursor()
-        time_stamp = get_time_stamp_cdt()
-        unix_time = int(time.time())
-        insert_query = """
-            INSERT INTO output1_url
-                (uid, sid, topID, subtopID, conID, passID, pageTypeID,
-                 time_stamp, unixTime, time_interval, url, pageTitle)
-            VALUES
-                (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(
-            insert_query,
-            (
-                uid,
-                sid,
-                topID,
-                subtopID,
-                conID,
-                passID,
-                pageTypeID,
-                time_stamp,
-                unix_time,
-                0,
-                url,
-                pageTitle,
-            ),
-        )
-        link.commit()
+        previous = None
+        if current_app.config.get("URL_LOG_INCREMENTAL_INTERVALS", True):
+            previous = _advance_page_view_tail(uid, sid, unix_time, pageTypeID, passID)
+        if current_app.config.get("URL_LOG_ASYNC", True):
+            return get_page_logger().log(row, previous)
+        write_page_views(get_db_connection(), [(row, previous)])
         return True
     except Exception as e:
         print(f"DB Error in save_url: {e}")
         return False
-    finally:
-        if link and link.is_connected():
-            cursor.close()
-            link.close()
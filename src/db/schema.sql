@@ -21,7 +21,8 @@ CREATE TABLE `output1_url` (
     `time_interval` int(11) NOT NULL,
     `url` varchar(100) NOT NULL,
     `pageTitle` varchar(100) NOT NULL,
-    PRIMARY KEY (`op1ID`)
+    PRIMARY KEY (`op1ID`),
+    KEY `idx_output1_url_sid_uid_page` (`sid`, `uid`, `pageTypeID`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb1_user
@@ -36,7 +37,8 @@ CREATE TABLE `tb1_user` (
     `conDone` int(11) NOT NULL,
     `signedConsent` varchar(8) NOT NULL,
     `signedDate` varchar(50) NOT NULL,
-    PRIMARY KEY (`uid`)
+    PRIMARY KEY (`uid`),
+    KEY `idx_user_sid` (`sid`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb2_topic
@@ -86,7 +88,8 @@ CREATE TABLE `tb5_passQop` (
     `c3Ans` int(11) NOT NULL DEFAULT 0,
     `c4Ans` int(11) NOT NULL DEFAULT 0,
     `passRT` int(11) NOT NULL DEFAULT 0,
-    PRIMARY KEY (`tb5id`)
+    PRIMARY KEY (`tb5id`),
+    UNIQUE KEY `uq_passqop` (`uid`, `sid`, `passID`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb6_taskTime
@@ -100,7 +103,8 @@ CREATE TABLE `tb6_taskTime` (
     `timeEnd` int(10) NOT NULL,
     `timeStartStamp` varchar(50) NOT NULL,
     `timeEndStamp` varchar(50) NOT NULL,
-    PRIMARY KEY (`tb6id`)
+    PRIMARY KEY (`tb6id`),
+    KEY `idx_tasktime_uid_sid_top` (`uid`, `sid`, `topID`, `timeStart`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb7_topicSummary
@@ -279,7 +283,8 @@ CREATE TABLE `tb15_prac_passQop` (
     `c3Ans` int(11) NOT NULL,
     `c4Ans` int(11) NOT NULL DEFAULT 0,
     `passRT` int(11) NOT NULL,
-    PRIMARY KEY (`tb15id`)
+    PRIMARY KEY (`tb15id`),
+    UNIQUE KEY `uq_prac_passqop` (`uid`, `sid`, `passID`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb16_prac_taskTime
@@ -293,7 +298,8 @@ CREATE TABLE `tb16_prac_taskTime` (
     `timeEnd` int(10) NOT NULL,
     `timeStartStamp` varchar(50) NOT NULL,
     `timeEndStamp` varchar(50) NOT NULL,
-    PRIMARY KEY (`tb16id`)
+    PRIMARY KEY (`tb16id`),
+    KEY `idx_prac_tasktime_uid_sid_top` (`uid`, `sid`, `topID`, `timeStart`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb17_prac_topicSummary
@@ -336,7 +342,8 @@ CREATE TABLE `tb21_questions` (
     `choiceC` text NOT NULL,
     `choiceD` text NOT NULL,
     `correctAns` varchar(10) NOT NULL,
-    PRIMARY KEY (`questionID`)
+    PRIMARY KEY (`questionID`),
+    KEY `idx_questions_passid` (`passID`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb22_multiQop
@@ -353,7 +360,9 @@ CREATE TABLE `tb22_multiQop` (
     `passOrder` varchar(4) NOT NULL,
     `choice` varchar(4) NOT NULL,
     `isCorrect` int(11) NOT NULL,
-    PRIMARY KEY (`tb22id`)
+    PRIMARY KEY (`tb22id`),
+    UNIQUE KEY `uq_multiqop_question` (`uid`, `sid`, `questionID`),
+    KEY `idx_multiqop_uid_sid_pass` (`uid`, `sid`, `passID`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- tb27_letter_item
@@ -369,6 +378,8 @@ CREATE TABLE `tb27_letter_item` (
     `correct_answer` char(1) NOT NULL,
     `response` char(1) NOT NULL,
     `is_correct` tinyint(1) NOT NULL,
+    `client_rt_ms` int(11) DEFAULT NULL,
+    `client_ts_ms` bigint DEFAULT NULL,
     `created_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
     `updated_at` datetime(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
     PRIMARY KEY (`id`),
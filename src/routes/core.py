@@ -3,6 +3,8 @@ from __future__ import annotations
 import time
 from flask import (
     Blueprint,
+    current_app,
+    g,
     jsonify,
     redirect,
     render_template,
@@ -11,8 +13,31 @@ from flask import (
     url_for,
 )
 
-from src.db import get_db_connection, get_time_stamp_cdt, save_url
-from src.services.utils import list_order, format_pass_id, save_pass_answer
+from src.db import (
+    flush_page_log,
+    get_db_connection,
+    get_job_queue,
+    get_page_logger,
+    get_stimulus_cache,
+    get_time_stamp_cdt,
+    register_job_handler,
+    save_url,
+)
+from src.services.finalize import finalize_page_log
+from src.services.metrics import stats_endpoint
+from src.services.participant import advance_condition, get_participant_context, start_participant
+from src.services.scoring import LETTER_COMPARISON_ROUNDS, grade_choice, score_vocab
+from src.services.utils import (
+    VisitedSubtopics,
+    format_pass_id,
+    get_pass_manifest,
+    load_visited_subtopics,
+    parse_ratings,
+    save_pass_answer,
+    save_visited_subtopics,
+    set_pass_manifest,
+    upsert_pass_answers,
+)
 
 
 FORMAL_DURATION_DEFAULT_MINUTES = 15
@@ -22,34 +47,6 @@ FORMAL_DURATION_MINUTES_TO_SECONDS = {
 }
 
 
-LETTER_COMPARISON_ROUNDS = {
-    1: [
-        {"left": "PRDBZTYFN", "right": "PRDBZTYFN", "answer": "S"},
-        {"left": "NCWJDZ", "right": "NCMJDZ", "answer": "D"},
-        {"left": "KHW", "right": "KBW", "answer": "D"},
-        {"left": "ZRBGMF", "right": "ZRBCMF", "answer": "D"},
-        {"left": "BTH", "right": "BYH", "answer": "D"},
-        {"left": "XWKQRYCNZ", "right": "XWKQRYCNZ", "answer": "S"},
-        {"left": "HNPDLK", "right": "HNPDLK", "answer": "S"},
-        {"left": "WMQTRSGLZ", "right": "WMQTRZGLZ", "answer": "D"},
-        {"left": "JPN", "right": "JPN", "answer": "S"},
-        {"left": "QLXSVT", "right": "QLNSVT", "answer": "D"},
-    ],
-    2: [
-        {"left": "YXHKZVFPB", "right": "YXHKZVFPD", "answer": "D"},
-        {"left": "RJZ", "right": "RJZ", "answer": "S"},
-        {"left": "CLNPZD", "right": "CLNPZD", "answer": "S"},
-        {"left": "DCBPFHXYJ", "right": "DCBPFHXYJ", "answer": "S"},
-        {"left": "MWR", "right": "ZWR", "answer": "D"},
-        {"left": "LPKXZW", "right": "LPKXZW", "answer": "S"},
-        {"left": "TZL", "right": "TZQ", "answer": "D"},
-        {"left": "CSDBFPHXZ", "right": "CSDBFPHXZ", "answer": "S"},
-        {"left": "QHZXPC", "right": "QHZWPC", "answer": "D"},
-        {"left": "JNWXHPFBD", "right": "JNWXHPFMD", "answer": "D"},
-    ],
-}
-
-
 core_bp = Blueprint("core", __name__)
 
 
@@ -116,8 +113,8 @@ def _formal_pending_redirect():
         if last_page:
             params["lastPage"] = last_page
         return url_for("core.task_b", **params)
-    if stage == "c1":
-        return url_for("core.task_c1", fid=fid)
+    if stage == "c1" or current_app.config.get("RATINGS_COMBINED"):
+        return _formal_ratings_url(fid)
     if stage == "c2":
         return url_for("core.task_c2", fid=fid or "same")
     if stage == "c3":
@@ -127,8 +124,49 @@ def _formal_pending_redirect():
     return None
 
 
+def _formal_ratings_url(fid: str) -> str:
+    """First rating page after a passage: C1, or all four at once with RATINGS_COMBINED."""
+    if current_app.config.get("RATINGS_COMBINED"):
+        return url_for("core.task_ratings", fid=fid)
+    return url_for("core.task_c1", fid=fid)
+
+
 def _is_formal_rating_submission() -> bool:
-    return request.method == "POST" and request.form.get("qid") in {"c3", "c4"}
+    return request.method == "POST" and request.form.get("qid") in {"c3", "c4", "ratings"}
+
+
+def _formal_c4_action_url(fid: str) -> str:
+    """Where the C4 (or combined ratings) form submits, depending on the passage exit."""
+    if fid == "same":
+        return url_for('core.task_b', subtop=session.get('subtopID', ''), passOrd=session.get('nextPassOrder', 1), lastPage='c4')
+    if fid == "back":
+        return url_for('core.task_a', fid='back', subtop=session.get('subtopID', ''), lastPage='c4')
+    if fid == "done":
+        return url_for('core.k2', lastPage='c4')
+    return url_for('core.k2', lastPage='unknown')
+
+
+@core_bp.before_request
+def _validate_combined_ratings():
+    """Check a combined c1-c4 submission before the destination route runs."""
+    g.combined_ratings = None
+    if request.method != "POST" or request.form.get("qid") != "ratings":
+        return None
+    try:
+        g.combined_ratings = parse_ratings(request.form)
+    except ValueError as e:
+        return f"Invalid ratings: {e}", 400
+    return None
+
+
+def _save_combined_ratings() -> bool:
+    """Persist a validated combined submission with one write; False for single-question posts."""
+    ratings = g.get("combined_ratings")
+    if not ratings:
+        return False
+    pass_id = request.form.get('savepassid', '').strip() or None
+    upsert_pass_answers(ratings, table="tb5_passQop", pass_id=pass_id)
+    return True
 
 
 @core_bp.route("/")
@@ -205,6 +243,8 @@ def demographic():
         row = cursor.fetchone()
         if row and row[0]:
             session["uid"] = row[0]
+            # A new participant has answered nothing yet.
+            set_pass_manifest(session["uid"], sid, [])
 
         bmv = request.form.get("demog_bm", "").strip()
         if bmv:
@@ -290,26 +330,13 @@ def settings():
     if not uid:
         return redirect(url_for("core.index"))
 
-    link = get_db_connection()
-    try:
-        cursor = link.cursor(dictionary=True)
-        cursor.execute("SELECT topIDorder, taskDone FROM tb1_user WHERE uid = %s", (uid,))
-        user_data = cursor.fetchone()
-    finally:
-        if link and link.is_connected():
-            cursor.close()
-            link.close()
-
-    if not user_data:
+    participant = get_participant_context(uid, session.get("sid", ""))
+    if participant is None:
         return "User data not found", 404
 
-    topIDorder, taskDone = user_data.get("topIDorder"), user_data.get("taskDone")
-    task_array = list_order(topIDorder, 1) if topIDorder else []
-    current_topID = task_array[taskDone] if (isinstance(taskDone, int) and 0 <= taskDone < len(task_array)) else ""
-
     return render_template(
         "settings.html",
-        current_topID=current_topID,
+        current_topID=participant.current_topic,
         user_id=uid,
         session_id=session.get("sid"),
     )
@@ -342,6 +369,13 @@ def handle_save_url():
     return jsonify({"status": "ok"}), 200
 
 
+@core_bp.route("/url_log_stats")
+@stats_endpoint
+def url_log_stats():
+    """Queue depth, flush latency and drop counters of the background page logger."""
+    return jsonify(get_page_logger().stats())
+
+
 # --- Task (non-practice) routes kept under core for now ---
 
 @core_bp.route("/instruction", methods=["GET", "POST"])
@@ -355,7 +389,6 @@ def instruction():
     topID = "1"
     try:
         link = get_db_connection()
-        cursor = link.cursor()
 
         strDomain = "01#"
         # Ensure uid is an integer before modulo operation to avoid runtime errors
@@ -377,14 +410,7 @@ def instruction():
         else:
             strCon = "3#2#1#3#2#1#3#2#1#3#2#1#"
 
-        cursor.execute(
-            """
-            UPDATE tb1_user
-            SET topIDorder=%s, conIDorder=%s
-            WHERE sid=%s AND uid=%s
-            """,
-            (strDomain, strCon, sid, uid),
-        )
+        start_participant(uid, sid, strDomain, strCon)
 
         pageTypeID = "instruction"
         pageTitle = "Instruction"
@@ -398,7 +424,6 @@ def instruction():
         return f"Database error: {e}", 500
     finally:
         if link and link.is_connected():
-            cursor.close()
             link.close()
 
     duration_minutes = get_formal_duration_minutes()
@@ -429,7 +454,7 @@ def task_a():
     session['topID'] = topID
 
     link = None
-    visited_subtop = []
+    visited_subtop = load_visited_subtopics()
     try:
         link = get_db_connection()
         cursor = link.cursor()
@@ -460,22 +485,18 @@ def task_a():
                     get_time_stamp_cdt(),
                 ),
             )
-            session['visitedSub'] = ''
-            visited_subtop = []
+            visited_subtop = VisitedSubtopics()
 
         elif fid in ["back", "next", "complete"]:
             session['lastPageSwitchUnixTime'] = int(time.time())
-            current = session.get('visitedSub', '')
-            current_list = [x for x in current.split(',') if x]
-            if subtop_param and subtop_param not in current_list:
-                current_list.append(subtop_param)
-            session['visitedSub'] = ','.join(current_list)
-            visited_subtop = current_list
+            if subtop_param:
+                visited_subtop.add(subtop_param)
 
             if lastPage == "c4" and request.method == 'POST':
                 ans = request.form.get('ans', '').strip()
                 if ans:
-                    save_pass_answer('c4', ans, table="tb5_passQop")
+                    if not _save_combined_ratings():
+                        save_pass_answer('c4', ans, table="tb5_passQop")
                     cursor.execute(
                         """
                         UPDATE tb6_taskTime
@@ -492,56 +513,35 @@ def task_a():
                         ),
                     )
                     # Increment conDone by 1
-                    cursor.execute(
-                        "UPDATE tb1_user SET conDone = conDone + 1 WHERE sid = %s AND uid = %s",
-                        (sid, uid),
-                    )
+                    advance_condition(uid, sid)
                 session.pop('formal_pending_stage', None)
                 session.pop('formal_pending_passID', None)
                 session.pop('formal_pending_fid', None)
                 session.pop('formal_last_page', None)
 
+        save_visited_subtopics(visited_subtop)
+
         # Load subtopics
-        cursor.execute("SELECT * FROM tb3_subtopic WHERE topID=%s ORDER BY subtopID", (topID,))
-        subtopics = cursor.fetchall()
-        all_subtops = [str(row[0]) for row in subtopics]
-        all_subtops_sorted = sorted(
-            all_subtops,
-            key=lambda value: int(value) if str(value).isdigit() else value,
-        )
-        session['formal_all_subtops'] = all_subtops_sorted
+        subtopics = get_stimulus_cache().subtopics(topID)
+        all_subtops_mask = get_stimulus_cache().subtopic_mask(topID)
+        session.pop('formal_all_subtops', None)
 
         # If lastPage == c3 and POST, update c3Ans and maybe redirect
         if lastPage == "c3" and request.method == 'POST':
             ans = request.form.get('ans', '')
             passid_to_save = request.form.get('savepassid', '')
             if ans:
-                cursor.execute(
-                    """
-                    UPDATE tb5_passQop SET c3Ans=%s WHERE sid=%s AND uid=%s AND passID=%s
-                    """,
-                    (ans, sid, uid, passid_to_save),
-                )
+                save_pass_answer('c3', ans, table="tb5_passQop", pass_id=passid_to_save)
                 # Clear pending formal state after saving c3 answer
                 session.pop('formal_pending_stage', None)
                 session.pop('formal_pending_passID', None)
                 session.pop('formal_pending_fid', None)
                 session.pop('formal_last_page', None)
 
-            # Compare visited subtopics with the full set (typed as strings)
-            visited_sub = session.get('visitedSub', '')
-            visited_list = sorted(
-                (x for x in visited_sub.split(',') if x),
-                key=lambda value: int(value) if value.isdigit() else value,
-            )
-            # retain visited list in session
-            session['visitedSub'] = ','.join(visited_list)
-
         link.commit()
 
         # Load topic
-        cursor.execute("SELECT * FROM tb2_topic WHERE topID=%s", (topID,))
-        topic_result = cursor.fetchone()
+        topic_result = get_stimulus_cache().topic(topID)
 
         # save_url
         pageTypeID = "a"
@@ -551,15 +551,7 @@ def task_a():
         # define redirect if timer runs out
         session['redirectPage'] = url_for('core.task_b', lastPage='a')
 
-        if not visited_subtop:
-            visited_sub = session.get('visitedSub', '')
-            visited_subtop = [x for x in visited_sub.split(',') if x]
-
-        visited_sorted = sorted(
-            (str(x) for x in visited_subtop if str(x)),
-            key=lambda value: int(value) if value.isdigit() else value,
-        )
-        all_completed = visited_sorted == all_subtops_sorted and bool(all_subtops_sorted)
+        all_completed = visited_subtop.covers(all_subtops_mask)
 
         return render_template(
             'task_a.html',
@@ -593,30 +585,13 @@ def task_b():
     lastPage = request.args.get('lastPage', '')
 
     # Consume conIDorder and update session['conID'] before using it
-    pre_link = None
-    pre_cursor = None
     try:
-        pre_link = get_db_connection()
-        pre_cursor = pre_link.cursor(dictionary=True)
-        pre_cursor.execute(
-            "SELECT conIDorder, conDone FROM tb1_user WHERE uid = %s AND sid = %s",
-            (uid, sid),
-        )
-        user_row = pre_cursor.fetchone()
-        if user_row:
-            con_order_str = user_row.get('conIDorder') or ''
-            con_done = user_row.get('conDone') or 0
-            if con_order_str:
-                parts = [p for p in con_order_str.split('#') if p]
-                if isinstance(con_done, int) and 0 <= con_done < len(parts):
-                    session['conID'] = safe_int_param(parts[con_done], 1)
+        participant = get_participant_context(uid, sid)
+        if participant is not None and participant.current_condition is not None:
+            session['conID'] = participant.current_condition
     except Exception as _:
         # If anything goes wrong here, fall back to existing session value
         pass
-    finally:
-        if pre_link and pre_link.is_connected():
-            pre_cursor.close()
-            pre_link.close()
 
     conID = safe_int_param(session.get('conID'), 1)
 
@@ -670,19 +645,12 @@ def task_b():
         link = get_db_connection()
         cursor = link.cursor(dictionary=True, buffered=True)
 
-        cursor.execute(
-            """
-            SELECT * FROM tb4_passage
-            WHERE topID=%s AND subtopID=%s AND conID=%s AND CAST(passOrder AS UNSIGNED)=%s
-            """,
-            (
-                str(session.get('topID', 1)),
-                str(subtopID),
-                str(conID),
-                int(passOrderInt),
-            ),
+        passResult = get_stimulus_cache().passage(
+            str(session.get('topID', 1)),
+            str(subtopID),
+            str(conID),
+            int(passOrderInt),
         )
-        passResult = cursor.fetchone()
 
         # if the current article is not found (e.g. the next article does not exist), clear the pending state and redirect to task_a
         if not passResult:
@@ -731,10 +699,10 @@ def task_b():
             used_time = now - session.get('lastPageSwitchUnixTime', now)
             session['remainingTime'] = session.get('remainingTime', 0) - used_time
             session['lastPageSwitchUnixTime'] = now
-            session['redirectPage'] = url_for('core.task_c1', fid='done')
+            session['redirectPage'] = _formal_ratings_url('done')
         elif lastPage == "c3":
             session['lastPageSwitchUnixTime'] = now
-            session['redirectPage'] = url_for('core.task_c1', fid='done')
+            session['redirectPage'] = _formal_ratings_url('done')
             if request.method == 'POST':
                 session.pop('formal_pending_stage', None)
                 session.pop('formal_pending_passID', None)
@@ -743,13 +711,9 @@ def task_b():
                 ans_to_save = request.form.get('ans', '')
                 passid_to_save = request.form.get('savepassid', '')
                 if ans_to_save:
-                    cursor.execute(
-                        """
-                        UPDATE tb5_passQop SET c3Ans=%s WHERE sid=%s AND uid=%s AND passID=%s
-                        """,
-                        (ans_to_save, sid, uid, passid_to_save),
-                    )
+                    save_pass_answer('c3', ans_to_save, table="tb5_passQop", pass_id=passid_to_save)
         elif lastPage == "c4" and request.method == 'POST':
+            _save_combined_ratings()
 
             # classify the form submission as "next" or "back/done"
             fid_in_form = request.form.get('fid', '')
@@ -763,17 +727,12 @@ def task_b():
             # if the form submission is not "next", mark the current subtopic as visited and check if all subtopics are completed
             if fid_in_form != 'same':
                 current_subtop = str(subtopID)
-                visited = [x for x in session.get('visitedSub', '').split(',') if x]
-                if current_subtop and current_subtop not in visited:
-                    visited.append(current_subtop)
-                session['visitedSub'] = ','.join(visited)
-
-                visited_sorted = sorted(
-                    (str(x) for x in visited if str(x)),
-                    key=lambda value: int(value) if value.isdigit() else value,
-                )
-                formal_all = session.get('formal_all_subtops') or []
-                if formal_all and visited_sorted == formal_all:
+                visited = load_visited_subtopics()
+                visited.add(current_subtop)
+                save_visited_subtopics(visited)
+
+                all_subtops_mask = get_stimulus_cache().subtopic_mask(session.get('topID', '1'))
+                if visited.covers(all_subtops_mask):
                     redirect_to_next_section = url_for(
                         'core.task_a',
                         fid='complete',
@@ -978,14 +937,7 @@ def task_c4():
     if not fid:
         fid = session.get('formal_pending_fid', 'same')
 
-    if fid == "same":
-        action_url = url_for('core.task_b', subtop=session.get('subtopID', ''), passOrd=session.get('nextPassOrder', 1), lastPage='c4')
-    elif fid == "back":
-        action_url = url_for('core.task_a', fid='back', subtop=session.get('subtopID', ''), lastPage='c4')
-    elif fid == "done":
-        action_url = url_for('core.k2', lastPage='c4')
-    else:
-        action_url = url_for('core.k2', lastPage='unknown')
+    action_url = _formal_c4_action_url(fid)
 
     _subtopID = session.get('subtopID', '')
     _passID = session.get('passID', '')
@@ -1045,7 +997,59 @@ def task_c4():
         else:
             return "No answer provided.", 400
 
-    return render_template("task_c4.html", fid=fid, action_url=action_url)
+    return render_template("task_c4.html", fid=fid, action_url=action_url, passID=_passID)
+
+
+@core_bp.route('/task_ratings', methods=['GET'])
+def task_ratings():
+    """C1-C4 on one page (RATINGS_COMBINED).
+
+    The form submits straight to the C4 destination, like the C4 page does;
+    `_save_combined_ratings` stores all four answers there in one write.
+    """
+    uid = session.get('uid')
+    sid = session.get('sid', '')
+    if not uid:
+        return "No user session found; please start from the beginning.", 400
+
+    fid = request.args.get('fid', '')
+    subtopID = session.get('subtopID', '')
+    passID = session.get('passID', '')
+    passTitle = session.get('passTitle', '')
+    topID = "1"
+    conID = str(session.get('conID', '1'))
+
+    pending_stage = session.get('formal_pending_stage')
+    pending_pass = session.get('formal_pending_passID')
+    if pending_stage in FORMAL_REQUIRED_STAGES:
+        if pending_pass != passID:
+            redirect_url = _formal_pending_redirect()
+            if redirect_url:
+                return redirect(redirect_url)
+    else:
+        session['formal_pending_passID'] = passID
+        session['formal_pending_stage'] = 'c1'
+
+    if fid:
+        session['formal_pending_fid'] = fid
+    else:
+        fid = session.get('formal_pending_fid') or 'same'
+
+    pageTitle = f"Ratings: {passTitle}"
+    save_url(uid, sid, topID, subtopID, conID, passID, "ratings", pageTitle, request.url)
+
+    now = int(time.time())
+    last_switch = session.get('lastPageSwitchUnixTime', now)
+    session['remainingTime'] = session.get('remainingTime', 0) - (now - last_switch)
+    session['lastPageSwitchUnixTime'] = now
+
+    return render_template(
+        "ratings.html",
+        page_title=pageTitle,
+        action_url=_formal_c4_action_url(fid),
+        fid=fid,
+        passID=passID,
+    )
 
 
 @core_bp.route('/let_comp_one_inst', methods=['GET', 'POST'])
@@ -1134,6 +1138,128 @@ def _save_letter_item_response(
             link.close()
 
 
+def _save_letter_items_bulk(
+    uid: int,
+    sid: str,
+    round_number: int,
+    responses: list,
+    total_rt_sec: int | None = None,
+) -> bool:
+    """Persist many letter comparison responses in one transaction.
+
+    One multi-row upsert into tb27_letter_item, then one tb11_profile UPDATE
+    that copies the round's stored responses into its lc columns (plus score
+    and RT when `total_rt_sec` is given, i.e. on the final submit). Re-sending
+    an autosaved response is harmless, and when its `client_ts_ms` (browser
+    epoch time of the choice) is known an older choice never overwrites a
+    newer one, so batches may arrive out of order. The final submit always
+    overwrites: it carries the answers the participant actually handed in.
+    """
+    link = None
+    cursor = None
+    try:
+        link = get_db_connection()
+        cursor = link.cursor()
+
+        row_placeholder = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        params = []
+        for response in responses:
+            item = response['item']
+            params.extend((
+                uid,
+                sid,
+                round_number,
+                response['item_index'],
+                item["left"],
+                item["right"],
+                item["answer"],
+                response['choice'],
+                response['is_correct'],
+                response.get('client_rt_ms'),
+                response.get('client_ts_ms'),
+            ))
+        # Assignments run left to right, so client_ts_ms must be updated last
+        # for the "newer choice wins" checks to compare against the old value.
+        # Epoch times, unlike client_rt_ms, keep their order across reloads.
+        if total_rt_sec is not None:
+            newer = "TRUE"
+        else:
+            newer = "(VALUES(client_ts_ms) IS NULL OR client_ts_ms IS NULL OR VALUES(client_ts_ms) >= client_ts_ms)"
+        cursor.execute(
+            f"""
+            INSERT INTO tb27_letter_item
+                (uid, sid, round_number, item_index, left_str, right_str, correct_answer,
+                 response, is_correct, client_rt_ms, client_ts_ms)
+            VALUES {', '.join([row_placeholder] * len(responses))}
+            ON DUPLICATE KEY UPDATE
+                response = IF({newer}, VALUES(response), response),
+                is_correct = IF({newer}, VALUES(is_correct), is_correct),
+                updated_at = IF({newer}, CURRENT_TIMESTAMP(6), updated_at),
+                client_rt_ms = IF({newer}, COALESCE(VALUES(client_rt_ms), client_rt_ms), client_rt_ms),
+                client_ts_ms = IF({newer}, COALESCE(VALUES(client_ts_ms), client_ts_ms), client_ts_ms)
+            """,
+            params,
+        )
+
+        cursor.execute(
+            """
+            SELECT item_index, response, is_correct
+            FROM tb27_letter_item
+            WHERE uid=%s AND sid=%s AND round_number=%s
+            """,
+            (uid, sid, round_number),
+        )
+        stored = cursor.fetchall()
+        assignments = {
+            _letter_round_column(round_number, int(item_index)): response
+            for item_index, response, _ in stored
+        }
+        if total_rt_sec is not None:
+            score_col = "lcOneScore" if round_number == 1 else "lcTwoScore"
+            rt_col = "lcOneRT" if round_number == 1 else "lcTwoRT"
+            assignments[score_col] = sum(int(is_correct) for _, _, is_correct in stored)
+            assignments[rt_col] = total_rt_sec
+        if assignments:
+            cursor.execute(
+                f"UPDATE tb11_profile SET {', '.join(f'{col}=%s' for col in assignments)} WHERE sid=%s AND uid=%s",
+                (*assignments.values(), sid, uid),
+            )
+
+        link.commit()
+        return True
+    except Exception as e:
+        print(f"Error saving letter comparison round {round_number}: {e}")
+        if link:
+            link.rollback()
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+        if link and link.is_connected():
+            link.close()
+
+
+def _parse_letter_response(items: list, item_index, choice, client_rt_ms=None, client_ts_ms=None) -> dict:
+    """Validate one letter comparison answer; raises ValueError if it is malformed."""
+    item_index = safe_int_param(item_index, 0)
+    if item_index < 1 or item_index > len(items):
+        raise ValueError(f"Invalid item index: {item_index}")
+    choice = str(choice or '').strip().upper()
+    if choice not in {'S', 'D'}:
+        raise ValueError(f"Invalid response for item {item_index}.")
+    rt = safe_int_param(client_rt_ms, None)
+    ts = safe_int_param(client_ts_ms, None)
+    item = items[item_index - 1]
+    return {
+        'item_index': item_index,
+        'item': item,
+        'choice': choice,
+        'is_correct': 1 if choice == item['answer'] else 0,
+        'client_rt_ms': rt if rt is None or rt >= 0 else None,
+        'client_ts_ms': ts if ts is None or ts > 0 else None,
+    }
+
+
 def _finalize_letter_round_with_total_time(uid: int, sid: str, round_number: int, total_rt_sec: int) -> None:
     """Save total time (seconds) for letter comparison round without individual item times."""
     link = None
@@ -1174,13 +1300,11 @@ def _finalize_letter_round_with_total_time(uid: int, sid: str, round_number: int
             link.close()
 
 
-def _finalize_letter_round(uid: int, sid: str, round_number: int) -> None:
-    """Aggregate per-round accuracy and RT totals into tb11_profile."""
-    link = None
-    cursor = None
+def _sync_letter_round(uid: int, sid: str, round_number: int) -> None:
+    """Aggregate per-round accuracy and RT totals into tb11_profile; errors propagate."""
+    link = get_db_connection()
+    cursor = link.cursor(dictionary=True, buffered=True)
     try:
-        link = get_db_connection()
-        cursor = link.cursor(dictionary=True, buffered=True)
         cursor.execute(
             """
             SELECT
@@ -1207,15 +1331,19 @@ def _finalize_letter_round(uid: int, sid: str, round_number: int) -> None:
             (row["correct_count"], total_rt_sec, sid, uid),
         )
         link.commit()
-    except Exception as e:
-        print(f"Error finalizing letter comparison round {round_number}: {e}")
-        if link:
-            link.rollback()
+    except Exception:
+        link.rollback()
+        raise
     finally:
-        if cursor:
-            cursor.close()
-        if link:
-            link.close()
+        cursor.close()
+
+
+def _finalize_letter_round(uid: int, sid: str, round_number: int) -> None:
+    """`_sync_letter_round` for the letter pages: a failure is logged, not shown."""
+    try:
+        _sync_letter_round(uid, sid, round_number)
+    except Exception:
+        current_app.logger.exception("Error finalizing letter comparison round %s", round_number)
 
 
 @core_bp.route('/let_comp_one', methods=['GET', 'POST'])
@@ -1243,6 +1371,56 @@ def let_comp_two():
     return _handle_letter_round_all(round_number=2, completion_endpoint='core.vocab')
 
 
+@core_bp.route('/letter_responses/<int:round_number>', methods=['POST'])
+def letter_responses(round_number: int):
+    """Batched autosave for the letter comparison page.
+
+    Takes a JSON array (or `{"responses": [...]}`) of
+    `{item_index, choice, client_rt_ms, client_ts_ms}` and writes it with one
+    bulk upsert. The answer with the later `client_ts_ms` wins, so retries,
+    duplicate beacons and out-of-order batches are all safe.
+    """
+    uid = session.get('uid')
+    sid = session.get('sid', '')
+    if not uid:
+        return jsonify(error="No user session found."), 400
+
+    items = _letter_round_items(round_number)
+    if not items:
+        return jsonify(error=f"Unknown letter comparison round {round_number}."), 404
+
+    # sendBeacon posts a Blob, which may arrive without a JSON content type.
+    payload = request.get_json(silent=True, force=True)
+    if isinstance(payload, dict):
+        payload = payload.get('responses')
+    if not isinstance(payload, list) or not payload:
+        return jsonify(error="Expected a non-empty list of responses."), 400
+    if len(payload) > 10 * len(items):
+        return jsonify(error="Too many responses in one batch."), 400
+
+    latest = {}
+    for entry in payload:
+        if not isinstance(entry, dict):
+            return jsonify(error="Each response must be an object."), 400
+        try:
+            response = _parse_letter_response(
+                items,
+                entry.get('item_index'),
+                entry.get('choice'),
+                entry.get('client_rt_ms'),
+                entry.get('client_ts_ms'),
+            )
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+        previous = latest.get(response['item_index'])
+        if previous is None or (response['client_ts_ms'] or 0) >= (previous['client_ts_ms'] or 0):
+            latest[response['item_index']] = response
+
+    if not _save_letter_items_bulk(uid, sid, round_number, list(latest.values())):
+        return jsonify(error="Responses not saved."), 500
+    return jsonify(saved=sorted(latest))
+
+
 def _handle_letter_round_all(round_number: int, completion_endpoint: str):
     """Handle letter comparison round with all items displayed on one page."""
     uid = session.get('uid')
@@ -1284,31 +1462,21 @@ def _handle_letter_round_all(round_number: int, completion_endpoint: str):
         skip_save = request.form.get('skip_save') == '1'
         if not skip_save:
             responses = []
-            for i, item in enumerate(items, 1):
-                choice_key = f'choice_{i}'
-                choice = request.form.get(choice_key, '').strip().upper()
-                if choice not in {'S', 'D'}:
-                    return f"Invalid response for item {i}.", 400
-                is_correct = 1 if choice == item['answer'] else 0
-                responses.append({
-                    'item_index': i,
-                    'item': item,
-                    'choice': choice,
-                    'is_correct': is_correct
-                })
-
-            for response in responses:
-                _save_letter_item_response(
-                    uid,
-                    sid,
-                    round_number,
-                    response['item_index'],
-                    response['item'],
-                    response['choice'],
-                    response['is_correct'],
-                )
-
-        _finalize_letter_round_with_total_time(uid, sid, round_number, total_rt_sec)
+            for i in range(1, total_items + 1):
+                try:
+                    responses.append(_parse_letter_response(
+                        items,
+                        i,
+                        request.form.get(f'choice_{i}'),
+                        request.form.get(f'client_rt_ms_{i}'),
+                        request.form.get(f'client_ts_ms_{i}'),
+                    ))
+                except ValueError as e:
+                    return str(e), 400
+
+            _save_letter_items_bulk(uid, sid, round_number, responses, total_rt_sec)
+        else:
+            _finalize_letter_round_with_total_time(uid, sid, round_number, total_rt_sec)
         return redirect(url_for(completion_endpoint))
 
     # GET请求 - 显示所有题目
@@ -1328,6 +1496,7 @@ def _handle_letter_round_all(round_number: int, completion_endpoint: str):
         items=items,
         total_items=total_items,
         action_url=action_url,
+        autosave_url=url_for('core.letter_responses', round_number=round_number),
     )
 
 
@@ -1423,27 +1592,16 @@ def k2():
             return redirect(pending_redirect)
 
     topID = "1"
-    link = None
-    cursor = None
     try:
-        link = get_db_connection()
-        cursor = link.cursor(dictionary=True, buffered=True)
-        cursor.execute("SELECT * FROM tb2_topic WHERE topID = %s", (topID,))
-        topic_row = cursor.fetchone()
+        stimuli = get_stimulus_cache()
+        topic_row = stimuli.topic(topID, dictionary=True)
         topicTitle = topic_row['topTitle'] if topic_row else "Unknown Topic"
         subtop_list = []
-        cursor.execute("SELECT * FROM tb3_subtopic WHERE topID = %s ORDER BY subtopID", (topID,))
-        subtop_rows = cursor.fetchall()
-        for row in subtop_rows:
+        for row in stimuli.subtopics(topID, dictionary=True):
             subtop_list.append(row['subtopTitle'])
     except Exception as e:
         print(f"Error retrieving topic/subtopics: {e}")
         return f"Database error: {e}", 500
-    finally:
-        if cursor:
-            cursor.close()
-        if link:
-            link.close()
 
     subtopString = ", ".join(subtop_list)
     trimSubtop = subtopString.lstrip(", ").strip()
@@ -1451,14 +1609,9 @@ def k2():
 
     if lastPage == 'complete':
         link = None
-        cursor = None
         try:
             link = get_db_connection()
-            cursor = link.cursor()
-            cursor.execute(
-                "UPDATE tb1_user SET conDone = conDone + 1 WHERE sid = %s AND uid = %s",
-                (sid, uid),
-            )
+            advance_condition(uid, sid)
             link.commit()
         except Exception as e:
             if link:
@@ -1466,8 +1619,6 @@ def k2():
             print(f"Error updating conDone in /k2 complete redirect: {e}")
             return f"Database error: {e}", 500
         finally:
-            if cursor:
-                cursor.close()
             if link and link.is_connected():
                 link.close()
         session.pop('formal_pending_stage', None)
@@ -1479,27 +1630,21 @@ def k2():
 
     if lastPage == "c4" and request.method == "POST":
         ans_to_save = request.form.get('ans', '').strip()
-        passid_to_save = request.form.get('savepassid', '')
+        passid_to_save = request.form.get('savepassid', '').strip()
         if ans_to_save:
+            # The C4 rating of the passage named by the form; pages without
+            # savepassid cannot say which passage it belongs to.
+            if not _save_combined_ratings() and passid_to_save:
+                save_pass_answer('c4', ans_to_save, table="tb5_passQop", pass_id=passid_to_save)
             try:
                 link = get_db_connection()
-                cursor = link.cursor()
-                cursor.execute(
-                    """
-                    UPDATE tb5_passQop 
-                    SET c3Ans = %s 
-                    WHERE sid = %s AND uid = %s AND passID = %s
-                    """,
-                    (ans_to_save, sid, uid, passid_to_save),
-                )
-                cursor.execute("UPDATE tb1_user SET conDone = conDone + 1 WHERE sid = %s AND uid = %s", (sid, uid))
+                advance_condition(uid, sid)
                 link.commit()
             except Exception as e:
-                print(f"Error updating c3Ans in /k2: {e}")
+                print(f"Error updating conDone in /k2: {e}")
                 return f"Database error: {e}", 500
             finally:
                 if link and link.is_connected():
-                    cursor.close()
                     link.close()
             session.pop('formal_pending_stage', None)
             session.pop('formal_pending_passID', None)
@@ -1525,6 +1670,36 @@ def vocab():
     return render_template('vocab.html', action_url=url_for('core.questions'))
 
 
+def _participant_pass_ids(uid, sid) -> list:
+    """passIDs the participant has read, ordered by subtopic then passage order.
+
+    Read from the session's passage manifest, which saving a tb5_passQop
+    answer keeps up to date; a session that predates the manifest rebuilds
+    it once from tb5_passQop.
+    """
+    pass_ids = get_pass_manifest(uid, sid)
+    if pass_ids is not None:
+        return pass_ids
+    link = get_db_connection()
+    cursor = link.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """
+            SELECT passID, MIN(CAST(subtopID AS UNSIGNED)) AS subtopID, MIN(CAST(passOrder AS UNSIGNED)) AS passOrder
+            FROM tb5_passQop
+            WHERE uid=%s AND sid=%s
+            GROUP BY passID
+            ORDER BY MIN(CAST(subtopID AS UNSIGNED)), MIN(CAST(passOrder AS UNSIGNED))
+            """,
+            (uid, sid),
+        )
+        rows = [row for row in cursor.fetchall() if row.get('passID')]
+    finally:
+        cursor.close()
+    set_pass_manifest(uid, sid, [(row['passID'], row['subtopID'], row['passOrder']) for row in rows])
+    return [row['passID'] for row in rows]
+
+
 @core_bp.route('/questions', methods=['GET', 'POST'])
 def questions():
     uid = session.get('uid')
@@ -1540,19 +1715,7 @@ def questions():
 
     if request.method == "POST" and request.form.get("voc1", "").strip() != "":
         voc = [request.form.get(f"voc{i}", "").strip() for i in range(1, 16)]
-        right = ["1", "2", "2", "2", "3", "2", "4", "1", "4", "5", "3", "4", "1", "3", "5"]
-        numCorrect = 0
-        numWrong = 0
-        numNotSure = 0
-        for i in range(15):
-            if voc[i] == right[i]:
-                numCorrect += 1
-            else:
-                if voc[i] == "6":
-                    numNotSure += 1
-                else:
-                    numWrong += 1
-        vocScore = (1 * numCorrect) - (0.2 * numWrong)
+        vocScore = score_vocab(voc)
         try:
             link = get_db_connection()
             cursor = link.cursor()
@@ -1590,18 +1753,7 @@ def questions():
         q_con = session.get('conID')
         q_ord = session.get('passOrder')
 
-        cursor.execute(
-            """
-            SELECT passID, MIN(CAST(subtopID AS UNSIGNED)) AS subtopID, MIN(CAST(passOrder AS UNSIGNED)) AS passOrder
-            FROM tb5_passQop
-            WHERE uid=%s AND sid=%s
-            GROUP BY passID
-            ORDER BY MIN(CAST(subtopID AS UNSIGNED)), MIN(CAST(passOrder AS UNSIGNED))
-            """,
-            (uid, sid),
-        )
-        pass_rows = cursor.fetchall()
-        pass_ids = [row['passID'] for row in pass_rows if row.get('passID')]
+        pass_ids = _participant_pass_ids(uid, sid)
 
         if not pass_ids:
             if passID:
@@ -1614,28 +1766,7 @@ def questions():
 
         if pass_ids:
             placeholders = ','.join(['%s'] * len(pass_ids))
-            cursor.execute(
-                f"""
-                SELECT * FROM tb21_questions
-                WHERE passID IN ({placeholders})
-                ORDER BY passID, questionID
-                """,
-                tuple(pass_ids),
-            )
-            question_rows = cursor.fetchall()
-
-            questions_by_passage = []
-            current_block = None
-            for row in question_rows:
-                pass_key = row.get('passID')
-                if not current_block or current_block['passID'] != pass_key:
-                    current_block = {
-                        'passID': pass_key,
-                        'passTitle': row.get('passTitle') or pass_key,
-                        'questions': [],
-                    }
-                    questions_by_passage.append(current_block)
-                current_block['questions'].append(row)
+            questions_by_passage = get_stimulus_cache().questions_by_passage(pass_ids)
 
             cursor.execute(
                 f"""
@@ -1666,233 +1797,72 @@ def questions():
     )
 
 
-@core_bp.route('/done', methods=['GET', 'POST'])
-def done():
-    uid = session.get('uid')
-    sid = session.get('sid', '')
-    passID = session.get('passID', '')
-    if not uid:
-        return redirect(url_for('core.index'))
-
-    bonusWordsCnt = 0
-    topID = "1"
-    # Log entering DONE page so the previous page's stay time (e.g., questions) can be computed
-    save_url(uid, sid, topID, "", "", "", "DONE", "DONE", request.url)
+FINALIZE_JOB = "finalize_study"
+
+
+def _finalize_job_key(uid, sid) -> str:
+    return f"finalize:{uid}:{sid}"
+
+
+def _grade_comprehension_answers(uid, sid, pass_ids, answers: dict) -> None:
+    """Grade `answers` ({questionID: choice}) and upsert them into tb22_multiQop in one statement.
+
+    Only questions of `pass_ids` are graded; the (uid, sid, questionID)
+    unique key makes a resubmission update the earlier rows.
+    """
+    answer_key = get_stimulus_cache().answer_key()
+    wanted = {str(p) for p in pass_ids}
+    params = []
+    rows = 0
+    for question_id, user_choice in answers.items():
+        entry = answer_key.get(str(question_id))
+        if not user_choice or entry is None or str(entry['passID']) not in wanted:
+            continue
+        params.extend((
+            uid,
+            sid,
+            entry['questionID'],
+            entry['topID'],
+            entry['subtopID'],
+            entry['conID'],
+            entry['passID'],
+            entry['passOrder'],
+            user_choice,
+            grade_choice(user_choice, entry['correctAns']),
+        ))
+        rows += 1
+    if not rows:
+        return
 
-    pass_ids = []
-    pass_conn = None
-    pass_cursor = None
-    try:
-        pass_conn = get_db_connection()
-        pass_cursor = pass_conn.cursor(dictionary=True)
-        pass_cursor.execute(
-            """
-            SELECT passID, MIN(CAST(subtopID AS UNSIGNED)) AS subtopID, MIN(CAST(passOrder AS UNSIGNED)) AS passOrder
-            FROM tb5_passQop
-            WHERE uid=%s AND sid=%s
-            GROUP BY passID
-            ORDER BY MIN(CAST(subtopID AS UNSIGNED)), MIN(CAST(passOrder AS UNSIGNED))
-            """,
-            (uid, sid),
-        )
-        for row in pass_cursor.fetchall():
-            pid = row.get('passID')
-            if pid:
-                pass_ids.append(pid)
-    except Exception as e:
-        print(f"Database error gathering comprehension pass IDs: {str(e)}")
-    finally:
-        if pass_cursor:
-            pass_cursor.close()
-        if pass_conn and pass_conn.is_connected():
-            pass_conn.close()
-
-    if not pass_ids and passID:
-        pass_ids = [passID]
-
-    if request.method == 'POST' and pass_ids:
-        submit_conn = None
-        submit_cursor = None
-        try:
-            submit_conn = get_db_connection()
-            submit_cursor = submit_conn.cursor(dictionary=True)
-            placeholders = ','.join(['%s'] * len(pass_ids))
-            submit_cursor.execute(
-                f"""
-                SELECT * FROM tb21_questions
-                WHERE passID IN ({placeholders})
-                ORDER BY passID, questionID
-                """,
-                tuple(pass_ids),
-            )
-            questions = submit_cursor.fetchall()
-            for q in questions:
-                field_name = f"q_{q['questionID']}"
-                user_choice = request.form.get(field_name, '').lower()
-                if not user_choice:
-                    continue
-                is_correct = 1 if user_choice == q['correctAns'].lower() else 0
-                submit_cursor.execute(
-                    """
-                    INSERT INTO tb22_multiQop (
-                        uid, sid, questionID, topID, subtopID,
-                        conID, passID, passOrder, choice, isCorrect
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
-                    )
-                    ON DUPLICATE KEY UPDATE
-                        choice = VALUES(choice),
-                        isCorrect = VALUES(isCorrect)
-                    """,
-                    (
-                        uid,
-                        sid,
-                        q['questionID'],
-                        q['topID'],
-                        q['subtopID'],
-                        q['conID'],
-                        q['passID'],
-                        q['passOrder'],
-                        user_choice,
-                        is_correct,
-                    ),
-                )
-            submit_conn.commit()
-        except Exception as e:
-            print(f"Database error processing answers: {str(e)}")
-            if submit_conn:
-                submit_conn.rollback()
-        finally:
-            if submit_cursor:
-                submit_cursor.close()
-            if submit_conn and submit_conn.is_connected():
-                submit_conn.close()
-
-    # Update time intervals in output1_url, update RTs, bonuses, etc. Kept same as original for brevity.
-    link = None
-    cursor = None
+    link = get_db_connection()
+    cursor = link.cursor()
     try:
-        link = get_db_connection()
-        cursor = link.cursor(dictionary=True, buffered=True)
+        row_placeholder = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
         cursor.execute(
-            """
-            SELECT * FROM output1_url
-            WHERE sid=%s AND uid=%s
-            ORDER BY op1ID DESC
+            f"""
+            INSERT INTO tb22_multiQop (
+                uid, sid, questionID, topID, subtopID,
+                conID, passID, passOrder, choice, isCorrect
+            ) VALUES {', '.join([row_placeholder] * rows)}
+            ON DUPLICATE KEY UPDATE
+                choice = VALUES(choice),
+                isCorrect = VALUES(isCorrect)
             """,
-            (sid, uid),
+            params,
         )
-        op_results = cursor.fetchall()
-        nextUnixTime = 0
-        for row in op_results:
-            rowID = row.get('op1ID', 0)
-            if rowID > 0:
-                thisUnixTime = row.get('unixTime', 0)
-                timeInterval = abs(nextUnixTime - thisUnixTime) if nextUnixTime else 0
-                if row.get('pageTypeID') != "DONE":
-                    cursor.execute("UPDATE output1_url SET time_interval=%s WHERE op1ID=%s", (timeInterval, rowID))
-                nextUnixTime = thisUnixTime
         link.commit()
-    except Exception as e:
-        print(f"Error updating time intervals: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if link:
-            link.close()
-
-    # passage RT for formal reading pages (pageTypeID='b')
-    link = None
-    cursor = None
-    try:
-        link = get_db_connection()
-        cursor = link.cursor(dictionary=True, buffered=True)
-        cursor.execute("SELECT passID, time_interval FROM output1_url WHERE sid=%s AND uid=%s AND pageTypeID='b'", (sid, uid))
-        for row in cursor.fetchall():
-            qryPassID = row['passID']
-            qryPassRT = row['time_interval']
-            cursor.execute(
-                "UPDATE tb5_passQop SET passRT=%s WHERE sid=%s AND uid=%s AND passID=%s",
-                (qryPassRT, sid, uid, qryPassID),
-            )
-        link.commit()
-    except Exception as e:
-        print(f"Error updating passage reading time for b: {e}")
+    except Exception:
+        link.rollback()
+        raise
     finally:
-        if cursor:
-            cursor.close()
-        if link:
-            link.close()
+        cursor.close()
 
-    # passage RT for practice reading pages (pageTypeID='prac_b')
-    link = None
-    cursor = None
-    try:
-        link = get_db_connection()
-        cursor = link.cursor(dictionary=True, buffered=True)
-        cursor.execute("SELECT passID, time_interval FROM output1_url WHERE sid=%s AND uid=%s AND pageTypeID='prac_b'", (sid, uid))
-        for row in cursor.fetchall():
-            qryPassID = row['passID']
-            qryPassRT = row['time_interval']
-            cursor.execute(
-                "UPDATE tb15_prac_passQop SET passRT=%s WHERE sid=%s AND uid=%s AND passID=%s",
-                (qryPassRT, sid, uid, qryPassID),
-            )
-        link.commit()
-    except Exception as e:
-        print(f"Error updating passage reading time for prac_b: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if link:
-            link.close()
 
-    # Sync letter comparison aggregates from per-item records
-    _finalize_letter_round(uid, sid, 1)
-    _finalize_letter_round(uid, sid, 2)
-
-    # Compute comprehension accuracy percentage as bonusWordsCnt (0-100)
-    link = None
-    cursor = None
-    bonusWordsCnt = 0
+def _comprehension_accuracy(uid, sid, pass_ids) -> int:
+    """Percentage (0-100) of the participant's graded comprehension answers that are correct."""
+    link = get_db_connection()
+    cursor = link.cursor(dictionary=True, buffered=True)
     try:
-        link = get_db_connection()
-        cursor = link.cursor(dictionary=True, buffered=True)
-        '''
-        cursor.execute("SELECT * FROM tb2_topic WHERE topID=%s", (topID,))
-        topicRow = cursor.fetchone()
-        topicIdeasBWsString = topicRow.get('topIdeasBonusWords', "") if topicRow else ""
-        topicIdeasBWsArray = topicIdeasBWsString.split(" ") if topicIdeasBWsString else []
-        cursor.execute("SELECT * FROM tb8_topicIdeas WHERE topID=%s AND sid=%s AND uid=%s", (topID, sid, uid))
-        topicIdeasAnsRow = cursor.fetchone()
-        topicIdeasAnsString = topicIdeasAnsRow.get('quesAns', "") if topicIdeasAnsRow else ""
-        topicIdeasAnsStringAry = []
-        for line in topicIdeasAnsString.split("\n"):
-            for word in line.split(" "):
-                cleaned = word.strip()
-                if cleaned:
-                    import re
-                    cleaned = re.sub(r"[^0-9a-zA-Z]+", "", cleaned)
-                    topicIdeasAnsStringAry.append(cleaned.lower())
-        bonusWordsAry = []
-        for word in topicIdeasAnsStringAry:
-            if word and word in topicIdeasBWsArray:
-                bonusWordsAry.append(word)
-                bonusWordsCnt += 1
-        bonusWordsMoney = 0.05 * bonusWordsCnt
-        bonusWordsString = " ".join(bonusWordsAry)
-        cursor.execute(
-            """
-            INSERT INTO tb9_topicBonus 
-                (uid, sid, topID, quesID, quesAns, bonusWord, bonusWordCnt, bonusMoney)
-            VALUES (%s, %s, %s, 'k2', %s, %s, %s, %s)
-            """,
-            (uid, sid, topID, topicIdeasAnsString, bonusWordsString, bonusWordsCnt, bonusWordsMoney),
-        )
-        link.commit()
-        print(f"Error processing bonus words: {e}")
-        '''
-
         if pass_ids:
             placeholders = ','.join(['%s'] * len(pass_ids))
             cursor.execute(
@@ -1912,20 +1882,97 @@ def done():
                 """,
                 (uid, sid),
             )
-
         row = cursor.fetchone() or {"total": 0, "correct": 0}
-        total = int(row.get("total") or 0)
-        correct = int(row.get("correct") or 0)
-        bonusWordsCnt = int(round((correct / total) * 100)) if total > 0 else 0
-    except Exception as e:
-        '''print(f"Error processing bonus words: {e}")'''
-        print(f"Error computing comprehension accuracy: {e}")
-        bonusWordsCnt = 0
     finally:
-        if cursor:
-            cursor.close()
-        if link:
-            link.close()
+        cursor.close()
+    total = int(row.get("total") or 0)
+    correct = int(row.get("correct") or 0)
+    return int(round((correct / total) * 100)) if total > 0 else 0
+
+
+def _finalize_study(payload: dict) -> dict:
+    """Job handler: grade the comprehension answers and sync end-of-study aggregates."""
+    uid = payload["uid"]
+    sid = payload["sid"]
+    pass_ids = payload.get("pass_ids") or []
+    answers = payload.get("answers") or {}
+
+    if answers and pass_ids:
+        _grade_comprehension_answers(uid, sid, pass_ids, answers)
+
+    # Backfill output1_url time intervals and passage RTs (formal 'b' and practice 'prac_b').
+    # With incremental intervals save_url already resolved them as pages were logged.
+    if not current_app.config.get("URL_LOG_INCREMENTAL_INTERVALS", True):
+        # Make sure this participant's queued page views (and the intervals they
+        # resolve) are written before output1_url is read back.
+        flush_page_log()
+        finalize_page_log(get_db_connection(), uid, sid)
+
+    # Sync letter comparison aggregates from per-item records. A failure
+    # fails the job, so the queue retries it.
+    _sync_letter_round(uid, sid, 1)
+    _sync_letter_round(uid, sid, 2)
+
+    return {"accuracy": _comprehension_accuracy(uid, sid, pass_ids)}
+
+
+core_bp.record_once(lambda state: register_job_handler(state.app, FINALIZE_JOB, _finalize_study))
+
+
+@core_bp.route('/done', methods=['GET', 'POST'])
+def done():
+    uid = session.get('uid')
+    sid = session.get('sid', '')
+    passID = session.get('passID', '')
+    if not uid:
+        return redirect(url_for('core.index'))
+
+    topID = "1"
+    # Log entering DONE page so the previous page's stay time (e.g., questions) can be computed
+    save_url(uid, sid, topID, "", "", "", "DONE", "DONE", request.url)
+
+    pass_ids = []
+    try:
+        pass_ids = _participant_pass_ids(uid, sid)
+    except Exception as e:
+        print(f"Database error gathering comprehension pass IDs: {str(e)}")
+
+    if not pass_ids and passID:
+        pass_ids = [passID]
+
+    # Grade the submitted answers in memory so the page can show the accuracy
+    # without waiting for them to be written.
+    answers = {}
+    if request.method == 'POST' and pass_ids:
+        correct = 0
+        try:
+            for q in get_stimulus_cache().questions(pass_ids):
+                user_choice = request.form.get(f"q_{q['questionID']}", '').lower()
+                if not user_choice:
+                    continue
+                answers[q['questionID']] = user_choice
+                correct += grade_choice(user_choice, q['correctAns'])
+        except Exception as e:
+            print(f"Database error processing answers: {str(e)}")
+        if answers:
+            session["comprehension_accuracy"] = [uid, sid, int(round((correct / len(answers)) * 100))]
+
+    payload = {"uid": uid, "sid": sid, "pass_ids": pass_ids, "answers": answers}
+    result = None
+    if current_app.config.get("FINALIZE_ASYNC", True):
+        try:
+            # A revisit without answers must not replace a pending graded submission.
+            get_job_queue().enqueue(FINALIZE_JOB, _finalize_job_key(uid, sid), payload, replace=bool(answers))
+        except Exception as e:
+            print(f"Error queueing study finalization: {e}")
+    else:
+        try:
+            result = _finalize_study(payload)
+        except Exception as e:
+            print(f"Error finalizing study: {e}")
+
+    # Comprehension accuracy percentage, shown as bonusWordsCnt (0-100)
+    bonusWordsCnt = _done_accuracy(uid, sid, pass_ids, result)
 
     try:
         mTurkUniCode = 999 - int(uid)
@@ -1933,3 +1980,42 @@ def done():
         mTurkUniCode = 0
     final_code = f"9XQE783CE{mTurkUniCode}"
     return render_template("done.html", bonusWordsCnt=bonusWordsCnt, final_code=final_code)
+
+
+def _done_accuracy(uid, sid, pass_ids, result: dict | None) -> int:
+    """Accuracy for the done page: finalization result, then session, then the database."""
+    if result is not None:
+        return result["accuracy"]
+    cached = session.get("comprehension_accuracy")
+    if cached and cached[0] == uid and cached[1] == sid:
+        return cached[2]
+    try:
+        if current_app.config.get("FINALIZE_ASYNC", True):
+            job = get_job_queue().get(_finalize_job_key(uid, sid))
+            if job and job["status"] == "done" and job["result"]:
+                return job["result"]["accuracy"]
+        return _comprehension_accuracy(uid, sid, pass_ids)
+    except Exception as e:
+        print(f"Error computing comprehension accuracy: {e}")
+        return 0
+
+
+@core_bp.route('/done/status', methods=['GET'])
+def done_status():
+    """Progress of the participant's background finalization job."""
+    uid = session.get('uid')
+    sid = session.get('sid', '')
+    if not uid:
+        return jsonify({"error": "no session"}), 400
+    if not current_app.config.get("FINALIZE_ASYNC", True):
+        # Finalized inline by /done; there is no job to report.
+        return jsonify({"status": "missing"}), 404
+    job = get_job_queue().get(_finalize_job_key(uid, sid))
+    if job is None:
+        return jsonify({"status": "missing"}), 404
+    return jsonify({
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["last_error"],
+        "accuracy": (job["result"] or {}).get("accuracy"),
+    })
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
 import time
-from flask import Blueprint, redirect, render_template, request, session, url_for
+from flask import Blueprint, current_app, redirect, render_template, request, session, url_for
 
-from src.db import get_db_connection, get_time_stamp_cdt, save_url
-from src.services.utils import format_pass_id, save_pass_answer, split_subtopics
+from src.db import get_db_connection, get_stimulus_cache, get_time_stamp_cdt, save_url
+from src.services.utils import (
+    VisitedSubtopics,
+    format_pass_id,
+    load_visited_subtopics,
+    parse_ratings,
+    save_pass_answer,
+    save_visited_subtopics,
+    upsert_pass_answers,
+)
 
 
 practice_bp = Blueprint("practice", __name__)
@@ -13,29 +21,70 @@ practice_bp = Blueprint("practice", __name__)
 PRACTICE_REQUIRED_STAGES = {"c1", "c2", "c3", "c4"}
 
 
-def _ensure_practice_top_id(cursor):
-    """Return the configured practice topID, querying once per session."""
+def _ensure_practice_top_id():
+    """Return the configured practice topID, looking it up once per session."""
     top_id = session.get("practice_topID")
     if top_id:
         return top_id
 
-    cursor.execute("SELECT topID FROM tb12_prac_topic ORDER BY topID LIMIT 1")
-    row = cursor.fetchone()
-    if isinstance(row, dict):
-        top_id = row.get("topID")
-    elif row:
-        top_id = row[0]
-    else:
-        top_id = None
-
-    top_id = str(top_id or "1")
+    top_id = str(get_stimulus_cache().first_topic_id(practice=True) or "1")
     session["practice_topID"] = top_id
     return top_id
 
 
-def _get_visited_subtopics() -> list[str]:
-    subs = [sub for sub in split_subtopics(session.get("visitedSub", "")) if sub]
-    return list(dict.fromkeys(subs))
+def _practice_ratings_url(fid: str) -> str:
+    """First rating page after a practice passage (C1, or the combined page)."""
+    if current_app.config.get("RATINGS_COMBINED"):
+        return url_for("practice.prac_ratings", fid=fid)
+    return url_for("practice.prac_c1", fid=fid)
+
+
+def _practice_c4_action_url(fid: str) -> str:
+    """Where to go once the last rating of a practice passage is saved."""
+    if fid == "same":
+        return url_for(
+            "practice.prac_b",
+            subtop=session.get("subtopID", ""),
+            passOrd=session.get("nextPassOrder", 1),
+            lastPage="c4",
+        )
+    if fid == "back":
+        return url_for(
+            "practice.prac_a",
+            fid="back",
+            subtop=session.get("subtopID", ""),
+            lastPage="c4",
+        )
+    if fid == "done":
+        return url_for("practice.prac_k2", lastPage="c4")
+    return url_for("practice.prac_k2", lastPage="unknown")
+
+
+def _mark_practice_task_end(uid, sid, practice_top_id) -> None:
+    link = get_db_connection()
+    cursor = link.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE tb16_prac_taskTime
+            SET timeEnd=%s, timeEndStamp=%s
+            WHERE uid=%s AND sid=%s AND topID=%s
+            ORDER BY timeStart DESC LIMIT 1
+            """,
+            (
+                int(time.time()),
+                get_time_stamp_cdt(),
+                uid,
+                sid,
+                str(practice_top_id),
+            ),
+        )
+        link.commit()
+    except Exception:
+        link.rollback()
+        raise
+    finally:
+        cursor.close()
 
 
 def _practice_pending_redirect():
@@ -58,8 +107,8 @@ def _practice_pending_redirect():
         if last_page:
             params["lastPage"] = last_page
         return url_for("practice.prac_b", **params)
-    if stage == "c1":
-        return url_for("practice.prac_c1", fid=fid)
+    if stage == "c1" or current_app.config.get("RATINGS_COMBINED"):
+        return _practice_ratings_url(fid)
     if stage == "c2":
         return url_for("practice.prac_c2", fid=fid or "same")
     if stage == "c3":
@@ -81,7 +130,7 @@ def prac_instruction():
     try:
         link = get_db_connection()
         cursor = link.cursor()
-        _ensure_practice_top_id(cursor)
+        _ensure_practice_top_id()
 
         bmv = request.form.get("demog_bm")
         if bmv:
@@ -98,14 +147,31 @@ def prac_instruction():
             hislatv = request.form.get("demog_hislat", "")
             racev = request.form.get("demog_race", "")
 
+            # Prior knowledge topic ratings go into the same tb11_profile row
+            pk_fields = {
+                "pk_bone_grafts": request.form.get("bone_grafts", "").strip(),
+                "pk_hypertension": request.form.get("hypertension", "").strip(),
+                "pk_blood_donation": request.form.get("blood_donation", "").strip(),
+                "pk_multiple_sclerosis": request.form.get("multiple_sclerosis", "").strip(),
+                "pk_corneal_transplants": request.form.get("corneal_transplants", "").strip(),
+                "pk_kidney_dialysis": request.form.get("kidney_dialysis", "").strip(),
+                "pk_liver_cancer": request.form.get("liver_cancer", "").strip(),
+                "pk_vaccine": request.form.get("vaccine", "").strip(),
+                "pk_colorectal_cancer": request.form.get("colorectal_cancer", "").strip(),
+                "pk_alzheimers_disease": request.form.get("alzheimers_disease", "").strip(),
+            }
+
+            profile_columns = [
+                "uid", "sid",
+                "dobMonth", "dobDay", "dobYear", "dobSum",
+                "age", "gender", "edu", "natEng", "firLan",
+                "reading", "writing", "hisLat", "race",
+                *pk_fields.keys(),
+            ]
             cursor.execute(
-                """
-                INSERT INTO tb11_profile (
-                    uid, sid,
-                    dobMonth, dobDay, dobYear, dobSum,
-                    age, gender, edu, natEng, firLan,
-                    reading, writing, hisLat, race
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                f"""
+                INSERT INTO tb11_profile ({', '.join(profile_columns)})
+                VALUES ({', '.join(['%s'] * len(profile_columns))})
                 """,
                 (
                     uid,
@@ -123,30 +189,9 @@ def prac_instruction():
                     writingv,
                     hislatv,
                     racev,
+                    *pk_fields.values(),
                 ),
             )
-            # Save prior knowledge topic ratings into tb11_profile
-            pk_fields = {
-                "pk_bone_grafts": request.form.get("bone_grafts", "").strip(),
-                "pk_hypertension": request.form.get("hypertension", "").strip(),
-                "pk_blood_donation": request.form.get("blood_donation", "").strip(),
-                "pk_multiple_sclerosis": request.form.get("multiple_sclerosis", "").strip(),
-                "pk_corneal_transplants": request.form.get("corneal_transplants", "").strip(),
-                "pk_kidney_dialysis": request.form.get("kidney_dialysis", "").strip(),
-                "pk_liver_cancer": request.form.get("liver_cancer", "").strip(),
-                "pk_vaccine": request.form.get("vaccine", "").strip(),
-                "pk_colorectal_cancer": request.form.get("colorectal_cancer", "").strip(),
-                "pk_alzheimers_disease": request.form.get("alzheimers_disease", "").strip(),
-            }
-
-            cursor.execute(
-                f"""
-                UPDATE tb11_profile
-                SET {', '.join([f"{k}=%s" for k in pk_fields.keys()])}
-                WHERE uid=%s AND sid=%s
-                """,
-                (*pk_fields.values(), uid, sid),
-            )
             link.commit()
 
         pageTypeID = "prac_instruction"
@@ -184,14 +229,12 @@ def prac_a():
     last_page = request.args.get("lastPage", "")
 
     link = None
-    visited_subtop = []
     try:
         link = get_db_connection()
         cursor = link.cursor()
-        practice_top_id = _ensure_practice_top_id(cursor)
+        practice_top_id = _ensure_practice_top_id()
 
-        visited_subtop = _get_visited_subtopics()
-        session["visitedSub"] = ",".join(visited_subtop)
+        visited_subtop = load_visited_subtopics()
 
         if fid == "begin":
             session["startUnixTime"] = int(time.time())
@@ -221,25 +264,16 @@ def prac_a():
                 ),
             )
 
-            session["visitedSub"] = ""
-            visited_subtop = []
+            visited_subtop = VisitedSubtopics()
 
         elif fid in ["back", "next"]:
             session["lastPageSwitchUnixTime"] = int(time.time())
-            current = _get_visited_subtopics()
-            if subtop_param and subtop_param not in current:
-                current.append(subtop_param)
-            session["visitedSub"] = ",".join(current)
-            visited_subtop = current
+            if subtop_param:
+                visited_subtop.add(subtop_param)
+        save_visited_subtopics(visited_subtop)
 
-        cursor.execute(
-            "SELECT * FROM tb13_prac_subtopic WHERE topID=%s ORDER BY subtopID",
-            (practice_top_id,),
-        )
-        all_subtops = []
-        subtopics = cursor.fetchall()
-        for row in subtopics:
-            all_subtops.append(str(row[0]))
+        subtopics = get_stimulus_cache().subtopics(practice_top_id, practice=True)
+        all_subtops_mask = get_stimulus_cache().subtopic_mask(practice_top_id, practice=True)
 
         if last_page == "c3" and request.method == "POST":
             ans = request.form.get("ans", "")
@@ -247,23 +281,18 @@ def prac_a():
             if ans:
                 # 统一使用保存函数，自动处理不存在记录时的插入
                 save_pass_answer("c3", ans, table="tb15_prac_passQop", pass_id=passid_to_save)
-            visited_subtop = sorted(_get_visited_subtopics())
 
             session.pop("practice_pending_stage", None)
             session.pop("practice_pending_passID", None)
             session.pop("practice_pending_fid", None)
             session.pop("practice_last_page", None)
 
-            if visited_subtop == sorted(all_subtops):
+            if visited_subtop.covers(all_subtops_mask):
                 return redirect(url_for("practice.prac_k2", lastPage="c3"))
 
         link.commit()
 
-        cursor.execute(
-            "SELECT * FROM tb12_prac_topic WHERE topID=%s",
-            (practice_top_id,),
-        )
-        topic_result = cursor.fetchone()
+        topic_result = get_stimulus_cache().topic(practice_top_id, practice=True)
 
         pageTypeID = "prac_a"
         pageTitle = f"a Prac: {topic_result[1]}" if topic_result else "a Prac"
@@ -271,11 +300,7 @@ def prac_a():
 
         session["redirectPage"] = url_for("practice.prac_k2", lastPage="a")
 
-        if not visited_subtop:
-            visited_subtop = _get_visited_subtopics()
-
-        subtop_ids = [str(row[0]) for row in subtopics]
-        all_completed = set(subtop_ids).issubset(set(visited_subtop)) and bool(subtop_ids)
+        all_completed = visited_subtop.covers(all_subtops_mask)
         return render_template(
             "practice/prac_a.html",
             topic_result=topic_result,
@@ -346,7 +371,7 @@ def prac_b():
     try:
         link = get_db_connection()
         cursor = link.cursor(dictionary=True)
-        practice_top_id = _ensure_practice_top_id(cursor)
+        practice_top_id = _ensure_practice_top_id()
 
         # persist current passage context for downstream routes/templates
         session.update(
@@ -362,19 +387,13 @@ def prac_b():
         )
 
         # load practice passage; passOrder is zero-padded in DB
-        cursor.execute(
-            """
-            SELECT * FROM tb14_prac_passage
-            WHERE topID=%s AND subtopID=%s AND conID=%s AND CAST(passOrder AS UNSIGNED)=%s
-            """,
-            (
-                practice_top_id,
-                str(subtopID),
-                str(conID),
-                int(passOrderInt),
-            ),
+        passResult = get_stimulus_cache().passage(
+            practice_top_id,
+            str(subtopID),
+            str(conID),
+            int(passOrderInt),
+            practice=True,
         )
-        passResult = cursor.fetchone()
         if passResult and 'passTitle' in passResult:
             session['passTitle'] = passResult['passTitle']
 
@@ -417,10 +436,10 @@ def prac_b():
             used_time = now - session.get("lastPageSwitchUnixTime", now)
             session["remainingTime"] = session.get("remainingTime", 0) - used_time
             session["lastPageSwitchUnixTime"] = now
-            session["redirectPage"] = url_for("practice.prac_c1", fid="done")
+            session["redirectPage"] = _practice_ratings_url("done")
         elif lastPage == "c3":
             session["lastPageSwitchUnixTime"] = now
-            session["redirectPage"] = url_for("practice.prac_c1", fid="done")
+            session["redirectPage"] = _practice_ratings_url("done")
             if request.method == 'POST':
                 session.pop("practice_pending_stage", None)
                 session.pop("practice_pending_passID", None)
@@ -433,7 +452,7 @@ def prac_b():
                     save_pass_answer('c3', ans_to_save, table="tb15_prac_passQop", pass_id=passid_to_save)
         elif lastPage == "c4":
             session["lastPageSwitchUnixTime"] = now
-            session["redirectPage"] = url_for("practice.prac_c1", fid="done")
+            session["redirectPage"] = _practice_ratings_url("done")
 
             if request.method == "POST":
                 c4_ans = request.form.get("ans", "").strip()
@@ -570,25 +589,7 @@ def prac_c4():
     if not fid:
         fid = session.get("practice_pending_fid", "same")
 
-    next_pass_order = session.get("nextPassOrder", 1)
-    if fid == "same":
-        action_url = url_for(
-            "practice.prac_b",
-            subtop=subtopID,
-            passOrd=next_pass_order,
-            lastPage="c4",
-        )
-    elif fid == "back":
-        action_url = url_for(
-            "practice.prac_a",
-            fid="back",
-            subtop=subtopID,
-            lastPage="c4",
-        )
-    elif fid == "done":
-        action_url = url_for("practice.prac_k2", lastPage="c4")
-    else:
-        action_url = url_for("practice.prac_k2", lastPage="unknown")
+    action_url = _practice_c4_action_url(fid)
 
     pageTypeID = "prac_c4"
     pageTitle = f"C4 Prac: {passTitle}"
@@ -615,37 +616,11 @@ def prac_c4():
         qid = request.form.get("qid", "c4")
         if ans:
             save_pass_answer(qid, ans, table="tb15_prac_passQop", pass_id=target_pass_id)
-            link = None
-            cursor = None
             try:
-                link = get_db_connection()
-                cursor = link.cursor()
-                cursor.execute(
-                    """
-                    UPDATE tb16_prac_taskTime
-                    SET timeEnd=%s, timeEndStamp=%s
-                    WHERE uid=%s AND sid=%s AND topID=%s
-                    ORDER BY timeStart DESC LIMIT 1
-                    """,
-                    (
-                        int(time.time()),
-                        get_time_stamp_cdt(),
-                        uid,
-                        sid,
-                        str(practice_top_id),
-                    ),
-                )
-                link.commit()
+                _mark_practice_task_end(uid, sid, practice_top_id)
             except Exception as e:
-                if link:
-                    link.rollback()
                 print(f"Error updating practice completion time: {e}")
                 return f"Database error: {e}", 500
-            finally:
-                if cursor:
-                    cursor.close()
-                if link and link.is_connected():
-                    link.close()
 
             session.pop("practice_pending_stage", None)
             session.pop("practice_pending_passID", None)
@@ -658,6 +633,68 @@ def prac_c4():
     return render_template("practice/prac_c4.html", fid=fid, passID=passID)
 
 
+@practice_bp.route("/prac_ratings", methods=["GET", "POST"])
+def prac_ratings():
+    """Practice C1-C4 on one page (RATINGS_COMBINED), saved with one write."""
+    uid = session.get("uid")
+    sid = session.get("sid", "")
+    if not uid:
+        return "No user session found; please start from the beginning.", 400
+
+    fid = request.args.get("fid", "")
+    subtopID = session.get("subtopID", "")
+    passID = session.get("passID", "")
+    passTitle = session.get("passTitle", "")
+    practice_top_id = session.get("practice_topID") or session.get("topID") or "1"
+    conID = "1"
+
+    pending_stage = session.get("practice_pending_stage")
+    pending_pass = session.get("practice_pending_passID")
+    if pending_stage in PRACTICE_REQUIRED_STAGES:
+        if pending_pass != passID:
+            redirect_url = _practice_pending_redirect()
+            if redirect_url:
+                return redirect(redirect_url)
+    else:
+        session["practice_pending_passID"] = passID
+        session["practice_pending_stage"] = "c1"
+
+    if fid:
+        session["practice_pending_fid"] = fid
+    else:
+        fid = session.get("practice_pending_fid") or "same"
+
+    if request.method == "POST":
+        try:
+            ratings = parse_ratings(request.form)
+        except ValueError as e:
+            return f"Invalid ratings: {e}", 400
+        target_pass_id = request.form.get("savepassid", "").strip() or passID
+        upsert_pass_answers(ratings, table="tb15_prac_passQop", pass_id=target_pass_id)
+        try:
+            _mark_practice_task_end(uid, sid, practice_top_id)
+        except Exception as e:
+            print(f"Error updating practice completion time: {e}")
+            return f"Database error: {e}", 500
+
+        session.pop("practice_pending_stage", None)
+        session.pop("practice_pending_passID", None)
+        session.pop("practice_pending_fid", None)
+        session.pop("practice_last_page", None)
+        return redirect(_practice_c4_action_url(fid))
+
+    pageTitle = f"Ratings Prac: {passTitle}"
+    save_url(uid, sid, practice_top_id, str(subtopID), conID, passID, "prac_ratings", pageTitle, request.url)
+
+    return render_template(
+        "ratings.html",
+        page_title=pageTitle,
+        action_url=url_for("practice.prac_ratings", fid=fid),
+        fid=fid,
+        passID=passID,
+    )
+
+
 @practice_bp.route("/prac_c1", methods=["GET", "POST"])
 def prac_c1():
     uid = session.get("uid")
@@ -798,38 +835,24 @@ def prac_k2():
     try:
         link = get_db_connection()
         cursor = link.cursor(dictionary=True)
-        practice_top_id = _ensure_practice_top_id(cursor)
+        practice_top_id = _ensure_practice_top_id()
 
         if lastPage == "c3" and request.method == "POST":
             ans_to_save = request.form.get("ans", "")
             passid_to_save = request.form.get("savepassid", "")
             if ans_to_save:
-                cursor.execute(
-                    """
-                    UPDATE tb15_prac_passQop
-                    SET c3Ans=%s
-                    WHERE sid=%s AND uid=%s AND passID=%s
-                    """,
-                    (ans_to_save, sid, uid, passid_to_save),
-                )
+                save_pass_answer("c3", ans_to_save, table="tb15_prac_passQop", pass_id=passid_to_save)
                 session.pop("practice_pending_stage", None)
                 session.pop("practice_pending_passID", None)
                 session.pop("practice_pending_fid", None)
                 session.pop("practice_last_page", None)
 
-        cursor.execute(
-            "SELECT * FROM tb12_prac_topic WHERE topID=%s",
-            (practice_top_id,),
-        )
-        topic_row = cursor.fetchone()
+        stimuli = get_stimulus_cache()
+        topic_row = stimuli.topic(practice_top_id, practice=True, dictionary=True)
         if topic_row:
             topic_title = topic_row["topTitle"]
 
-        cursor.execute(
-            "SELECT * FROM tb13_prac_subtopic WHERE topID=%s ORDER BY subtopID",
-            (practice_top_id,),
-        )
-        subtop_rows = cursor.fetchall()
+        subtop_rows = stimuli.subtopics(practice_top_id, practice=True, dictionary=True)
         subtop_list = [row["subtopTitle"] for row in subtop_rows]
         subtop_string = ", ".join(subtop_list)
 
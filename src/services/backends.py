@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+
+from .pool import ConnectionPool
+from .sqlite_backend import MIN_SQLITE_VERSION, SQLiteConnection, ThreadConnectionPool, create_schema
+
+
+DB_BACKENDS = {"mysql", "sqlite"}
+
+SQLITE_SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "schema_sqlite_backup.sql")
+
+
+class MySQLBackend:
+    """The study database on a MySQL server, through a `ConnectionPool`."""
+
+    name = "mysql"
+
+    def __init__(self, config):
+        self.config = config
+        self.connection_args = {
+            "host": config.get("MYSQL_HOST", "localhost"),
+            "user": config.get("MYSQL_USER", "root"),
+            "password": config.get("MYSQL_PASSWORD", ""),
+            "database": config.get("MYSQL_DB", "cogsearch_textsearch3"),
+            # Routes and helpers share one connection per request, so results
+            # must be buffered or a second cursor hits "Unread result found".
+            "buffered": True,
+        }
+        # Only set auth_plugin if explicitly provided in config to avoid mismatches
+        auth_plugin = config.get("MYSQL_AUTH_PLUGIN")
+        if auth_plugin:
+            self.connection_args["auth_plugin"] = auth_plugin
+
+    def connect(self):
+        import mysql.connector
+
+        return mysql.connector.connect(**self.connection_args)
+
+    def create_pool(self) -> ConnectionPool:
+        config = self.config
+        return ConnectionPool(
+            self.connect,
+            size=config.get("DB_POOL_SIZE", 5),
+            max_overflow=config.get("DB_POOL_MAX_OVERFLOW", 10),
+            timeout=config.get("DB_POOL_TIMEOUT", 30),
+            idle_timeout=config.get("DB_POOL_IDLE_TIMEOUT", 300),
+            max_lifetime=config.get("DB_POOL_MAX_LIFETIME", 3600),
+            reset_on_return=config.get("DB_POOL_RESET_ON_RETURN", True),
+        )
+
+
+class SQLiteBackend:
+    """The study database in a local SQLite file (WAL, one connection per thread).
+
+    The app's MySQL-dialect SQL is translated per statement (see
+    `sqlite_backend.translate_sql`). Missing tables are created from
+    `schema_sqlite_backup.sql` on first use.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, config, instance_path: str):
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(
+                f"DB_BACKEND=sqlite needs SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} or newer "
+                f"(this Python has {sqlite3.sqlite_version})"
+            )
+        self.config = config
+        self.path = config.get("SQLITE_PATH") or os.path.join(instance_path, "cogsearch.sqlite3")
+        self.timeout = config.get("SQLITE_BUSY_TIMEOUT", 30.0)
+
+    def connect(self) -> SQLiteConnection:
+        return SQLiteConnection(self.path, timeout=self.timeout)
+
+    def create_pool(self) -> ThreadConnectionPool:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if self.config.get("SQLITE_CREATE_SCHEMA", True) and create_schema(self.path, SQLITE_SCHEMA):
+            print(f"Created study tables in {self.path}")
+        return ThreadConnectionPool(self.connect, reset_on_return=self.config.get("DB_POOL_RESET_ON_RETURN", True))
+
+
+def create_backend(app):
+    """Return the database backend chosen by `DB_BACKEND`."""
+    backend = app.config.get("DB_BACKEND", "mysql")
+    if backend not in DB_BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND: {backend}")
+    if backend == "sqlite":
+        return SQLiteBackend(app.config, app.instance_path)
+    return MySQLBackend(app.config)
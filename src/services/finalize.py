@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import sqlite3
+
+
+# pageTypeID of reading pages whose dwell time becomes the passage RT.
+PASSAGE_RT_TABLES = {
+    "b": "tb5_passQop",
+    "prac_b": "tb15_prac_passQop",
+}
+
+
+def _is_sqlite(conn) -> bool:
+    raw = getattr(conn, "_conn", conn)
+    return isinstance(raw, sqlite3.Connection) or getattr(raw, "dialect", None) == "sqlite"
+
+
+def _placeholder(conn) -> str:
+    return "?" if _is_sqlite(conn) else "%s"
+
+
+def _update_intervals_set_based(cursor, uid, sid) -> None:
+    # Each row's interval is the gap to the participant's next page view;
+    # the newest row gets 0 and DONE rows are never touched (as in the old loop).
+    cursor.execute(
+        """
+        UPDATE output1_url o
+        JOIN (
+            SELECT op1ID,
+                   COALESCE(ABS(LEAD(unixTime) OVER (ORDER BY op1ID) - unixTime), 0) AS gap
+            FROM output1_url
+            WHERE sid=%s AND uid=%s
+        ) w ON w.op1ID = o.op1ID
+        SET o.time_interval = w.gap
+        WHERE o.pageTypeID <> 'DONE'
+        """,
+        (sid, uid),
+    )
+
+
+def _update_passage_rts_set_based(cursor, uid, sid) -> None:
+    # When a passage was read more than once the latest view wins, matching
+    # the old row-by-row loop, which processed views in op1ID order.
+    for page_type, table in PASSAGE_RT_TABLES.items():
+        cursor.execute(
+            f"""
+            UPDATE {table} q
+            JOIN (
+                SELECT o.passID, o.time_interval
+                FROM output1_url o
+                JOIN (
+                    SELECT passID, MAX(op1ID) AS op1ID
+                    FROM output1_url
+                    WHERE sid=%s AND uid=%s AND pageTypeID=%s
+                    GROUP BY passID
+                ) latest ON latest.op1ID = o.op1ID
+            ) rt ON rt.passID = q.passID
+            SET q.passRT = rt.time_interval
+            WHERE q.sid=%s AND q.uid=%s
+            """,
+            (sid, uid, page_type, sid, uid),
+        )
+
+
+def _finalize_batched(conn, cursor, uid, sid) -> None:
+    """Fallback for engines without window functions / multi-table UPDATE."""
+    ph = _placeholder(conn)
+    cursor.execute(
+        f"""
+        SELECT op1ID, unixTime, pageTypeID, passID, time_interval
+        FROM output1_url
+        WHERE sid={ph} AND uid={ph}
+        ORDER BY op1ID
+        """,
+        (sid, uid),
+    )
+    rows = [tuple(row) for row in cursor.fetchall()]
+
+    interval_updates = []
+    latest_rt: dict[str, dict] = {page_type: {} for page_type in PASSAGE_RT_TABLES}
+    for i, (op1_id, unix_time, page_type, pass_id, current) in enumerate(rows):
+        gap = abs(rows[i + 1][1] - unix_time) if i + 1 < len(rows) else 0
+        if page_type != "DONE":
+            if gap != current:
+                interval_updates.append((gap, op1_id))
+            current = gap
+        if page_type in latest_rt:
+            latest_rt[page_type][pass_id] = current
+
+    if interval_updates:
+        cursor.executemany(
+            f"UPDATE output1_url SET time_interval={ph} WHERE op1ID={ph}",
+            interval_updates,
+        )
+    for page_type, table in PASSAGE_RT_TABLES.items():
+        rt_updates = [(rt, sid, uid, pass_id) for pass_id, rt in latest_rt[page_type].items()]
+        if rt_updates:
+            cursor.executemany(
+                f"UPDATE {table} SET passRT={ph} WHERE sid={ph} AND uid={ph} AND passID={ph}",
+                rt_updates,
+            )
+
+
+def finalize_page_log(conn, uid, sid) -> None:
+    """Backfill `output1_url.time_interval` and passage RTs for one participant.
+
+    Produces the same values as the per-row loop `/done` used to run, but
+    with three set-based statements on MySQL 8 (or a batched `executemany`
+    fallback on SQLite / older servers) and a single commit.
+    """
+    cursor = conn.cursor()
+    try:
+        if _is_sqlite(conn):
+            _finalize_batched(conn, cursor, uid, sid)
+        else:
+            try:
+                _update_intervals_set_based(cursor, uid, sid)
+                _update_passage_rts_set_based(cursor, uid, sid)
+            except Exception as e:
+                # MySQL < 8.0 has no window functions; redo it the portable way.
+                print(f"Set-based finalization unavailable ({e}); using batched updates")
+                conn.rollback()
+                _finalize_batched(conn, cursor, uid, sid)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from typing import Callable
+
+
+JOB_STATUSES = ("pending", "running", "done", "failed")
+
+
+class JobQueue:
+    """Durable background jobs in a local SQLite file.
+
+    `enqueue()` stores a job under an idempotency `key` and returns at once;
+    daemon worker threads (started lazily, and again after a fork) claim due
+    jobs and run the handler registered for their `kind`. A failing job is
+    retried with exponential backoff up to `max_attempts` times and then left
+    as `failed` until it is replayed. Claims carry a lease, so a job whose
+    process died mid-run is picked up again once the lease expires. The file
+    is shared by every app process on the host.
+
+    Re-enqueueing a key replaces its payload and makes it due again (if it is
+    running at that moment it is re-run once the current run finishes);
+    `replace=False` leaves an existing job untouched. A handler's return
+    value is stored as the job's JSON `result`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        workers: int = 2,
+        max_attempts: int = 5,
+        backoff: float = 2.0,
+        max_backoff: float = 300.0,
+        lease: float = 120.0,
+        poll_interval: float = 1.0,
+        context: Callable | None = None,
+    ):
+        self.path = path
+        self.workers = max(int(workers), 0)
+        self.max_attempts = max(int(max_attempts), 1)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._context = context or nullcontext
+        self._handlers: dict = {}
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: list = []
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                rerun INTEGER NOT NULL DEFAULT 0,
+                run_after REAL NOT NULL DEFAULT 0,
+                locked_until REAL NOT NULL DEFAULT 0,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS idx_jobs_due ON jobs (status, run_after)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # -- producer side --------------------------------------------------------
+
+    def register(self, kind: str, handler: Callable) -> None:
+        """Run `handler(payload)` for jobs of `kind`."""
+        self._handlers[kind] = handler
+
+    def enqueue(self, kind: str, key: str, payload: dict, replace: bool = True) -> None:
+        now = time.time()
+        data = json.dumps(payload)
+        conn = self._conn()
+        if not replace:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (key, kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, data, now, now),
+            )
+        else:
+            conn.execute(
+                """
+                INSERT INTO jobs (key, kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    kind = excluded.kind,
+                    payload = excluded.payload,
+                    rerun = CASE WHEN status = 'running' THEN 1 ELSE 0 END,
+                    status = CASE WHEN status = 'running' THEN 'running' ELSE 'pending' END,
+                    attempts = CASE WHEN status = 'running' THEN attempts ELSE 0 END,
+                    run_after = 0,
+                    last_error = NULL,
+                    updated_at = excluded.updated_at
+                """,
+                (key, kind, data, now, now),
+            )
+        self._ensure_started()
+        self._wakeup.set()
+
+    def get(self, key: str) -> dict | None:
+        row = self._conn().execute("SELECT * FROM jobs WHERE key=?", (key,)).fetchone()
+        return self._as_dict(row) if row else None
+
+    def jobs(self, status: str | None = None, limit: int = 100) -> list:
+        if status:
+            rows = self._conn().execute(
+                "SELECT * FROM jobs WHERE status=? ORDER BY updated_at DESC LIMIT ?", (status, limit)
+            )
+        else:
+            rows = self._conn().execute("SELECT * FROM jobs ORDER BY updated_at DESC LIMIT ?", (limit,))
+        return [self._as_dict(row) for row in rows]
+
+    def counts(self) -> dict:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        for status, count in self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    def replay(self, key: str | None = None) -> int:
+        """Make failed jobs (or the job `key`, whatever its state) due again."""
+        now = time.time()
+        if key is None:
+            cursor = self._conn().execute(
+                "UPDATE jobs SET status='pending', attempts=0, run_after=0, updated_at=? WHERE status='failed'",
+                (now,),
+            )
+        else:
+            cursor = self._conn().execute(
+                "UPDATE jobs SET status='pending', attempts=0, run_after=0, updated_at=? "
+                "WHERE key=? AND status<>'running'",
+                (now, key),
+            )
+        return cursor.rowcount
+
+    def purge(self, older_than: float) -> int:
+        """Delete finished jobs last touched more than `older_than` seconds ago."""
+        cursor = self._conn().execute(
+            "DELETE FROM jobs WHERE status='done' AND updated_at<?", (time.time() - older_than,)
+        )
+        return cursor.rowcount
+
+    # -- running jobs ---------------------------------------------------------
+
+    def run_pending(self, ignore_backoff: bool = False, limit: int | None = None) -> int:
+        """Run due jobs on the calling thread until none are left; returns how many ran."""
+        ran = 0
+        while limit is None or ran < limit:
+            job = self._claim(ignore_backoff)
+            if job is None:
+                break
+            self._run(job)
+            ran += 1
+        return ran
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self._stopping.clear()
+
+    def _workers_running(self) -> bool:
+        return (
+            self._pid == os.getpid()
+            and len(self._threads) == self.workers
+            and all(thread.is_alive() for thread in self._threads)
+        )
+
+    def _ensure_started(self) -> None:
+        if not self.workers or self._workers_running():
+            return
+        with self._start_lock:
+            if self._workers_running():
+                return
+            if self._pid != os.getpid():
+                # Threads do not survive a fork; start a fresh set.
+                self._pid = os.getpid()
+                self._threads = []
+            for i in range(self.workers):
+                if i < len(self._threads) and self._threads[i].is_alive():
+                    continue
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                if i < len(self._threads):
+                    self._threads[i] = thread
+                else:
+                    self._threads.append(thread)
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = self._claim()
+            except Exception as e:
+                print(f"Job queue error claiming a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                # Recording the outcome failed (e.g. "database is locked"); the
+                # job's lease expires and it is claimed again.
+                print(f"Job queue error finishing job {job['key']}: {e}")
+                self._wakeup.wait(self.poll_interval)
+
+    def _claim(self, ignore_backoff: bool = False) -> dict | None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE (status='pending' AND run_after<=?) OR (status='running' AND locked_until<?)
+                ORDER BY run_after, created_at
+                LIMIT 1
+                """,
+                (float("inf") if ignore_backoff else now, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status='running', attempts=attempts+1, rerun=0, locked_until=?, updated_at=? "
+                "WHERE key=?",
+                (now + self.lease, now, row["key"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = self._as_dict(row)
+        job["attempts"] += 1
+        return job
+
+    def _run(self, job: dict) -> None:
+        handler = self._handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise LookupError(f"no handler registered for job kind {job['kind']!r}")
+            with self._context():
+                result = json.dumps(handler(job["payload"]))
+        except Exception as e:
+            print(f"Job {job['key']} failed (attempt {job['attempts']}): {e}")
+            self._finish(job, error="".join(traceback.format_exception_only(type(e), e)).strip())
+            return
+        self._finish(job, result=result)
+
+    def _finish(self, job: dict, result: str | None = None, error: str | None = None) -> None:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT rerun FROM jobs WHERE key=?", (job["key"],)).fetchone()
+            if row is not None and row["rerun"]:
+                # Re-enqueued while running: run the new payload from scratch.
+                conn.execute(
+                    "UPDATE jobs SET status='pending', attempts=0, rerun=0, run_after=0, locked_until=0, "
+                    "updated_at=? WHERE key=?",
+                    (now, job["key"]),
+                )
+            elif error is None:
+                conn.execute(
+                    "UPDATE jobs SET status='done', result=?, last_error=NULL, locked_until=0, updated_at=? "
+                    "WHERE key=?",
+                    (result, now, job["key"]),
+                )
+            elif job["attempts"] >= self.max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status='failed', last_error=?, locked_until=0, updated_at=? WHERE key=?",
+                    (error, now, job["key"]),
+                )
+            else:
+                delay = min(self.backoff * (2 ** (job["attempts"] - 1)), self.max_backoff)
+                conn.execute(
+                    "UPDATE jobs SET status='pending', last_error=?, run_after=?, locked_until=0, updated_at=? "
+                    "WHERE key=?",
+                    (error, now + delay, now, job["key"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _as_dict(row) -> dict:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job.get("result") else None
+        return job
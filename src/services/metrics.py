@@ -0,0 +1,287 @@
+from __future__ import annotations
+
+import functools
+import hmac
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Callable
+
+from flask import abort, current_app, g, has_app_context, request, template_rendered, before_render_template
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+STATS_TOKEN_HEADER = "X-Stats-Token"
+
+# name -> (type, help, histogram buckets)
+FAMILIES = {
+    "cogsearch_requests_total": ("counter", "Requests handled, by endpoint and status code.", None),
+    "cogsearch_request_duration_seconds": ("histogram", "Time spent handling a request.", LATENCY_BUCKETS),
+    "cogsearch_request_db_seconds": ("histogram", "Time spent in SQL statements per request.", LATENCY_BUCKETS),
+    "cogsearch_request_db_queries": ("histogram", "SQL statements executed per request.", COUNT_BUCKETS),
+    "cogsearch_request_db_checkouts_total": ("counter", "Pooled connections checked out by requests.", None),
+    "cogsearch_template_render_seconds": ("histogram", "Time spent rendering a template.", LATENCY_BUCKETS),
+    "cogsearch_db_pool_connections": ("gauge", "Connections in the pool, by state.", None),
+    "cogsearch_db_connections_opened_total": ("counter", "Database connections opened by the pool.", None),
+    "cogsearch_startup_phase_seconds": ("gauge", "Time each phase of building this process's app took.", None),
+}
+
+
+class _Samples:
+    """Counters and histograms of one thread (or the merged totals)."""
+
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters: dict = {}
+        self.histograms: dict = {}
+
+    def merge_from(self, other: "_Samples") -> None:
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0.0) + value
+        for key, values in list(other.histograms.items()):
+            mine = self.histograms.get(key)
+            if mine is None:
+                self.histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    mine[i] += value
+
+    def clear(self) -> None:
+        self.counters = {}
+        self.histograms = {}
+
+
+class _Shard:
+    __slots__ = ("samples", "merge_at", "pid", "__weakref__")
+
+    def __init__(self, merge_interval: float):
+        self.samples = _Samples()
+        self.merge_at = time.monotonic() + merge_interval
+        self.pid = os.getpid()
+
+
+class Metrics:
+    """In-process metrics with per-thread accumulation.
+
+    Each thread records into its own shard without taking a lock; a shard is
+    folded into the shared totals at most every `merge_interval` seconds
+    (see `maybe_merge`) and when its thread exits. `render()` reports totals
+    plus whatever the live shards have not merged yet, in the Prometheus
+    text format.
+    """
+
+    def __init__(self, merge_interval: float = 1.0):
+        self.merge_interval = merge_interval
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._totals = _Samples()
+        self._live = weakref.WeakSet()
+        self._collectors: list = []
+
+    def inc(self, name: str, labels: tuple = (), value: float = 1.0) -> None:
+        counters = self._shard().samples.counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        buckets = FAMILIES[name][2]
+        histograms = self._shard().samples.histograms
+        key = (name, labels)
+        values = histograms.get(key)
+        if values is None:
+            # One slot per bucket, one for +Inf, then the sum.
+            values = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        values[bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def maybe_merge(self) -> None:
+        shard = getattr(self._local, "shard", None)
+        if shard is None or time.monotonic() < shard.merge_at:
+            return
+        with self._lock:
+            self._totals.merge_from(shard.samples)
+            shard.samples.clear()
+        shard.merge_at = time.monotonic() + self.merge_interval
+
+    def add_collector(self, collect: Callable) -> None:
+        """`collect()` returns (name, labels, value) samples read at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        merged = _Samples()
+        with self._lock:
+            merged.merge_from(self._totals)
+            for shard in list(self._live):
+                merged.merge_from(shard.samples)
+        gauges: dict = {}
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    gauges[(name, labels)] = value
+            except Exception as e:
+                print(f"Metrics collector failed: {e}")
+
+        lines = []
+        for name, (kind, help_text, buckets) in FAMILIES.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (family, labels), values in sorted(merged.histograms.items()):
+                    if family != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(buckets, values):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                    cumulative += values[len(buckets)]
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(values[-1])}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                continue
+            for source in (merged.counters, gauges):
+                for (family, labels), value in sorted(source.items()):
+                    if family == name:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None or shard.pid != os.getpid():
+            shard = _Shard(self.merge_interval)
+            self._local.shard = shard
+            with self._lock:
+                self._live.add(shard)
+            # Fold in what the thread recorded since its last merge when it exits.
+            weakref.finalize(shard, self._retire, shard.samples)
+        return shard
+
+    def _retire(self, samples: _Samples) -> None:
+        with self._lock:
+            self._totals.merge_from(samples)
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class RequestTimings:
+    """What one request spent on the database and on templates."""
+
+    __slots__ = ("started", "db_seconds", "queries", "checkouts", "renders")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.checkouts = 0
+        self.renders: list = []
+
+
+def request_timings() -> RequestTimings | None:
+    """Timings of the current request, or None outside a metered request."""
+    if not has_app_context():
+        return None
+    return g.get("_request_timings")
+
+
+def stats_endpoint(view: Callable) -> Callable:
+    """Serve `view` only with STATS_ENDPOINTS_ENABLED, and only to holders of STATS_TOKEN if set."""
+
+    @functools.wraps(view)
+    def guarded(*args, **kwargs):
+        config = current_app.config
+        if not config.get("STATS_ENDPOINTS_ENABLED", False):
+            abort(404)
+        token = config.get("STATS_TOKEN", "")
+        if token and not hmac.compare_digest(request.headers.get(STATS_TOKEN_HEADER, ""), token):
+            abort(403)
+        return view(*args, **kwargs)
+
+    return guarded
+
+
+def init_metrics(app) -> None:
+    """Meter every request and expose the results at `/metrics`."""
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    metrics = Metrics(app.config.get("METRICS_MERGE_INTERVAL", 1.0))
+    app.extensions["metrics"] = metrics
+
+    @app.before_request
+    def start_request_timings():
+        g._request_timings = RequestTimings()
+
+    @app.after_request
+    def record_request_timings(response):
+        timings = g.pop("_request_timings", None)
+        if timings is None:
+            return response
+        endpoint = (("endpoint", request.endpoint or "<unmatched>"),)
+        metrics.inc("cogsearch_requests_total", endpoint + (("status", str(response.status_code)),))
+        metrics.observe("cogsearch_request_duration_seconds", endpoint, time.perf_counter() - timings.started)
+        metrics.observe("cogsearch_request_db_seconds", endpoint, timings.db_seconds)
+        metrics.observe("cogsearch_request_db_queries", endpoint, timings.queries)
+        if timings.checkouts:
+            metrics.inc("cogsearch_request_db_checkouts_total", endpoint, timings.checkouts)
+        metrics.maybe_merge()
+        return response
+
+    def template_started(sender, template, context, **extra):
+        timings = request_timings()
+        if timings is not None:
+            timings.renders.append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        timings = request_timings()
+        if timings is not None and timings.renders:
+            started = timings.renders.pop()
+            metrics.observe(
+                "cogsearch_template_render_seconds",
+                (("template", template.name or "<string>"),),
+                time.perf_counter() - started,
+            )
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+    def pool_samples():
+        pool = app.extensions.get("db_pool")
+        if pool is None:
+            return []
+        stats = pool.stats()
+        return [
+            ("cogsearch_db_pool_connections", (("state", "idle"),), stats["idle"]),
+            ("cogsearch_db_pool_connections", (("state", "checked_out"),), stats["checked_out"]),
+            ("cogsearch_db_pool_connections", (("state", "open"),), stats["open"]),
+            ("cogsearch_db_connections_opened_total", (), stats["total_opened"]),
+        ]
+
+    metrics.add_collector(pool_samples)
+
+    def startup_samples():
+        timings = app.extensions.get("startup_timings")
+        if timings is None:
+            return []
+        return [("cogsearch_startup_phase_seconds", (("phase", name),), seconds) for name, seconds in timings.phases]
+
+    metrics.add_collector(startup_samples)
+
+    @stats_endpoint
+    def metrics_view():
+        return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from flask import current_app, session
+
+from ..db import get_db_connection
+
+
+def parse_order(value) -> tuple:
+    """Split a `#`-delimited order string ("1#2#3#") into its items."""
+    return tuple(part for part in str(value or "").split("#") if part)
+
+
+class ParticipantContext:
+    """A participant's study plan from tb1_user, parsed once.
+
+    `version` identifies the state the object was built from; the session
+    carries the current version so every process can tell a stale copy.
+    """
+
+    __slots__ = ("uid", "sid", "topic_order", "condition_order", "con_done", "task_done", "version")
+
+    def __init__(self, uid, sid, topic_order=(), condition_order=(), con_done=0, task_done=0, version=0):
+        self.uid = uid
+        self.sid = sid
+        self.topic_order = tuple(topic_order)
+        self.condition_order = tuple(condition_order)
+        self.con_done = int(con_done or 0)
+        self.task_done = int(task_done or 0)
+        self.version = version
+
+    @classmethod
+    def from_row(cls, uid, sid, row: dict, version=0) -> "ParticipantContext":
+        return cls(
+            uid,
+            sid,
+            topic_order=parse_order(row.get("topIDorder")),
+            condition_order=parse_order(row.get("conIDorder")),
+            con_done=row.get("conDone"),
+            task_done=row.get("taskDone"),
+            version=version,
+        )
+
+    @property
+    def current_topic(self) -> str:
+        """topID of the task in progress, or "" once every task is done."""
+        if 0 <= self.task_done < len(self.topic_order):
+            return self.topic_order[self.task_done]
+        return ""
+
+    @property
+    def current_condition(self) -> int | None:
+        """conID of the condition in progress, or None past the end of the sequence."""
+        if 0 <= self.con_done < len(self.condition_order):
+            try:
+                return int(self.condition_order[self.con_done])
+            except ValueError:
+                return 1
+        return None
+
+
+class ParticipantCache:
+    """Per-process LRU of ParticipantContext by uid."""
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max(int(max_entries), 1)
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, uid) -> ParticipantContext | None:
+        with self._lock:
+            ctx = self._items.get(uid)
+            if ctx is not None:
+                self._items.move_to_end(uid)
+            return ctx
+
+    def put(self, ctx: ParticipantContext) -> None:
+        with self._lock:
+            self._items[ctx.uid] = ctx
+            self._items.move_to_end(ctx.uid)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard(self, uid) -> None:
+        with self._lock:
+            self._items.pop(uid, None)
+
+
+def get_participant_cache(app=None) -> ParticipantCache:
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get("participant_cache")
+    if cache is None:
+        cache = app.extensions.setdefault(
+            "participant_cache", ParticipantCache(app.config.get("PARTICIPANT_CACHE_MAX_ENTRIES", 5000))
+        )
+    return cache
+
+
+def _session_version(uid, sid):
+    marker = session.get("participant_version")
+    if marker and marker[0] == uid and marker[1] == sid:
+        return marker[2]
+    return None
+
+
+def _remember(ctx: ParticipantContext, written: bool = True) -> None:
+    """Cache `ctx` as the participant's current state, everywhere.
+
+    The new version goes into the session, so copies cached by other
+    processes stop matching. When `ctx` reflects this request's own
+    (`written`) changes and they are rolled back, the cached copy is dropped
+    and the next lookup reads tb1_user again.
+    """
+    ctx.version = (_session_version(ctx.uid, ctx.sid) or 0) + 1
+    session["participant_version"] = [ctx.uid, ctx.sid, ctx.version]
+    cache = get_participant_cache()
+    cache.put(ctx)
+    if not written:
+        return
+    link = get_db_connection()
+    on_rollback = getattr(link, "on_rollback", None)
+    if on_rollback is not None:
+        on_rollback(lambda: cache.discard(ctx.uid))
+
+
+def get_participant_context(uid, sid) -> ParticipantContext | None:
+    """The participant's context, from the process cache when it is current, else tb1_user."""
+    version = _session_version(uid, sid)
+    cache = get_participant_cache()
+    ctx = cache.get(uid)
+    if ctx is not None and ctx.sid == sid and version is not None and ctx.version == version:
+        cache.hits += 1
+        return ctx
+    cache.misses += 1
+
+    link = get_db_connection()
+    cursor = link.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT topIDorder, conIDorder, taskDone, conDone FROM tb1_user WHERE uid = %s AND sid = %s",
+            (uid, sid),
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row:
+        return None
+    ctx = ParticipantContext.from_row(uid, sid, row)
+    if version is None:
+        _remember(ctx, written=False)
+    else:
+        ctx.version = version
+        cache.put(ctx)
+    return ctx
+
+
+def start_participant(uid, sid, topic_order: str, condition_order: str) -> ParticipantContext:
+    """Store the participant's topic and condition order (at /instruction) and cache the context."""
+    link = get_db_connection()
+    cursor = link.cursor()
+    try:
+        cursor.execute(
+            """
+            UPDATE tb1_user
+            SET topIDorder=%s, conIDorder=%s
+            WHERE sid=%s AND uid=%s
+            """,
+            (topic_order, condition_order, sid, uid),
+        )
+        cursor.execute("SELECT taskDone, conDone FROM tb1_user WHERE sid=%s AND uid=%s", (sid, uid))
+        row = cursor.fetchone() or (0, 0)
+    finally:
+        cursor.close()
+    ctx = ParticipantContext(
+        uid,
+        sid,
+        topic_order=parse_order(topic_order),
+        condition_order=parse_order(condition_order),
+        task_done=row[0],
+        con_done=row[1],
+    )
+    _remember(ctx)
+    return ctx
+
+
+def advance_condition(uid, sid) -> ParticipantContext | None:
+    """Mark the current condition done (`conDone + 1`), in tb1_user and the cached context."""
+    ctx = get_participant_context(uid, sid)
+    link = get_db_connection()
+    cursor = link.cursor()
+    try:
+        cursor.execute(
+            "UPDATE tb1_user SET conDone = conDone + 1 WHERE sid = %s AND uid = %s",
+            (sid, uid),
+        )
+    finally:
+        cursor.close()
+    if ctx is None:
+        return None
+    ctx = ParticipantContext(
+        uid, sid, ctx.topic_order, ctx.condition_order, con_done=ctx.con_done + 1, task_done=ctx.task_done
+    )
+    _remember(ctx)
+    return ctx
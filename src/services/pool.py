@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _PoolEntry:
+    __slots__ = ("conn", "created_at", "last_used", "overflow")
+
+    def __init__(self, conn, overflow: bool):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+        self.overflow = overflow
+
+
+class ConnectionPool:
+    """Thread-safe connection pool with overflow, idle timeout and max lifetime.
+
+    `size` connections are kept open between checkouts; up to `max_overflow`
+    extra connections may be opened under load and are closed as soon as they
+    are returned. Idle connections older than `idle_timeout` seconds, or any
+    connection older than `max_lifetime` seconds, are discarded on checkout so
+    the server's `wait_timeout` never bites us mid-request. With
+    `reset_on_return` the pool rolls back whatever the borrower left open.
+    """
+
+    def __init__(
+        self,
+        creator: Callable[[], Any],
+        size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        idle_timeout: float = 300.0,
+        max_lifetime: float = 3600.0,
+        reset_on_return: bool = True,
+        ping_after: float = 30.0,
+    ):
+        self._creator = creator
+        self.size = max(int(size), 0)
+        self.max_overflow = max(int(max_overflow), 0)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.reset_on_return = reset_on_return
+        self.ping_after = ping_after
+
+        self._idle: deque[_PoolEntry] = deque()
+        self._checked_out: dict[int, _PoolEntry] = {}
+        self._cond = threading.Condition()
+        self._opened = 0
+        self._total_opened = 0
+
+    # -- checkout / checkin -------------------------------------------------
+
+    def acquire(self):
+        """Borrow a connection, opening a new one if the pool has headroom."""
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        while True:
+            with self._cond:
+                entry = self._pop_unexpired_idle()
+                if entry is None:
+                    entry = self._reserve_slot(deadline)
+            if entry is None:
+                return self._open()
+            # Only ping connections that sat idle long enough to have been
+            # dropped server-side; hot connections go straight back out.
+            if time.monotonic() - entry.last_used > self.ping_after and not self._alive(entry.conn):
+                with self._cond:
+                    self._close_entry(entry)
+                continue
+            with self._cond:
+                entry.last_used = time.monotonic()
+                self._checked_out[id(entry.conn)] = entry
+            return entry.conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        """Return a connection to the pool (or close it if it should not be reused)."""
+        with self._cond:
+            entry = self._checked_out.pop(id(conn), None)
+        if entry is None:
+            return
+        keep = not discard and not entry.overflow and not self._expired(entry)
+        if keep and self.reset_on_return:
+            keep = self._reset(conn)
+        with self._cond:
+            if keep:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+            else:
+                self._close_entry(entry)
+            self._cond.notify()
+
+    def dispose(self) -> None:
+        """Close every idle connection; checked-out ones close when released."""
+        with self._cond:
+            while self._idle:
+                self._close_entry(self._idle.popleft())
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._opened,
+                "idle": len(self._idle),
+                "checked_out": len(self._checked_out),
+                "total_opened": self._total_opened,
+            }
+
+    # -- internals (the _pop/_reserve/_close helpers expect self._cond held) --
+
+    def _pop_unexpired_idle(self) -> _PoolEntry | None:
+        while self._idle:
+            # LIFO keeps a small hot set of connections and lets the rest age out.
+            entry = self._idle.pop()
+            if self._expired(entry):
+                self._close_entry(entry)
+                continue
+            return entry
+        return None
+
+    def _reserve_slot(self, deadline: float | None) -> _PoolEntry | None:
+        """Wait until a new connection may be opened and claim its slot.
+
+        Returns None once the slot is reserved; returns an idle entry instead
+        if one is handed back while we were waiting.
+        """
+        while self._opened >= self.size + self.max_overflow:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise PoolTimeout(
+                    f"connection pool exhausted ({self._opened} open, "
+                    f"size={self.size}, max_overflow={self.max_overflow})"
+                )
+            self._cond.wait(remaining)
+            entry = self._pop_unexpired_idle()
+            if entry is not None:
+                return entry
+        # Reserve the slot before the (slow) handshake so concurrent
+        # checkouts cannot overshoot the limit.
+        self._opened += 1
+        return None
+
+    def _open(self):
+        try:
+            conn = self._creator()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            overflow = self._opened > self.size
+            self._total_opened += 1
+            self._checked_out[id(conn)] = _PoolEntry(conn, overflow)
+        return conn
+
+    def _expired(self, entry: _PoolEntry) -> bool:
+        now = time.monotonic()
+        if self.max_lifetime and now - entry.created_at > self.max_lifetime:
+            return True
+        if self.idle_timeout and now - entry.last_used > self.idle_timeout:
+            return True
+        return False
+
+    @staticmethod
+    def _alive(conn) -> bool:
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(conn) -> bool:
+        try:
+            conn.rollback()
+            return True
+        except Exception as e:
+            print(f"Pool reset failed, discarding connection: {e}")
+            return False
+
+    def _close_entry(self, entry: _PoolEntry) -> None:
+        self._opened -= 1
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
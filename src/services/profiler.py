@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+import click
+from flask import current_app
+from itsdangerous import BadSignature, TimestampSigner
+
+
+PROFILE_HEADER = "X-Profile-Token"
+_HEADER_KEY = "HTTP_" + PROFILE_HEADER.upper().replace("-", "_")
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+
+
+class RequestProfiler:
+    """WSGI middleware that runs cProfile around selected requests.
+
+    A request is profiled when it carries a valid `X-Profile-Token` header
+    (see `token()`), or at random with probability `sample_rate`, limited to
+    `paths` when given. Each profile is written to `directory` as a pstats
+    `.prof` file plus a `.txt` summary of the `top` costliest functions;
+    the response carries their name in `X-Profile-Id`. One request is
+    profiled at a time per process; others meanwhile run unprofiled.
+    """
+
+    def __init__(
+        self,
+        wsgi_app,
+        secret: str,
+        directory: str,
+        sample_rate: float = 0.0,
+        paths=(),
+        top: int = 40,
+        token_max_age: float = 3600.0,
+    ):
+        self.wsgi_app = wsgi_app
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.paths = tuple(paths)
+        self.top = top
+        self.token_max_age = token_max_age
+        self._signer = TimestampSigner(secret, salt="cogsearch-profile")
+        self._busy = threading.Lock()
+
+    def token(self) -> str:
+        return self._signer.sign(b"profile").decode()
+
+    def _trigger(self, environ) -> str | None:
+        token = environ.get(_HEADER_KEY)
+        if token:
+            try:
+                self._signer.unsign(token, max_age=self.token_max_age)
+                return "header"
+            except BadSignature:
+                return None
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        if self.paths and environ.get("PATH_INFO", "") not in self.paths:
+            return None
+        return "sample"
+
+    def __call__(self, environ, start_response):
+        trigger = self._trigger(environ)
+        if trigger is None or not self._busy.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+        try:
+            return self._profiled(environ, start_response, trigger)
+        finally:
+            self._busy.release()
+
+    def _profiled(self, environ, start_response, trigger: str):
+        method = environ.get("REQUEST_METHOD", "GET")
+        path = environ.get("PATH_INFO", "/")
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}"
+            f"-{os.getpid()}-{method}-{_SLUG.sub('_', path).strip('_') or 'root'}"
+        )
+        status = []
+
+        def capture_start_response(status_line, headers, exc_info=None):
+            status.append(status_line.split(" ", 1)[0])
+            return start_response(status_line, headers + [("X-Profile-Id", name)], exc_info)
+
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            # The body is materialized so lazy responses are profiled too.
+            iterable = self.wsgi_app(environ, capture_start_response)
+            try:
+                body = list(iterable)
+            finally:
+                if hasattr(iterable, "close"):
+                    iterable.close()
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            self._write(profile, name, f"{method} {path}", status[0] if status else "-", elapsed, trigger)
+        return body
+
+    def _write(self, profile, name: str, request_line: str, status: str, elapsed: float, trigger: str) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, name)
+            profile.dump_stats(base + ".prof")
+            summary = io.StringIO()
+            summary.write(f"{request_line} -> {status} in {elapsed * 1000:.1f} ms ({trigger})\n\n")
+            stats = pstats.Stats(profile, stream=summary)
+            stats.sort_stats("cumulative").print_stats(self.top)
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(summary.getvalue())
+        except Exception as e:
+            print(f"Could not write profile {name}: {e}")
+
+
+def init_profiler(app) -> None:
+    """Wrap the app in `RequestProfiler` when `PROFILER_ENABLED`; otherwise nothing is installed."""
+    if not app.config.get("PROFILER_ENABLED", False):
+        return
+    paths = app.config.get("PROFILER_PATHS") or ()
+    if isinstance(paths, str):
+        paths = [path.strip() for path in paths.split(",") if path.strip()]
+    profiler = RequestProfiler(
+        app.wsgi_app,
+        secret=app.config.get("PROFILER_SECRET") or app.secret_key,
+        directory=app.config.get("PROFILER_DIR") or os.path.join(app.instance_path, "profiles"),
+        sample_rate=app.config.get("PROFILER_SAMPLE_RATE", 0.0),
+        paths=paths,
+        top=app.config.get("PROFILER_TOP", 40),
+        token_max_age=app.config.get("PROFILER_TOKEN_MAX_AGE", 3600.0),
+    )
+    app.wsgi_app = profiler
+    app.extensions["profiler"] = profiler
+    app.cli.add_command(profile_token_command)
+
+
+@click.command("profile-token")
+def profile_token_command():
+    """Print a token that makes a request carrying it in X-Profile-Token get profiled."""
+    profiler = current_app.extensions["profiler"]
+    click.echo(profiler.token())
+    click.echo(f"Valid for {int(profiler.token_max_age)} s; profiles go to {profiler.directory}")
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+
+from flask import has_request_context, jsonify, request
+
+from .metrics import stats_endpoint
+
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s")
+_NUMBERS = re.compile(r"(?<![\w.`])-?\d+(?:\.\d+)?(?![\w.`])")
+_IN_LISTS = re.compile(r"\bin\s*\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROW_LISTS = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_SPACE = re.compile(r"\s+")
+
+STAT_ORDERS = ("total", "calls", "max", "mean", "rows")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """Normalize a statement so that calls differing only in values match.
+
+    Literals and placeholders become `?`, `IN (...)` lists and multi-row
+    `VALUES` collapse to one item, comments go and whitespace is folded.
+    """
+    text = _STRINGS.sub("?", sql)
+    text = _COMMENTS.sub(" ", text)
+    text = _PLACEHOLDERS.sub("?", text)
+    text = _NUMBERS.sub("?", text)
+    text = _SPACE.sub(" ", text).strip().lower()
+    text = _IN_LISTS.sub("in (?+)", text)
+    return _ROW_LISTS.sub(r"\1, ...", text)
+
+
+def calling_route() -> str:
+    """Endpoint of the current request, or the thread name outside one (job workers, CLI)."""
+    if has_request_context():
+        return request.endpoint or request.path
+    return f"<{threading.current_thread().name}>"
+
+
+class QueryStats:
+    """Per-fingerprint call counts, latency and row totals for one process.
+
+    Statements slower than `slow_threshold` seconds are also appended to
+    `slow_log_path`, one line each with the calling route. Once
+    `max_fingerprints` distinct statements are tracked, further ones are
+    counted under `<other>`.
+    """
+
+    OTHER = "<other>"
+
+    def __init__(self, slow_threshold: float = 0.0, slow_log_path: str = "", max_fingerprints: int = 2000):
+        self.slow_threshold = slow_threshold
+        self.slow_log_path = slow_log_path
+        self.max_fingerprints = max(int(max_fingerprints), 1)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        # fingerprint -> [calls, total seconds, max seconds, rows, slow calls]
+        self._stats: dict = {}
+
+    def record(self, sql, seconds: float, rows: int = 0) -> None:
+        if isinstance(sql, (bytes, bytearray)):
+            sql = sql.decode("utf-8", "replace")
+        fp = fingerprint(str(sql))
+        slow = bool(self.slow_threshold) and seconds >= self.slow_threshold
+        with self._lock:
+            entry = self._stats.get(fp)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    fp = self.OTHER
+                entry = self._stats.setdefault(fp, [0, 0.0, 0.0, 0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            if seconds > entry[2]:
+                entry[2] = seconds
+            entry[3] += rows
+            entry[4] += slow
+        if slow:
+            self._log_slow(fp, seconds, rows)
+
+    def _log_slow(self, fp: str, seconds: float, rows: int) -> None:
+        line = (
+            f"{time.strftime('%Y-%m-%dT%H:%M:%S')} {seconds:.3f}s rows={rows} "
+            f"route={calling_route()} pid={os.getpid()} sql={fp}\n"
+        )
+        if not self.slow_log_path:
+            print(f"Slow query: {line}", end="")
+            return
+        try:
+            with self._log_lock, open(self.slow_log_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Could not write slow query log: {e}")
+
+    def snapshot(self, order: str = "total", limit: int | None = None) -> list:
+        with self._lock:
+            items = [(fp, list(entry)) for fp, entry in self._stats.items()]
+        rows = [
+            {
+                "fingerprint": fp,
+                "calls": calls,
+                "total_seconds": round(total, 6),
+                "mean_seconds": round(total / calls, 6) if calls else 0.0,
+                "max_seconds": round(longest, 6),
+                "rows": row_count,
+                "slow_calls": slow,
+            }
+            for fp, (calls, total, longest, row_count, slow) in items
+        ]
+        key = {"total": "total_seconds", "max": "max_seconds", "mean": "mean_seconds"}.get(order, order)
+        rows.sort(key=lambda row: row[key], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = {}
+            self.started = time.time()
+
+
+def init_query_stats(app) -> None:
+    """Track every statement run through `get_db_connection()`; report at `/metrics/queries`."""
+    if not app.config.get("QUERY_STATS_ENABLED", True):
+        return
+    log_path = app.config.get("SLOW_QUERY_LOG")
+    if log_path is None:
+        log_path = os.path.join(app.instance_path, "slow_queries.log")
+    if log_path:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    stats = QueryStats(
+        slow_threshold=app.config.get("SLOW_QUERY_THRESHOLD", 0.0),
+        slow_log_path=log_path,
+        max_fingerprints=app.config.get("QUERY_STATS_MAX_FINGERPRINTS", 2000),
+    )
+    app.extensions["query_stats"] = stats
+
+    @stats_endpoint
+    def query_stats_view():
+        order = request.args.get("order", "total")
+        if order not in STAT_ORDERS:
+            order = "total"
+        limit = request.args.get("limit", default=50, type=int)
+        return jsonify(
+            {
+                "pid": os.getpid(),
+                "since": stats.started,
+                "order": order,
+                "queries": stats.snapshot(order, limit),
+            }
+        )
+
+    app.add_url_rule("/metrics/queries", "query_stats", query_stats_view)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+# Answer keys and scoring rules shared by the task routes and
+# `scripts/rescore.py`. Keep this module free of app imports: the rescoring
+# script loads it straight from its file path, without creating the app.
+
+
+# Correct option for voc1..voc15; VOCAB_NOT_SURE is the "not sure" option,
+# which is neither rewarded nor penalised.
+VOCAB_ANSWER_KEY = ("1", "2", "2", "2", "3", "2", "4", "1", "4", "5", "3", "4", "1", "3", "5")
+VOCAB_NOT_SURE = "6"
+VOCAB_WRONG_PENALTY = 0.2
+
+
+LETTER_COMPARISON_ROUNDS = {
+    1: [
+        {"left": "PRDBZTYFN", "right": "PRDBZTYFN", "answer": "S"},
+        {"left": "NCWJDZ", "right": "NCMJDZ", "answer": "D"},
+        {"left": "KHW", "right": "KBW", "answer": "D"},
+        {"left": "ZRBGMF", "right": "ZRBCMF", "answer": "D"},
+        {"left": "BTH", "right": "BYH", "answer": "D"},
+        {"left": "XWKQRYCNZ", "right": "XWKQRYCNZ", "answer": "S"},
+        {"left": "HNPDLK", "right": "HNPDLK", "answer": "S"},
+        {"left": "WMQTRSGLZ", "right": "WMQTRZGLZ", "answer": "D"},
+        {"left": "JPN", "right": "JPN", "answer": "S"},
+        {"left": "QLXSVT", "right": "QLNSVT", "answer": "D"},
+    ],
+    2: [
+        {"left": "YXHKZVFPB", "right": "YXHKZVFPD", "answer": "D"},
+        {"left": "RJZ", "right": "RJZ", "answer": "S"},
+        {"left": "CLNPZD", "right": "CLNPZD", "answer": "S"},
+        {"left": "DCBPFHXYJ", "right": "DCBPFHXYJ", "answer": "S"},
+        {"left": "MWR", "right": "ZWR", "answer": "D"},
+        {"left": "LPKXZW", "right": "LPKXZW", "answer": "S"},
+        {"left": "TZL", "right": "TZQ", "answer": "D"},
+        {"left": "CSDBFPHXZ", "right": "CSDBFPHXZ", "answer": "S"},
+        {"left": "QHZXPC", "right": "QHZWPC", "answer": "D"},
+        {"left": "JNWXHPFBD", "right": "JNWXHPFMD", "answer": "D"},
+    ],
+}
+
+# tb11_profile column holding each round's number of correct items.
+LETTER_SCORE_COLUMNS = {1: "lcOneScore", 2: "lcTwoScore"}
+
+
+def score_vocab(answers) -> float:
+    """vocScore for voc1..voc15: +1 per correct answer, -0.2 per wrong one."""
+    correct = wrong = 0
+    for answer, right in zip(answers, VOCAB_ANSWER_KEY):
+        if answer == right:
+            correct += 1
+        elif answer != VOCAB_NOT_SURE:
+            wrong += 1
+    return round(correct - VOCAB_WRONG_PENALTY * wrong, 1)
+
+
+def grade_choice(choice, correct_answer) -> int:
+    """isCorrect for a multiple-choice answer (case-insensitive)."""
+    return 1 if str(choice).strip().lower() == str(correct_answer).strip().lower() else 0
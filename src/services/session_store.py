@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import marshal
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+SESSION_BACKENDS = {"cookie", "memory", "sqlite"}
+
+# Payload format: one flag byte, then marshal data (zlib-compressed when the
+# flag says so). marshal is fast and compact for the plain str/int/list/dict
+# values the study keeps in the session, and never leaves the server.
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+_COMPRESS_OVER = 512
+
+
+def encode_session(data: dict) -> bytes:
+    payload = marshal.dumps(dict(data))
+    if len(payload) > _COMPRESS_OVER:
+        return _ZLIB + zlib.compress(payload)
+    return _RAW + payload
+
+
+def decode_session(blob: bytes) -> dict:
+    flag, payload = blob[:1], blob[1:]
+    if flag == _ZLIB:
+        payload = zlib.decompress(payload)
+    elif flag != _RAW:
+        raise ValueError("unknown session encoding")
+    return marshal.loads(payload)
+
+
+class MemorySessionStore:
+    """Per-process LRU store; the oldest sessions are evicted past `max_entries`."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max(int(max_entries), 1)
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sid: str) -> bytes | None:
+        with self._lock:
+            item = self._items.get(sid)
+            if item is None:
+                return None
+            blob, expires = item
+            if expires < time.time():
+                del self._items[sid]
+                return None
+            self._items.move_to_end(sid)
+            return blob
+
+    def set(self, sid: str, blob: bytes, ttl: float) -> None:
+        with self._lock:
+            self._items[sid] = (blob, time.time() + ttl)
+            self._items.move_to_end(sid)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._items.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite file, shared by every app process on the host."""
+
+    def __init__(self, path: str, purge_every: int = 500):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread (and per process: re-opened after a fork).
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, sid: str) -> bytes | None:
+        row = self._conn().execute(
+            "SELECT data FROM sessions WHERE id=? AND expires>=?", (sid, time.time())
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def set(self, sid: str, blob: bytes, ttl: float) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET data=excluded.data, expires=excluded.expires",
+            (sid, sqlite3.Binary(blob), time.time() + ttl),
+        )
+        self._writes += 1
+        if self.purge_every and self._writes % self.purge_every == 0:
+            conn.execute("DELETE FROM sessions WHERE expires<?", (time.time(),))
+
+    def delete(self, sid: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE id=?", (sid,))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str | None = None, new: bool = False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keep session data in `store`; the cookie only carries a signed opaque id.
+
+    The store is written only when the session was modified, and the cookie
+    is only sent when a new id is issued (or the session is cleared).
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app) -> Signer | None:
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt="cogsearch-session-id")
+
+    def open_session(self, app, request):
+        signer = self._signer(app)
+        if signer is None:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            if sid:
+                blob = self.store.get(sid)
+                if blob is not None:
+                    try:
+                        return ServerSideSession(decode_session(blob), sid=sid)
+                    except Exception as e:
+                        print(f"Discarding undecodable session {sid[:8]}...: {e}")
+        return ServerSideSession(sid=secrets.token_urlsafe(24), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified or session.new:
+            ttl = app.permanent_session_lifetime.total_seconds()
+            self.store.set(session.sid, encode_session(session), ttl)
+        if session.new:
+            signed = self._signer(app).sign(session.sid.encode()).decode()
+            response.set_cookie(
+                name,
+                signed,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+            response.vary.add("Cookie")
+
+
+def init_session_store(app) -> None:
+    """Install the server-side session interface chosen by `SESSION_BACKEND`."""
+    backend = app.config.get("SESSION_BACKEND", "sqlite")
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    if backend == "cookie":
+        return
+    if backend == "memory":
+        store = MemorySessionStore(app.config.get("SESSION_MEMORY_MAX_ENTRIES", 10000))
+    else:
+        path = app.config.get("SESSION_SQLITE_PATH") or os.path.join(app.instance_path, "sessions.sqlite3")
+        store = SQLiteSessionStore(path)
+    app.session_interface = ServerSideSessionInterface(store)
+    app.extensions["session_store"] = store
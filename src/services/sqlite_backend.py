@@ -0,0 +1,389 @@
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+import weakref
+from decimal import Decimal
+from functools import lru_cache
+
+
+# Upserts without a conflict target need 3.35; IIF() needs 3.32.
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+# DECIMAL columns (bonusMoney, scores) may be written from Decimal values.
+sqlite3.register_adapter(Decimal, float)
+
+NOW_SQL = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_MASKED = re.compile(r"\x00(\d+)\x00")
+_PLACEHOLDERS = re.compile(r"%\((\w+)\)s|%s|%%")
+_UNSIGNED = re.compile(r"\bAS\s+(?:UNSIGNED|SIGNED)(?:\s+INTEGER)?\b", re.I)
+_NOW = re.compile(r"\b(?:CURRENT_TIMESTAMP|NOW)\s*\(\s*\d*\s*\)", re.I)
+_IF = re.compile(r"\bIF\s*\(", re.I)
+_INSERT_IGNORE = re.compile(r"^\s*INSERT\s+IGNORE\b", re.I)
+_ON_DUPLICATE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.I)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*`?([A-Za-z_]\w*)`?\s*\)", re.I)
+_TIMESTAMPDIFF = re.compile(r"\bTIMESTAMPDIFF\s*\(", re.I)
+_UPDATE_LIMIT = re.compile(
+    r"^\s*UPDATE\s+(`?\w+`?)\s+SET\s+(.*?)\s+WHERE\s+(.*?)\s+(ORDER\s+BY\s+.*?\s+)?LIMIT\s+(\S+?)\s*;?\s*$",
+    re.I | re.S,
+)
+_WRITES = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b", re.I)
+_SAVEPOINT_SQL = re.compile(r"^\s*(SAVEPOINT|RELEASE|ROLLBACK\s+TO)\s+(?:SAVEPOINT\s+)?(\w+)\s*;?\s*$", re.I)
+
+# TIMESTAMPDIFF unit -> milliseconds
+_UNIT_MS = {"SECOND": 1000, "MINUTE": 60000, "HOUR": 3600000, "DAY": 86400000, "WEEK": 604800000}
+
+
+def _call_args(text: str, start: int) -> tuple:
+    """Split the argument list whose "(" is at `start`; return (args, end)."""
+    depth = 0
+    args = []
+    last = start + 1
+    for i in range(start, len(text)):
+        ch = text[i]
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                args.append(text[last:i].strip())
+                return args, i + 1
+        elif ch == "," and depth == 1:
+            args.append(text[last:i].strip())
+            last = i + 1
+    raise ValueError(f"Unbalanced parentheses in SQL: {text}")
+
+
+def _timestampdiff(text: str) -> str:
+    match = _TIMESTAMPDIFF.search(text)
+    while match:
+        args, end = _call_args(text, match.end() - 1)
+        unit = args[0].upper() if args else ""
+        if len(args) != 3 or unit not in _UNIT_MS:
+            raise ValueError(f"Unsupported TIMESTAMPDIFF: {text[match.start():end]}")
+        # Rounded to the millisecond first so whole seconds stay whole;
+        # CAST truncates toward zero like MySQL.
+        replacement = (
+            f"CAST(ROUND((julianday({args[2]}) - julianday({args[1]})) * 86400000) "
+            f"/ {_UNIT_MS[unit]} AS INTEGER)"
+        )
+        text = text[: match.start()] + replacement + text[end:]
+        match = _TIMESTAMPDIFF.search(text, match.start() + len(replacement))
+    return text
+
+
+def _placeholder(match) -> str:
+    if match.group(1):
+        return f":{match.group(1)}"
+    return "%" if match.group(0) == "%%" else "?"
+
+
+@lru_cache(maxsize=1024)
+def translate_sql(sql: str) -> tuple:
+    """Rewrite a MySQL statement for SQLite; returns (sql, starts_a_write).
+
+    Handles the constructs the app uses: `%s` / `%(name)s` placeholders,
+    `ON DUPLICATE KEY UPDATE ... VALUES(col)`, `IF()`, `INSERT IGNORE`,
+    `UPDATE ... ORDER BY ... LIMIT n`, `TIMESTAMPDIFF`,
+    `CAST(... AS UNSIGNED)` and `CURRENT_TIMESTAMP(6)` / `NOW()`.
+    Multi-table UPDATEs are not translated (see finalize.py).
+    """
+    # String literals are set aside so nothing inside them is rewritten.
+    literals = []
+
+    def mask(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    text = _STRINGS.sub(mask, sql)
+    text = _PLACEHOLDERS.sub(_placeholder, text)
+    text = _UNSIGNED.sub("AS INTEGER", text)
+    text = _NOW.sub(NOW_SQL, text)
+    text = _IF.sub("IIF(", text)
+    text = _INSERT_IGNORE.sub("INSERT OR IGNORE", text)
+    text = _timestampdiff(text)
+
+    duplicate = _ON_DUPLICATE.search(text)
+    if duplicate:
+        updates = _VALUES_REF.sub(r"excluded.\1", text[duplicate.end():])
+        # No conflict target: like MySQL, any unique key conflict updates.
+        text = f"{text[: duplicate.start()]}ON CONFLICT DO UPDATE SET{updates}"
+
+    limited = _UPDATE_LIMIT.match(text)
+    if limited:
+        table, assignments, where, order_by, limit = limited.groups()
+        text = (
+            f"UPDATE {table} SET {assignments} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE {where} {order_by or ''}LIMIT {limit})"
+        )
+
+    text = _MASKED.sub(lambda m: literals[int(m.group(1))], text)
+    return text, bool(_WRITES.match(text))
+
+
+def _params(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return params
+    return tuple(params)
+
+
+class SQLiteCursor:
+    """Buffered cursor with the parts of mysql.connector's API the app uses.
+
+    Every result is fetched on `execute()`, as with `buffered=True`, so
+    `rowcount` is the number of rows returned (or affected). With
+    `dictionary=True` rows are dicts keyed by column name.
+    """
+
+    def __init__(self, connection: "SQLiteConnection", dictionary: bool = False):
+        self._connection = connection
+        self._dictionary = dictionary
+        self._cursor = connection.raw().cursor()
+        self._rows: list = []
+        self._pos = 0
+        self.rowcount = -1
+        self.lastrowid = None
+        self.description = None
+
+    @property
+    def column_names(self) -> tuple:
+        return tuple(d[0] for d in self.description or ())
+
+    def execute(self, operation, params=None):
+        sql, write = translate_sql(operation)
+        if self._connection.defer_savepoint(sql):
+            self.description = None
+            self._rows = []
+            self._pos = 0
+            self.rowcount = 0
+            return
+        if write:
+            self._connection.begin_write()
+        self._cursor.execute(sql, _params(params))
+        self._buffer()
+
+    def executemany(self, operation, seq_params):
+        sql, write = translate_sql(operation)
+        if write:
+            self._connection.begin_write()
+        self._cursor.executemany(sql, [_params(params) for params in seq_params])
+        self._buffer()
+
+    def _buffer(self) -> None:
+        cursor = self._cursor
+        self.description = cursor.description
+        self.lastrowid = cursor.lastrowid
+        self._pos = 0
+        if cursor.description is None:
+            self._rows = []
+            self.rowcount = cursor.rowcount
+            return
+        rows = cursor.fetchall()
+        if self._dictionary:
+            names = [d[0] for d in cursor.description]
+            rows = [dict(zip(names, row)) for row in rows]
+        self._rows = rows
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self, size: int = 1) -> list:
+        rows = self._rows[self._pos : self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self) -> list:
+        rows = self._rows[self._pos :]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self) -> None:
+        self._rows = []
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """An sqlite3 connection that takes the app's MySQL-dialect SQL.
+
+    Statements go through `translate_sql`. As with MySQL and autocommit off,
+    writes stay in one transaction until `commit()` / `rollback()`; it is
+    opened with BEGIN IMMEDIATE at the first write, so concurrent writers
+    wait on the busy timeout instead of failing to upgrade a read lock.
+    Reads outside a transaction see the latest commit. A savepoint set
+    outside a transaction is held back until that first write, so a request
+    that only reads never takes the write lock.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.pid = os.getpid()
+        self.checkouts = 0
+        self._pending_savepoints: list = []
+        # Only the owning thread uses it, but the pool may close it from another.
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+
+    def raw(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return self._conn
+
+    def cursor(self, dictionary: bool = False, buffered: bool = True, **kwargs) -> SQLiteCursor:
+        return SQLiteCursor(self, dictionary)
+
+    def begin_write(self) -> None:
+        if not self.raw().in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for name in self._pending_savepoints:
+                self._conn.execute(f"SAVEPOINT {name}")
+            self._pending_savepoints.clear()
+
+    def defer_savepoint(self, sql: str) -> bool:
+        """Track a savepoint statement outside a transaction; True if it needs no SQL.
+
+        Nothing has been written since the last commit then, so SAVEPOINT
+        only has to be remembered for `begin_write` and ROLLBACK TO / RELEASE
+        of a remembered savepoint have nothing to undo.
+        """
+        match = _SAVEPOINT_SQL.match(sql)
+        if match is None or self.raw().in_transaction:
+            return False
+        verb, name = match.group(1).split()[0].upper(), match.group(2)
+        pending = self._pending_savepoints
+        if verb == "SAVEPOINT":
+            if name in pending:
+                # Re-using a name moves the savepoint forward.
+                del pending[pending.index(name):]
+            pending.append(name)
+        elif name not in pending:
+            return False
+        elif verb == "RELEASE":
+            del pending[pending.index(name):]
+        else:
+            del pending[pending.index(name) + 1:]
+        return True
+
+    def commit(self) -> None:
+        self._pending_savepoints.clear()
+        self.raw().commit()
+
+    def rollback(self) -> None:
+        self._pending_savepoints.clear()
+        self.raw().rollback()
+
+    def is_connected(self) -> bool:
+        return self._conn is not None
+
+    def ping(self, reconnect: bool = False, attempts: int = 1, delay: int = 0) -> None:
+        self.raw()
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+
+class ThreadConnectionPool:
+    """One SQLite connection per thread, behind the `ConnectionPool` interface.
+
+    `acquire()` returns the calling thread's connection (opening it on first
+    use, and again after a fork); nested checkouts in one thread share it.
+    The last `release()` rolls back whatever was left uncommitted. A
+    connection is closed when its thread exits or on `release(discard=True)`.
+    """
+
+    def __init__(self, creator, reset_on_return: bool = True):
+        self._creator = creator
+        self.reset_on_return = reset_on_return
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = weakref.WeakSet()
+        self._total_opened = 0
+
+    def acquire(self) -> SQLiteConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn.pid != os.getpid() or not conn.is_connected():
+            conn = self._creator()
+            self._local.conn = conn
+            with self._lock:
+                self._open.add(conn)
+                self._total_opened += 1
+        conn.checkouts += 1
+        return conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        conn.checkouts = max(conn.checkouts - 1, 0)
+        if conn.checkouts and not discard:
+            return
+        if not discard and self.reset_on_return:
+            try:
+                conn.rollback()
+            except Exception as e:
+                print(f"Pool reset failed, discarding connection: {e}")
+                discard = True
+        if discard:
+            conn.checkouts = 0
+            self._close(conn)
+
+    def dispose(self) -> None:
+        """Close every connection not checked out; their threads reopen on demand."""
+        with self._lock:
+            idle = [conn for conn in self._open if not conn.checkouts]
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            conns = list(self._open)
+        checked_out = sum(1 for conn in conns if conn.checkouts)
+        return {
+            "size": len(conns),
+            "max_overflow": 0,
+            "open": len(conns),
+            "idle": len(conns) - checked_out,
+            "checked_out": checked_out,
+            "total_opened": self._total_opened,
+        }
+
+    def _close(self, conn) -> None:
+        with self._lock:
+            self._open.discard(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def create_schema(path: str, schema_path: str) -> bool:
+    """Create the study tables in `path` from `schema_path` if they are missing."""
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='tb1_user'").fetchone():
+            return False
+        with open(schema_path, encoding="utf-8") as f:
+            conn.executescript(f.read())
+        return True
+    finally:
+        conn.close()
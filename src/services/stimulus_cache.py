@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable
+
+
+# Static study content, per task kind. Rows are loaded in these orders so
+# cached lookups return them exactly as the old per-request queries did.
+STIMULUS_TABLES = {
+    "formal": {
+        "topic": ("tb2_topic", "topID"),
+        "subtopic": ("tb3_subtopic", "topID, subtopID"),
+        "passage": ("tb4_passage", "topID, subtopID, conID, passID"),
+    },
+    "practice": {
+        "topic": ("tb12_prac_topic", "topID"),
+        "subtopic": ("tb13_prac_subtopic", "topID, subtopID"),
+        "passage": ("tb14_prac_passage", "topID, subtopID, conID, passID"),
+    },
+}
+QUESTIONS_TABLE = ("tb21_questions", "passID, questionID")
+# Columns copied into each answer-key entry, besides the lower-cased answer.
+ANSWER_KEY_COLUMNS = ("questionID", "topID", "subtopID", "conID", "passID", "passOrder")
+
+
+def _order_key(pass_order) -> int:
+    """Mirror `CAST(passOrder AS UNSIGNED)`: leading digits, else 0."""
+    digits = ""
+    for ch in str(pass_order).strip():
+        if not ch.isdigit():
+            break
+        digits += ch
+    return int(digits) if digits else 0
+
+
+class _Table:
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = [tuple(row) for row in rows]
+
+    def as_dict(self, row) -> dict:
+        return dict(zip(self.columns, row))
+
+
+class _Snapshot:
+    """One immutable load of every stimulus table plus its lookup indexes."""
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self.topics: dict = {}
+        self.subtopics: dict = {}
+        self.subtopic_masks: dict = {}
+        self.passages: dict = {}
+        self.passages_by_id: dict = {}
+        for kind, names in STIMULUS_TABLES.items():
+            topics = tables[names["topic"][0]]
+            topic_col = topics.columns.index("topID")
+            for row in topics.rows:
+                self.topics[(kind, str(row[topic_col]))] = row
+
+            subtopics = tables[names["subtopic"][0]]
+            topic_col = subtopics.columns.index("topID")
+            subtop_col = subtopics.columns.index("subtopID")
+            for row in subtopics.rows:
+                key = (kind, str(row[topic_col]))
+                self.subtopics.setdefault(key, []).append(row)
+                # Bit i stands for subtopID i, as in `utils.VisitedSubtopics`.
+                subtop = str(row[subtop_col]).strip()
+                if subtop.isdigit():
+                    self.subtopic_masks[key] = self.subtopic_masks.get(key, 0) | (1 << int(subtop))
+
+            passages = tables[names["passage"][0]]
+            cols = [passages.columns.index(c) for c in ("topID", "subtopID", "conID", "passOrder", "passID")]
+            for row in passages.rows:
+                top, sub, con, order, pass_id = (row[i] for i in cols)
+                self.passages.setdefault((kind, str(top), str(sub), str(con), _order_key(order)), row)
+                self.passages_by_id.setdefault((kind, str(pass_id)), row)
+
+        questions = tables[QUESTIONS_TABLE[0]]
+        pass_col = questions.columns.index("passID")
+        self.questions: dict = {}
+        for row in questions.rows:
+            self.questions.setdefault(str(row[pass_col]), []).append(row)
+
+        # Questions page blocks, one per passage, built once per snapshot.
+        self.question_blocks: dict = {}
+        for pass_id, rows in self.questions.items():
+            dict_rows = [questions.as_dict(row) for row in rows]
+            self.question_blocks[pass_id] = {
+                "passID": dict_rows[0]["passID"],
+                "passTitle": dict_rows[0].get("passTitle") or dict_rows[0]["passID"],
+                "questions": dict_rows,
+            }
+
+        # Compiled answer key: questionID -> metadata plus the lower-cased
+        # correct answer, ready for grading without a per-row lookup.
+        self.answer_key: dict = {}
+        key_cols = [questions.columns.index(c) for c in ANSWER_KEY_COLUMNS]
+        answer_col = questions.columns.index("correctAns")
+        for row in questions.rows:
+            entry = {name: row[i] for name, i in zip(ANSWER_KEY_COLUMNS, key_cols)}
+            entry["correctAns"] = str(row[answer_col] or "").strip().lower()
+            self.answer_key[str(entry["questionID"])] = entry
+
+        digest = hashlib.sha1()
+        for name in sorted(tables):
+            digest.update(name.encode())
+            digest.update(repr(tables[name].columns).encode())
+            for row in tables[name].rows:
+                digest.update(repr(row).encode())
+        self.version = digest.hexdigest()[:12]
+        self.loaded_at = time.time()
+
+
+class StimulusCache:
+    """Read-through, in-process cache of the static stimulus tables.
+
+    The first lookup (or `load()` at startup) reads every topic, subtopic,
+    passage and question row once; afterwards lookups never touch the
+    database. Concurrent first lookups share a single load. A failed reload
+    keeps serving the previous snapshot, so a brief DB outage does not take
+    the task pages down with it (reloads are retried after `retry_interval`
+    seconds). `version` is a hash of the loaded content.
+
+    Invalidation works across processes: `invalidate()` touches
+    `stamp_path`, and every process reloads on its next lookup once it sees
+    the stamp change (checked at most every `check_interval` seconds).
+    """
+
+    def __init__(
+        self,
+        acquire: Callable,
+        release: Callable,
+        stamp_path: str | None = None,
+        check_interval: float = 2.0,
+        retry_interval: float = 5.0,
+    ):
+        self._acquire = acquire
+        self._release = release
+        self.stamp_path = stamp_path
+        self.check_interval = check_interval
+        self.retry_interval = retry_interval
+
+        self._snapshot: _Snapshot | None = None
+        self._load_lock = threading.Lock()
+        self._stamp = self._read_stamp()
+        self._next_check = 0.0
+        self._retry_at = 0.0
+        self._stale = False
+        self._loads = 0
+        self._load_failures = 0
+
+    # -- lookups --------------------------------------------------------------
+
+    def topic(self, topID, practice: bool = False, dictionary: bool = False):
+        """Row of tb2_topic / tb12_prac_topic, or None."""
+        snap, table = self._lookup(practice, "topic")
+        row = snap.topics.get((self._kind(practice), str(topID)))
+        return self._shape(table, row, dictionary)
+
+    def subtopics(self, topID, practice: bool = False, dictionary: bool = False) -> list:
+        """Subtopic rows of a topic, ordered by subtopID."""
+        snap, table = self._lookup(practice, "subtopic")
+        rows = snap.subtopics.get((self._kind(practice), str(topID)), [])
+        return [self._shape(table, row, dictionary) for row in rows]
+
+    def subtopic_mask(self, topID, practice: bool = False) -> int:
+        """Bitset of every subtopID of the topic (bit i set for subtopID i)."""
+        snap = self._current()
+        return snap.subtopic_masks.get((self._kind(practice), str(topID)), 0)
+
+    def passage(self, topID, subtopID, conID, passOrder, practice: bool = False, dictionary: bool = True):
+        """Passage at (topID, subtopID, conID, passOrder), or None."""
+        snap, table = self._lookup(practice, "passage")
+        key = (self._kind(practice), str(topID), str(subtopID), str(conID), _order_key(passOrder))
+        return self._shape(table, snap.passages.get(key), dictionary)
+
+    def passage_by_id(self, passID, practice: bool = False, dictionary: bool = True):
+        snap, table = self._lookup(practice, "passage")
+        row = snap.passages_by_id.get((self._kind(practice), str(passID)))
+        return self._shape(table, row, dictionary)
+
+    def questions(self, pass_ids, dictionary: bool = True) -> list:
+        """Question rows for `pass_ids`, ordered by passID then questionID."""
+        snap = self._current()
+        table = snap.tables[QUESTIONS_TABLE[0]]
+        rows = []
+        for pass_id in sorted({str(p) for p in pass_ids}):
+            rows.extend(snap.questions.get(pass_id, []))
+        return [self._shape(table, row, dictionary) for row in rows]
+
+    def questions_by_passage(self, pass_ids) -> list:
+        """Prebuilt `{passID, passTitle, questions}` blocks for `pass_ids`, ordered by passID.
+
+        The blocks are shared between requests; treat them as read-only.
+        """
+        snap = self._current()
+        blocks = []
+        for pass_id in sorted({str(p) for p in pass_ids}):
+            block = snap.question_blocks.get(pass_id)
+            if block is not None:
+                blocks.append(block)
+        return blocks
+
+    def answer_key(self) -> dict:
+        """Compiled comprehension key: questionID -> passage metadata and lower-cased `correctAns`.
+
+        Shared by every caller; treat it as read-only.
+        """
+        return self._current().answer_key
+
+    def first_topic_id(self, practice: bool = False):
+        snap, table = self._lookup(practice, "topic")
+        if not table.rows:
+            return None
+        return table.rows[0][table.columns.index("topID")]
+
+    # -- loading / invalidation -----------------------------------------------
+
+    @property
+    def version(self) -> str | None:
+        snap = self._snapshot
+        return snap.version if snap else None
+
+    def load(self) -> bool:
+        """(Re)load every table now; returns False if the database read failed."""
+        return self._reload(self._snapshot)
+
+    def invalidate(self) -> None:
+        """Mark the cache stale here and, via the stamp file, in every other process."""
+        self._stale = True
+        if self.stamp_path:
+            with open(self.stamp_path, "a"):
+                pass
+            os.utime(self.stamp_path, None)
+
+    def stats(self) -> dict:
+        snap = self._snapshot
+        return {
+            "loaded": snap is not None,
+            "version": snap.version if snap else None,
+            "loaded_at": snap.loaded_at if snap else None,
+            "rows": {name: len(t.rows) for name, t in snap.tables.items()} if snap else {},
+            "loads": self._loads,
+            "load_failures": self._load_failures,
+        }
+
+    def _current(self) -> _Snapshot:
+        snap = self._snapshot
+        if snap is None or self._needs_reload():
+            self._reload(snap)
+            snap = self._snapshot
+            if snap is None:
+                raise RuntimeError("stimulus cache is empty and the database is unavailable")
+        return snap
+
+    def _lookup(self, practice: bool, name: str):
+        snap = self._current()
+        return snap, snap.tables[STIMULUS_TABLES[self._kind(practice)][name][0]]
+
+    def _needs_reload(self) -> bool:
+        if time.monotonic() < self._retry_at:
+            # The last reload failed; keep serving what we have for a while.
+            return False
+        if self._stale:
+            return True
+        if not self.stamp_path:
+            return False
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            self._stamp = stamp
+            return True
+        return False
+
+    def _reload(self, seen: _Snapshot | None) -> bool:
+        # Single flight: whoever gets the lock loads; everyone queued behind
+        # it sees the fresh snapshot and returns without reading again.
+        with self._load_lock:
+            if self._snapshot is not seen:
+                return True
+            stamp = self._read_stamp()
+            try:
+                snapshot = _Snapshot(self._read_tables())
+            except Exception as e:
+                self._load_failures += 1
+                self._retry_at = time.monotonic() + self.retry_interval
+                print(f"Stimulus cache load failed: {e}")
+                return False
+            self._snapshot = snapshot
+            self._stamp = stamp
+            self._stale = False
+            self._retry_at = 0.0
+            self._loads += 1
+            return True
+
+    def _read_tables(self) -> dict:
+        queries = [names[part] for names in STIMULUS_TABLES.values() for part in ("topic", "subtopic", "passage")]
+        queries.append(QUESTIONS_TABLE)
+        conn = self._acquire()
+        try:
+            cursor = conn.cursor()
+            tables = {}
+            for table, order_by in queries:
+                cursor.execute(f"SELECT * FROM {table} ORDER BY {order_by}")
+                rows = cursor.fetchall()
+                tables[table] = _Table([d[0] for d in cursor.description], rows)
+            cursor.close()
+            conn.commit()
+        except Exception:
+            self._release(conn, discard=True)
+            raise
+        self._release(conn)
+        return tables
+
+    def _read_stamp(self):
+        if not self.stamp_path:
+            return None
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except OSError:
+            return None
+
+    @staticmethod
+    def _kind(practice: bool) -> str:
+        return "practice" if practice else "formal"
+
+    @staticmethod
+    def _shape(table: _Table, row, dictionary: bool):
+        if row is None:
+            return None
+        return table.as_dict(row) if dictionary else row
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+
+class UnitOfWork:
+    """Defers a request's commits to a single real COMMIT at the end.
+
+    Route code keeps its `commit()` / `rollback()` calls; inside a unit of
+    work they become savepoints. `commit()` marks everything written so far
+    as kept (SAVEPOINT) and `rollback()` undoes only what was written since
+    the last `commit()` (ROLLBACK TO SAVEPOINT), which is exactly what those
+    calls meant when each one hit the server. `complete()` then drops any
+    trailing uncommitted writes and issues the one COMMIT; `abort()` rolls
+    back the whole request.
+    """
+
+    SAVEPOINT = "uow_committed"
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.has_savepoint = False
+        self.commits = 0
+
+    def commit(self) -> None:
+        cursor = self._conn.cursor()
+        try:
+            # Re-using the name moves the savepoint forward.
+            cursor.execute(f"SAVEPOINT {self.SAVEPOINT}")
+        finally:
+            cursor.close()
+        self.has_savepoint = True
+        self.commits += 1
+
+    def rollback(self) -> None:
+        if not self.has_savepoint:
+            self._conn.rollback()
+            return
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {self.SAVEPOINT}")
+        finally:
+            cursor.close()
+
+    def complete(self) -> None:
+        """Commit everything `commit()` kept; discard anything after it."""
+        if not self.has_savepoint:
+            self._conn.rollback()
+            return
+        self.rollback()
+        self._conn.commit()
+        self.has_savepoint = False
+
+    def abort(self) -> None:
+        self._conn.rollback()
+        self.has_savepoint = False
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Callable
+
+from .finalize import PASSAGE_RT_TABLES
+
+
+OUTPUT1_URL_COLUMNS = (
+    "uid",
+    "sid",
+    "topID",
+    "subtopID",
+    "conID",
+    "passID",
+    "pageTypeID",
+    "time_stamp",
+    "unixTime",
+    "time_interval",
+    "url",
+    "pageTitle",
+)
+
+FULL_QUEUE_POLICIES = {"block", "drop_newest", "drop_oldest", "sync"}
+
+
+class _FlushMarker:
+    __slots__ = ("done",)
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+_INTERVAL = OUTPUT1_URL_COLUMNS.index("time_interval")
+_UNIX_TIME = OUTPUT1_URL_COLUMNS.index("unixTime")
+_PAGE_TYPE = OUTPUT1_URL_COLUMNS.index("pageTypeID")
+
+
+def write_page_views(conn, views) -> None:
+    """Insert page views with one multi-row INSERT and resolve their predecessors.
+
+    `views` is a list of `(row, previous)` pairs. `previous` describes the
+    participant's prior page view as `(unixTime, pageTypeID, passID)` (or
+    None for their first view): that row's `time_interval` becomes the gap
+    to this view and, for reading pages, so does the passage's `passRT`. A
+    predecessor in the same batch is fixed up before insert; one that is
+    already stored is matched on (sid, uid, unixTime, pageTypeID). DONE rows
+    keep their 0 interval, as in the old `/done` backfill.
+    """
+    if not views:
+        return
+    rows = [list(row) for row, _ in views]
+    latest_in_batch: dict = {}
+    stored_updates = []
+    rt_updates: dict[str, list] = {table: [] for table in PASSAGE_RT_TABLES.values()}
+    for idx, (row, previous) in enumerate(views):
+        uid, sid = row[0], row[1]
+        key = (uid, sid)
+        if previous:
+            prev_time, prev_type, prev_pass = previous
+            gap = abs(row[_UNIX_TIME] - prev_time)
+            if prev_type != "DONE":
+                prior = latest_in_batch.get(key)
+                if (
+                    prior is not None
+                    and rows[prior][_UNIX_TIME] == prev_time
+                    and rows[prior][_PAGE_TYPE] == prev_type
+                ):
+                    rows[prior][_INTERVAL] = gap
+                else:
+                    stored_updates.append((gap, sid, uid, prev_time, prev_type))
+            table = PASSAGE_RT_TABLES.get(prev_type)
+            if table:
+                rt_updates[table].append((gap, sid, uid, prev_pass))
+        latest_in_batch[key] = idx
+
+    row_placeholder = "(" + ", ".join(["%s"] * len(OUTPUT1_URL_COLUMNS)) + ")"
+    query = (
+        f"INSERT INTO output1_url ({', '.join(OUTPUT1_URL_COLUMNS)}) VALUES "
+        + ", ".join([row_placeholder] * len(rows))
+    )
+    params = [value for row in rows for value in row]
+    cursor = conn.cursor()
+    try:
+        # Stored predecessors must be resolved before the new rows exist,
+        # otherwise "latest matching row" could pick one of them.
+        for update in stored_updates:
+            cursor.execute(
+                """
+                UPDATE output1_url SET time_interval=%s
+                WHERE sid=%s AND uid=%s AND unixTime=%s AND pageTypeID=%s
+                ORDER BY op1ID DESC LIMIT 1
+                """,
+                update,
+            )
+        cursor.execute(query, params)
+        for table, updates in rt_updates.items():
+            if updates:
+                cursor.executemany(
+                    f"UPDATE {table} SET passRT=%s WHERE sid=%s AND uid=%s AND passID=%s",
+                    updates,
+                )
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+class PageViewLogger:
+    """Background writer for `output1_url` page views.
+
+    `log()` puts a row on a bounded in-process queue and returns immediately;
+    a dedicated daemon thread drains it and writes multi-row INSERTs whenever
+    `batch_size` rows are waiting or the oldest queued row is `flush_interval`
+    seconds old. When the queue is full `full_policy` decides what happens:
+    `block` waits up to `block_timeout` then drops, `drop_newest` drops the new
+    row, `drop_oldest` evicts the oldest queued row, and `sync` writes the row
+    inline on the caller's thread. Remaining rows are flushed at interpreter
+    exit.
+    """
+
+    def __init__(
+        self,
+        acquire: Callable,
+        release: Callable,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        full_policy: str = "block",
+        block_timeout: float = 0.5,
+        max_retries: int = 2,
+    ):
+        if full_policy not in FULL_QUEUE_POLICIES:
+            raise ValueError(f"Unknown page log queue policy: {full_policy}")
+        self._acquire = acquire
+        self._release = release
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.block_timeout = block_timeout
+        self.max_retries = max_retries
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max(int(max_queue), 1))
+        self._thread: threading.Thread | None = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+
+        self._stats_lock = threading.Lock()
+        self._enqueued = 0
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._flushes = 0
+        self._flush_seconds_total = 0.0
+        self._flush_seconds_max = 0.0
+        self._last_flush_seconds = 0.0
+
+    # -- producer side ------------------------------------------------------
+
+    def log(self, row: tuple, previous: tuple | None = None) -> bool:
+        """Queue one `output1_url` row; returns False if it was dropped.
+
+        `previous` is the participant's prior view, see `write_page_views`.
+        """
+        self._ensure_started()
+        view = (row, previous)
+        try:
+            self._queue.put_nowait(view)
+        except queue.Full:
+            return self._handle_full(view)
+        self._count(enqueued=1)
+        return True
+
+    def flush(self, timeout: float | None = 5.0) -> bool:
+        """Block until everything queued before this call has been written."""
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        marker = _FlushMarker()
+        try:
+            self._queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def stop(self, timeout: float | None = 10.0) -> None:
+        """Flush outstanding rows and stop the writer thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        self.flush(timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            flushes = self._flushes
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "enqueued": self._enqueued,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "flushes": flushes,
+                "flush_seconds_last": self._last_flush_seconds,
+                "flush_seconds_max": self._flush_seconds_max,
+                "flush_seconds_avg": (self._flush_seconds_total / flushes) if flushes else 0.0,
+            }
+
+    def _handle_full(self, view: tuple) -> bool:
+        if self.full_policy == "block":
+            try:
+                self._queue.put(view, timeout=self.block_timeout)
+            except queue.Full:
+                self._count(dropped=1)
+                return False
+            self._count(enqueued=1)
+            return True
+        if self.full_policy == "drop_oldest":
+            try:
+                evicted = self._queue.get_nowait()
+            except queue.Empty:
+                evicted = ()
+            if evicted is _STOP or isinstance(evicted, _FlushMarker):
+                # Never swallow a flush/stop request; put it back and drop the new row.
+                self._queue.put(evicted)
+                self._count(dropped=1)
+                return False
+            if evicted:
+                self._count(dropped=1)
+            try:
+                self._queue.put_nowait(view)
+            except queue.Full:
+                self._count(dropped=1)
+                return False
+            self._count(enqueued=1)
+            return True
+        if self.full_policy == "sync":
+            self._count(enqueued=1)
+            return self._write([view])
+        self._count(dropped=1)
+        return False
+
+    # -- writer thread ------------------------------------------------------
+
+    def _ensure_started(self) -> None:
+        # Started lazily (and restarted after a fork) so importing the app
+        # never spawns threads in a process that will not serve requests.
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="page-view-logger", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def _run(self) -> None:
+        batch: list = []
+        oldest = 0.0
+        while True:
+            wait = None
+            if batch:
+                wait = max(self.flush_interval - (time.monotonic() - oldest), 0)
+            try:
+                item = self._queue.get(timeout=wait)
+            except queue.Empty:
+                item = ()
+
+            if item is _STOP:
+                self._write(batch)
+                return
+            if isinstance(item, _FlushMarker):
+                self._write(batch)
+                batch = []
+                item.done.set()
+                continue
+            if item:
+                if not batch:
+                    oldest = time.monotonic()
+                batch.append(item)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() - oldest >= self.flush_interval):
+                self._write(batch)
+                batch = []
+
+    def _write(self, views) -> bool:
+        if not views:
+            return True
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            conn = None
+            try:
+                conn = self._acquire()
+                write_page_views(conn, views)
+            except Exception as e:
+                print(f"DB Error in page view logger (attempt {attempt + 1}): {e}")
+                if conn is not None:
+                    self._release(conn, discard=True)
+                time.sleep(min(0.1 * (2 ** attempt), 1.0))
+                continue
+            self._release(conn)
+            elapsed = time.perf_counter() - started
+            with self._stats_lock:
+                self._written += len(views)
+                self._flushes += 1
+                self._last_flush_seconds = elapsed
+                self._flush_seconds_total += elapsed
+                self._flush_seconds_max = max(self._flush_seconds_max, elapsed)
+            return True
+        self._count(failed=len(views))
+        return False
+
+    def _count(self, enqueued: int = 0, dropped: int = 0, failed: int = 0) -> None:
+        with self._stats_lock:
+            self._enqueued += enqueued
+            self._dropped += dropped
+            self._failed += failed
@@ -10,175 +10,195 @@ def format_pass_id(subtopID: int, conID: int, passOrder: int) -> str:
     return f"{int(subtopID):03d}{int(conID):01d}{int(passOrder):02d}"
 
 
-def save_pass_answer(
-    qid: str,
-    ans_to_save: str,
-    table: str = "tb5_passQop",
-    pass_id: str | None = None,
-) -> None:
-    """Persist c1/c2/c3/c4 answers using current session context.
+PASS_ANSWER_COLUMNS = {
+    "c1": "c1Ans",
+    "c2": "c2Ans",
+    "c3": "c3Ans",
+    "c4": "c4Ans",
+}
+PASS_ANSWER_TABLES = {"tb5_passQop", "tb15_prac_passQop"}
 
-    `pass_id` can be provided explicitly to avoid relying on the session state,
-    which may have already advanced to the next passage by the time this runs.
+
+def _pass_context(pass_id: str, table: str) -> tuple:
+    """Resolve (topID, subtopID, conID, passOrder) for a new answer row.
+
+    A well-formed passID encodes subtopic/condition/order itself (see
+    `format_pass_id`), so it wins over the session, which may already point
+    at the next passage.
     """
-    uid = session.get("uid")
-    sid = session.get("sid", "")
-    passID = pass_id or session.get("passID", "")
     top_id = session.get("topID", 1)
     if table == "tb15_prac_passQop":
         top_id = session.get("practice_topID", top_id)
 
+    subtop_val = session.get("subtopID")
+    con_val = session.get("conID")
+    pass_order_val = session.get("passOrder")
+    if len(pass_id) == 6 and pass_id.isdigit():
+        subtop_val = int(pass_id[:3])
+        con_val = int(pass_id[3:4])
+        pass_order_val = int(pass_id[4:])
+
+    return (
+        top_id,
+        str(subtop_val or 0),
+        str(con_val or 1),
+        str(pass_order_val or 0),
+    )
+
+
+def upsert_pass_answers(
+    answers: dict,
+    table: str = "tb5_passQop",
+    pass_id: str | None = None,
+) -> bool:
+    """Persist any subset of c1-c4 answers for one passage in a single statement.
+
+    Relies on the (uid, sid, passID) unique key: the first answer creates the
+    row, later ones (and double-submits) update it in place via
+    `INSERT ... ON DUPLICATE KEY UPDATE`.
+    """
+    if table not in PASS_ANSWER_TABLES:
+        raise ValueError(f"Unsupported pass answer table: {table}")
+    answers = {qid: ans for qid, ans in answers.items() if qid in PASS_ANSWER_COLUMNS}
+    if not answers:
+        return False
+
+    uid = session.get("uid")
+    sid = session.get("sid", "")
+    # An explicit pass_id, even an empty one, is never swapped for the
+    # session's passID, which may belong to another passage by now.
+    passID = session.get("passID", "") if pass_id is None else pass_id
     if not passID:
         print("save_pass_answer warning: passID missing; skipping save")
-        return
+        return False
+
+    top_id, subtop_id, con_id, pass_order = _pass_context(passID, table)
+    # Reading time is resolved when the page after the passage is logged,
+    # which may be before this row exists; seed it on insert (see save_url).
+    last_rt = session.get("last_passRT") or ["", 0]
+    pass_rt = last_rt[1] if last_rt[0] == passID else 0
+    values = {col: answers.get(qid, 0) for qid, col in PASS_ANSWER_COLUMNS.items()}
+    updates = ", ".join(
+        f"{PASS_ANSWER_COLUMNS[qid]} = VALUES({PASS_ANSWER_COLUMNS[qid]})"
+        for qid in PASS_ANSWER_COLUMNS
+        if qid in answers
+    )
 
     link = None
+    cursor = None
     try:
         link = get_db_connection()
         cursor = link.cursor()
-
-        if qid == "c1":
-            if table == "tb15_prac_passQop":
-                query = f"""
-                    INSERT INTO {table}
-                    (uid, sid, topID, subtopID, conID, passID, passOrder, c1Ans, c2Ans, c3Ans, c4Ans, passRT)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(
-                    query,
-                    (
-                        uid,
-                        sid,
-                        top_id,
-                        session.get("subtopID", 0),
-                        session.get("conID", 1),
-                        passID,
-                        session.get("passOrder", 0),
-                        ans_to_save,
-                        0,
-                        0,
-                        0,
-                        0,
-                    ),
-                )
-            else:
-                query = f"""
-                    INSERT INTO {table}
-                    (uid, sid, topID, subtopID, conID, passID, passOrder, c1Ans)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """
-                cursor.execute(
-                    query,
-                    (
-                        uid,
-                        sid,
-                        top_id,
-                        session.get("subtopID", 0),
-                        session.get("conID", 1),
-                        passID,
-                        session.get("passOrder", 0),
-                        ans_to_save,
-                    ),
-                )
-        elif qid in ["c2", "c3", "c4"]:
-            col = f"{qid}Ans"
-            # First, attempt to update. This may affect 0 rows if the record doesn't exist
-            # OR if the value is unchanged. We cannot rely on rowcount to detect existence.
-            cursor.execute(
-                f"""
-                UPDATE {table}
-                SET {col} = %s
-                WHERE sid = %s AND uid = %s AND passID = %s
-                """,
-                (ans_to_save, sid, uid, passID),
-            )
-
-            # Determine whether the target record exists regardless of whether the value changed
-            cursor.execute(
-                f"SELECT 1 FROM {table} WHERE sid=%s AND uid=%s AND passID=%s LIMIT 1",
-                (sid, uid, passID),
-            )
-            exists = cursor.fetchone() is not None
-
-            if not exists:
-                # No existing row; insert a new one with sensible defaults
-                subtop_val = session.get("subtopID")
-                con_val = session.get("conID")
-                pass_order_val = session.get("passOrder")
-
-                if not subtop_val and passID and passID[:3].isdigit():
-                    subtop_val = int(passID[:3])
-                if not con_val and passID and passID[3:4].isdigit():
-                    con_val = int(passID[3:4])
-                if (pass_order_val is None or pass_order_val == "") and passID and passID[4:].isdigit():
-                    pass_order_val = int(passID[4:])
-
-                subtop_str = str(subtop_val or 0)
-                con_str = str(con_val or 1)
-                pass_order_str = str(pass_order_val or 0)
-
-                default_c1 = default_c2 = default_c3 = default_c4 = 0
-                if qid == "c2":
-                    default_c2 = ans_to_save
-                elif qid == "c3":
-                    default_c3 = ans_to_save
-                elif qid == "c4":
-                    default_c4 = ans_to_save
-
-                if table == "tb15_prac_passQop":
-                    cursor.execute(
-                        f"""
-                        INSERT INTO {table}
-                            (uid, sid, topID, subtopID, conID, passID, passOrder,
-                             c1Ans, c2Ans, c3Ans, c4Ans, passRT)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            uid,
-                            sid,
-                            top_id,
-                            subtop_str,
-                            con_str,
-                            passID,
-                            pass_order_str,
-                            default_c1,
-                            default_c2,
-                            default_c3,
-                            default_c4,
-                            0,
-                        ),
-                    )
-                else:
-                    cursor.execute(
-                        f"""
-                        INSERT INTO {table}
-                            (uid, sid, topID, subtopID, conID, passID, passOrder,
-                             c1Ans, c2Ans, c3Ans, c4Ans, passRT)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                        """,
-                        (
-                            uid,
-                            sid,
-                            top_id,
-                            subtop_str,
-                            con_str,
-                            passID,
-                            pass_order_str,
-                            0,
-                            default_c2,
-                            default_c3,
-                            default_c4,
-                            0,
-                        ),
-                    )
-
+        cursor.execute(
+            f"""
+            INSERT INTO {table}
+                (uid, sid, topID, subtopID, conID, passID, passOrder,
+                 c1Ans, c2Ans, c3Ans, c4Ans, passRT)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE {updates}
+            """,
+            (
+                uid,
+                sid,
+                top_id,
+                subtop_id,
+                con_id,
+                passID,
+                pass_order,
+                values["c1Ans"],
+                values["c2Ans"],
+                values["c3Ans"],
+                values["c4Ans"],
+                pass_rt,
+            ),
+        )
         link.commit()
+        if table == "tb5_passQop":
+            add_to_pass_manifest(uid, sid, passID, subtop_id, pass_order)
+        return True
     except Exception as e:
         print(f"Error in save_pass_answer: {e}")
+        return False
     finally:
-        if link and link.is_connected():
+        if cursor:
             cursor.close()
-            link.close()
+
+
+def save_pass_answer(
+    qid: str,
+    ans_to_save: str,
+    table: str = "tb5_passQop",
+    pass_id: str | None = None,
+) -> None:
+    """Persist one c1/c2/c3/c4 answer using current session context.
+
+    `pass_id` can be provided explicitly to avoid relying on the session state,
+    which may have already advanced to the next passage by the time this runs;
+    an explicit but empty `pass_id` saves nothing.
+    """
+    upsert_pass_answers({qid: ans_to_save}, table=table, pass_id=pass_id)
+
+
+def parse_ratings(form, scale: tuple = (0, 100)) -> dict:
+    """Validate a combined c1-c4 submission in one pass.
+
+    Returns `{qid: int}` for all four ratings, or raises ValueError naming
+    every missing or out-of-range one.
+    """
+    low, high = scale
+    ratings = {}
+    problems = []
+    for qid in PASS_ANSWER_COLUMNS:
+        raw = (form.get(qid) or "").strip()
+        try:
+            value = int(raw)
+        except ValueError:
+            problems.append(f"{qid} missing" if not raw else f"{qid} not a number")
+            continue
+        if not low <= value <= high:
+            problems.append(f"{qid} outside {low}-{high}")
+            continue
+        ratings[qid] = value
+    if problems:
+        raise ValueError("; ".join(problems))
+    return ratings
+
+
+def add_to_pass_manifest(uid, sid, pass_id: str, subtop_id, pass_order) -> None:
+    """Record a passage the participant has answered in the session's passage manifest.
+
+    The manifest keeps each passID once, ordered by (subtopID, passOrder) like
+    the old `GROUP BY passID` over tb5_passQop, so the questions and done
+    pages can read the participant's passages without querying for them.
+    Without a manifest for this participant nothing is recorded; it is
+    rebuilt from tb5_passQop when first read.
+    """
+    manifest = session.get("pass_manifest")
+    if not manifest or manifest.get("uid") != uid or manifest.get("sid") != sid:
+        return
+    passages = manifest["passages"]
+    if any(entry[0] == str(pass_id) for entry in passages):
+        return
+    passages.append([str(pass_id), int(subtop_id or 0), int(pass_order or 0)])
+    passages.sort(key=lambda item: (item[1], item[2]))
+    session["pass_manifest"] = manifest
+
+
+def set_pass_manifest(uid, sid, passages) -> None:
+    """Replace the manifest with `passages`, (passID, subtopID, passOrder) in reading order."""
+    session["pass_manifest"] = {
+        "uid": uid,
+        "sid": sid,
+        "passages": [[str(p), int(s or 0), int(o or 0)] for p, s, o in passages],
+    }
+
+
+def get_pass_manifest(uid, sid) -> list | None:
+    """passIDs in the participant's manifest, or None if this session has none for them."""
+    manifest = session.get("pass_manifest")
+    if not manifest or manifest.get("uid") != uid or manifest.get("sid") != sid:
+        return None
+    return [entry[0] for entry in manifest["passages"]]
 
 
 def list_order(input_string: str, number: int):
@@ -192,3 +212,68 @@ def list_order(input_string: str, number: int):
 
 def split_subtopics(visited_sub_str: str):
     return visited_sub_str.split(",") if visited_sub_str else []
+
+
+def subtopic_bit(subtop_id) -> int:
+    """Bit of a (numeric) subtopic ID in a visited-subtopic mask; 0 if it has none."""
+    value = str(subtop_id).strip()
+    return 1 << int(value) if value.isdigit() else 0
+
+
+def subtopic_mask(subtop_ids) -> int:
+    mask = 0
+    for subtop_id in subtop_ids:
+        mask |= subtopic_bit(subtop_id)
+    return mask
+
+
+class VisitedSubtopics:
+    """Subtopics visited in the current task, as an integer bitset.
+
+    Membership, insertion and "has every subtopic been visited" are single
+    bit operations; the session stores just the integer. `in` accepts IDs as
+    int or str, and iterating yields the IDs as strings in numeric order.
+    """
+
+    __slots__ = ("mask",)
+
+    def __init__(self, mask: int = 0):
+        self.mask = int(mask or 0)
+
+    def __contains__(self, subtop_id) -> bool:
+        bit = subtopic_bit(subtop_id)
+        return bool(bit and self.mask & bit)
+
+    def __iter__(self):
+        mask, index = self.mask, 0
+        while mask:
+            if mask & 1:
+                yield str(index)
+            mask >>= 1
+            index += 1
+
+    def __len__(self) -> int:
+        return bin(self.mask).count("1")
+
+    def __bool__(self) -> bool:
+        return self.mask != 0
+
+    def add(self, subtop_id) -> None:
+        self.mask |= subtopic_bit(subtop_id)
+
+    def covers(self, full_mask: int) -> bool:
+        """True once every subtopic in `full_mask` (see `StimulusCache.subtopic_mask`) is visited."""
+        return bool(full_mask) and self.mask & full_mask == full_mask
+
+
+def load_visited_subtopics() -> VisitedSubtopics:
+    """The session's visited subtopics; converts the legacy comma-joined `visitedSub` string once."""
+    mask = session.get("visitedMask")
+    if mask is None:
+        mask = subtopic_mask(split_subtopics(session.pop("visitedSub", "")))
+        session["visitedMask"] = mask
+    return VisitedSubtopics(mask)
+
+
+def save_visited_subtopics(visited: VisitedSubtopics) -> None:
+    session["visitedMask"] = visited.mask
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+
+
+class StartupTimings:
+    """Wall time of each named phase of building (and warming) one app."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: list = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def total(self) -> float:
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self) -> str:
+        width = max((len(name) for name, _ in self.phases), default=5)
+        lines = [f"Startup (pid {os.getpid()}): {self.total() * 1000:.1f} ms"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name:<{width}}  {seconds * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+def compile_templates(app) -> int:
+    """Load every template once so Jinja's cache holds them compiled."""
+    names = app.jinja_env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def open_pool_connections(app, count: int) -> int:
+    """Check out `count` connections at once, then return them to the pool idle."""
+    from ..db import get_pool
+
+    pool = get_pool(app)
+    conns = []
+    try:
+        for _ in range(max(int(count), 0)):
+            conns.append(pool.acquire())
+    finally:
+        for conn in conns:
+            pool.release(conn)
+    return len(conns)
+
+
+def warm_up(app, timings: StartupTimings | None = None) -> StartupTimings:
+    """Do the work a worker's first requests would otherwise pay for.
+
+    Compiles every template, opens the pool's initial connections and loads
+    the stimulus cache, each as a timed phase of `timings`. A failed phase is
+    reported and skipped; whatever it left undone happens on first use.
+    """
+    # Imported here so that create_app can time importing the app's modules.
+    from ..db import get_stimulus_cache
+
+    timings = timings or StartupTimings()
+    steps = (
+        ("templates", lambda: compile_templates(app)),
+        (
+            "db connections",
+            lambda: open_pool_connections(
+                app, app.config.get("WARMUP_DB_CONNECTIONS") or app.config.get("DB_POOL_SIZE", 5)
+            ),
+        ),
+        ("stimulus cache", lambda: get_stimulus_cache(app).load()),
+    )
+    for name, step in steps:
+        with timings.phase(f"warmup: {name}"):
+            try:
+                step()
+            except Exception as e:
+                print(f"Warmup step {name} failed: {e}")
+    return timings
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import csv
+import os
+import sqlite3
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MATERIAL = os.path.join(ROOT, "src", "db", "material")
+STIMULUS_TABLES = (
+    "tb2_topic",
+    "tb3_subtopic",
+    "tb4_passage",
+    "tb12_prac_topic",
+    "tb13_prac_subtopic",
+    "tb14_prac_passage",
+    "tb21_questions",
+)
+
+
+@pytest.fixture
+def sqlite_db(tmp_path) -> str:
+    """A study database file with the schema and the stimulus CSVs loaded."""
+    from src.services.backends import SQLITE_SCHEMA
+    from src.services.sqlite_backend import create_schema
+
+    path = str(tmp_path / "cogsearch.sqlite3")
+    create_schema(path, SQLITE_SCHEMA)
+    conn = sqlite3.connect(path)
+    try:
+        for table in STIMULUS_TABLES:
+            with open(os.path.join(MATERIAL, f"cogsearch_textsearch3_table_{table}.csv"), newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                columns = next(reader)
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    list(reader),
+                )
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+@pytest.fixture
+def app(sqlite_db, tmp_path):
+    """The app on `sqlite_db`, with in-memory sessions and inline finalization."""
+    from src import create_app
+
+    app = create_app(
+        {
+            "TESTING": True,
+            "DB_BACKEND": "sqlite",
+            "SQLITE_PATH": sqlite_db,
+            "SESSION_BACKEND": "memory",
+            "SLOW_QUERY_LOG": "",
+            "FINALIZE_ASYNC": False,
+            "JOB_QUEUE_PATH": str(tmp_path / "jobs.sqlite3"),
+        }
+    )
+    yield app
+    logger = app.extensions.get("page_logger")
+    if logger is not None:
+        logger.stop()
+
+
+@pytest.fixture
+def run_sql(app):
+    """Run one statement on its own pooled connection and commit; returns the rows as dicts."""
+    from src.db import get_pool
+
+    def run(sql: str, params=()) -> list:
+        pool = get_pool(app)
+        conn = pool.acquire()
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+            return rows
+        finally:
+            pool.release(conn)
+
+    return run
+
+
+@pytest.fixture
+def participant(run_sql) -> dict:
+    """A consented tb1_user row; returns its uid and sid."""
+    sid = "7070"
+    run_sql(
+        "INSERT INTO tb1_user (sid, topIDorder, subtopIDorder, conIDorder, taskDone, conDone, signedConsent, signedDate) "
+        "VALUES (%s, '1#', '', '1#2#3#', 0, 0, 'TRUE', '')",
+        (sid,),
+    )
+    uid = run_sql("SELECT MAX(uid) AS uid FROM tb1_user WHERE sid=%s", (sid,))[0]["uid"]
+    return {"uid": uid, "sid": sid}
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import pytest
+
+from src.db import get_job_queue
+from src.routes.core import FINALIZE_JOB, _finalize_job_key
+
+
+@pytest.fixture
+def jobs(app):
+    app.config.update(FINALIZE_ASYNC=True, JOB_QUEUE_WORKERS=0, JOB_QUEUE_BACKOFF=60.0)
+    return get_job_queue(app)
+
+
+def _enqueue(jobs, participant) -> str:
+    key = _finalize_job_key(participant["uid"], participant["sid"])
+    jobs.enqueue(FINALIZE_JOB, key, {"uid": participant["uid"], "sid": participant["sid"], "pass_ids": [], "answers": {}})
+    return key
+
+
+def test_finalize_job_completes(jobs, participant):
+    key = _enqueue(jobs, participant)
+    assert jobs.run_pending() == 1
+    job = jobs.get(key)
+    assert job["status"] == "done" and job["result"] == {"accuracy": 0}
+
+
+def test_failed_letter_totals_update_is_retried(jobs, participant, run_sql):
+    key = _enqueue(jobs, participant)
+    run_sql("ALTER TABLE tb11_profile RENAME TO tb11_profile_away")
+    try:
+        assert jobs.run_pending() == 1
+    finally:
+        run_sql("ALTER TABLE tb11_profile_away RENAME TO tb11_profile")
+    job = jobs.get(key)
+    assert job["status"] == "pending"
+    assert job["attempts"] == 1 and "tb11_profile" in job["last_error"]
+
+    # Backed off, so only a forced run picks it up again.
+    assert jobs.run_pending() == 0
+    assert jobs.run_pending(ignore_backoff=True) == 1
+    assert jobs.get(key)["status"] == "done"
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from src.services.job_queue import JobQueue
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = JobQueue(str(tmp_path / "jobs.sqlite3"), workers=1, max_attempts=1, lease=0.5, poll_interval=0.05)
+    yield jobs
+    jobs.stop(timeout=2)
+
+
+def test_runs_jobs_and_stores_results(jobs):
+    jobs.register("double", lambda payload: payload["n"] * 2)
+    jobs.enqueue("double", "a", {"n": 21})
+    assert _wait_for(lambda: jobs.get("a")["status"] == "done")
+    assert jobs.get("a")["result"] == 42
+
+
+def test_unserializable_result_fails_the_job(jobs):
+    jobs.register("bad", lambda payload: object())
+    jobs.enqueue("bad", "a", {})
+    assert _wait_for(lambda: jobs.get("a")["status"] == "failed")
+    assert "JSON serializable" in jobs.get("a")["last_error"]
+    assert all(thread.is_alive() for thread in jobs._threads)
+
+
+def test_worker_survives_a_failure_to_record_the_outcome(jobs):
+    finish = jobs._finish
+    failures = []
+
+    def locked_once(*args, **kwargs):
+        if not failures:
+            failures.append(1)
+            raise RuntimeError("database is locked")
+        return finish(*args, **kwargs)
+
+    jobs._finish = locked_once
+    jobs.register("ok", lambda payload: 1)
+    jobs.enqueue("ok", "a", {})
+    # The claim's lease runs out and the job is run again.
+    assert _wait_for(lambda: jobs.get("a")["status"] == "done")
+    assert failures and all(thread.is_alive() for thread in jobs._threads)
+
+
+def test_dead_workers_are_restarted(jobs):
+    jobs.register("ok", lambda payload: 1)
+    jobs.enqueue("ok", "a", {})
+    assert _wait_for(lambda: jobs.get("a")["status"] == "done")
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    jobs._threads[0] = dead
+    jobs.enqueue("ok", "b", {})
+    assert jobs._threads[0] is not dead and jobs._threads[0].is_alive()
+    assert _wait_for(lambda: jobs.get("b")["status"] == "done")
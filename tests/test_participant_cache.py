@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import pytest
+from flask import jsonify, session
+
+from src.db import get_db_connection, get_pool
+from src.services.participant import (
+    ParticipantCache,
+    ParticipantContext,
+    advance_condition,
+    get_participant_cache,
+    get_participant_context,
+    parse_order,
+)
+
+
+SID = "5150"
+
+
+def test_parse_order():
+    assert parse_order("1#2#3#") == ("1", "2", "3")
+    assert parse_order("") == () and parse_order(None) == ()
+
+
+def test_current_topic_and_condition():
+    ctx = ParticipantContext(1, SID, topic_order=("1",), condition_order=("2", "x"), con_done=0)
+    assert ctx.current_topic == "1" and ctx.current_condition == 2
+    ctx.con_done, ctx.task_done = 1, 1
+    assert ctx.current_topic == "" and ctx.current_condition == 1
+    ctx.con_done = 2
+    assert ctx.current_condition is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ParticipantCache(max_entries=2)
+    for uid in (1, 2):
+        cache.put(ParticipantContext(uid, SID))
+    cache.get(1)
+    cache.put(ParticipantContext(3, SID))
+    assert cache.get(2) is None
+    assert cache.get(1).uid == 1 and cache.get(3).uid == 3
+
+
+def _con_done(app, uid) -> int:
+    conn = get_pool(app).acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT conDone FROM tb1_user WHERE uid=%s", (uid,))
+        return cursor.fetchone()[0]
+    finally:
+        get_pool(app).release(conn)
+
+
+@pytest.fixture
+def uid(app) -> int:
+    conn = get_pool(app).acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO tb1_user (sid, topIDorder, subtopIDorder, conIDorder, taskDone, conDone, signedConsent, signedDate) "
+            "VALUES (%s, '1#', '', '3#1#2#', 0, 0, 'TRUE', '')",
+            (SID,),
+        )
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        get_pool(app).release(conn)
+
+
+@pytest.fixture
+def client(app, uid):
+    @app.route("/test/context")
+    def context():
+        ctx = get_participant_context(uid, SID)
+        return jsonify(con_done=ctx.con_done, version=ctx.version, session_version=session["participant_version"][2])
+
+    @app.route("/test/advance/<int:status>")
+    def advance(status):
+        ctx = advance_condition(uid, SID)
+        if status != 500:
+            # Inside the unit of work this commit is only a savepoint; 201
+            # stands for a request that fails after committing.
+            get_db_connection().commit()
+        if status == 201:
+            status = 500
+        return jsonify(con_done=ctx.con_done), status
+
+    return app.test_client()
+
+
+def test_context_is_cached_per_session_version(app, client):
+    cache = get_participant_cache(app)
+    assert client.get("/test/context").json == {"con_done": 0, "version": 1, "session_version": 1}
+    assert (cache.hits, cache.misses) == (0, 1)
+    client.get("/test/context")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_stale_copy_is_reloaded(app, client, uid):
+    client.get("/test/context")
+    # Another process advanced the participant: the session carries a newer
+    # version and tb1_user the new state, this process still has version 1.
+    conn = get_pool(app).acquire()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE tb1_user SET conDone = 2 WHERE uid=%s", (uid,))
+        conn.commit()
+    finally:
+        get_pool(app).release(conn)
+    with client.session_transaction() as sess:
+        sess["participant_version"] = [uid, SID, 5]
+    assert client.get("/test/context").json == {"con_done": 2, "version": 5, "session_version": 5}
+    assert get_participant_cache(app).get(uid).version == 5
+
+
+def test_advance_updates_database_cache_and_version(app, client, uid):
+    client.get("/test/context")
+    assert client.get("/test/advance/200").json == {"con_done": 1}
+    assert _con_done(app, uid) == 1
+    cached = get_participant_cache(app).get(uid)
+    assert (cached.con_done, cached.version) == (1, 2)
+    assert client.get("/test/context").json == {"con_done": 1, "version": 2, "session_version": 2}
+
+
+@pytest.mark.parametrize("status", [500, 201])
+def test_rolled_back_advance_drops_the_cached_copy(app, client, uid, status):
+    client.get("/test/context")
+    assert client.get(f"/test/advance/{status}").status_code == 500
+    assert _con_done(app, uid) == 0
+    assert get_participant_cache(app).get(uid) is None
+    assert client.get("/test/context").json["con_done"] == 0
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import pytest
+from flask import session
+
+from src.services.utils import save_pass_answer, upsert_pass_answers
+
+
+PASS_ID = "001101"
+
+
+@pytest.fixture
+def answered(run_sql, participant) -> dict:
+    """The participant has answered c1-c3 of PASS_ID, and C4 is next."""
+    run_sql(
+        "INSERT INTO tb5_passQop (uid, sid, topID, subtopID, conID, passID, passOrder, c1Ans, c2Ans, c3Ans, c4Ans, passRT) "
+        "VALUES (%s, %s, '1', '1', '1', %s, '1', 11, 22, 33, 0, 0)",
+        (participant["uid"], participant["sid"], PASS_ID),
+    )
+    return participant
+
+
+@pytest.fixture
+def client(app, answered):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(uid=answered["uid"], sid=answered["sid"], topID="1", subtopID="1", passID=PASS_ID)
+    return client
+
+
+def _answers(run_sql, participant) -> dict:
+    rows = run_sql(
+        "SELECT c1Ans, c2Ans, c3Ans, c4Ans FROM tb5_passQop WHERE uid=%s AND sid=%s AND passID=%s",
+        (participant["uid"], participant["sid"], PASS_ID),
+    )
+    return rows[0]
+
+
+def test_c4_form_without_pass_id_does_not_touch_c3(client, run_sql, answered):
+    response = client.post("/k2?lastPage=c4", data={"ans": "44", "qid": "c4", "fid": "done"})
+    assert response.status_code == 200
+    assert _answers(run_sql, answered) == {"c1Ans": 11, "c2Ans": 22, "c3Ans": 33, "c4Ans": 0}
+
+
+def test_c4_form_saves_c4_for_its_passage(client, run_sql, answered):
+    response = client.post("/k2?lastPage=c4", data={"ans": "44", "qid": "c4", "fid": "done", "savepassid": PASS_ID})
+    assert response.status_code == 200
+    assert _answers(run_sql, answered) == {"c1Ans": 11, "c2Ans": 22, "c3Ans": 33, "c4Ans": 44}
+
+
+def test_explicit_empty_pass_id_is_not_replaced_by_the_session(app, run_sql, answered):
+    app.config["DB_UNIT_OF_WORK"] = False
+    with app.test_request_context("/"):
+        session.update(uid=answered["uid"], sid=answered["sid"], passID=PASS_ID)
+        assert upsert_pass_answers({"c3": 99}, pass_id="") is False
+        save_pass_answer("c3", "98", pass_id="")
+    assert _answers(run_sql, answered)["c3Ans"] == 33
+
+
+def test_session_pass_id_is_used_when_none_is_given(app, run_sql, answered):
+    # No after_request hook runs here to complete a unit of work.
+    app.config["DB_UNIT_OF_WORK"] = False
+    with app.test_request_context("/"):
+        session.update(uid=answered["uid"], sid=answered["sid"], passID=PASS_ID)
+        assert upsert_pass_answers({"c4": 55})
+    assert _answers(run_sql, answered)["c4Ans"] == 55
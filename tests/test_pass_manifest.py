@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import pytest
+from flask import session
+
+from src.services.utils import add_to_pass_manifest, get_pass_manifest, set_pass_manifest, upsert_pass_answers
+
+
+UID, SID = 11, "6060"
+
+
+@pytest.fixture
+def request_context(app):
+    with app.test_request_context("/"):
+        session["uid"] = UID
+        session["sid"] = SID
+        yield
+
+
+def test_passages_are_kept_once_in_reading_order(request_context):
+    set_pass_manifest(UID, SID, [])
+    add_to_pass_manifest(UID, SID, "002101", 2, 1)
+    add_to_pass_manifest(UID, SID, "001102", 1, 2)
+    add_to_pass_manifest(UID, SID, "001101", 1, 1)
+    add_to_pass_manifest(UID, SID, "002101", 2, 1)
+    assert get_pass_manifest(UID, SID) == ["001101", "001102", "002101"]
+
+
+def test_manifest_belongs_to_one_participant(request_context):
+    set_pass_manifest(UID, SID, [("001101", 1, 1)])
+    assert get_pass_manifest(UID, "other") is None
+    add_to_pass_manifest(UID + 1, SID, "001102", 1, 2)
+    assert get_pass_manifest(UID, SID) == ["001101"]
+
+
+def test_nothing_is_recorded_without_a_manifest(request_context):
+    add_to_pass_manifest(UID, SID, "001101", 1, 1)
+    assert get_pass_manifest(UID, SID) is None
+
+
+def test_saving_a_formal_answer_adds_the_passage(request_context):
+    set_pass_manifest(UID, SID, [])
+    assert upsert_pass_answers({"c1": 40}, table="tb15_prac_passQop", pass_id="001101")
+    assert get_pass_manifest(UID, SID) == []
+    assert upsert_pass_answers({"c1": 40}, table="tb5_passQop", pass_id="002101")
+    assert upsert_pass_answers({"c2": 60}, table="tb5_passQop", pass_id="002101")
+    assert upsert_pass_answers({"c1": 10}, table="tb5_passQop", pass_id="001103")
+    assert get_pass_manifest(UID, SID) == ["001103", "002101"]
+
+
+def test_questions_rebuild_a_missing_manifest_from_answers(request_context):
+    from src.routes.core import _participant_pass_ids
+
+    upsert_pass_answers({"c1": 40}, table="tb5_passQop", pass_id="002101")
+    upsert_pass_answers({"c1": 40}, table="tb5_passQop", pass_id="001102")
+    assert get_pass_manifest(UID, SID) is None
+    assert _participant_pass_ids(UID, SID) == ["001102", "002101"]
+    assert get_pass_manifest(UID, SID) == ["001102", "002101"]
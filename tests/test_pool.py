@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from src.services.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.rollbacks = 0
+        self.fail_rollback = False
+
+    def is_connected(self):
+        return self.connected
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise RuntimeError("connection lost")
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def opened():
+    return []
+
+
+def make_pool(opened, **kwargs):
+    def creator():
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    return ConnectionPool(creator, **kwargs)
+
+
+def test_released_connection_is_reused(opened):
+    pool = make_pool(opened, size=2, max_overflow=0)
+    conn = pool.acquire()
+    assert pool.stats()["checked_out"] == 1
+    pool.release(conn)
+    assert conn.rollbacks == 1 and not conn.closed
+    assert pool.stats() == {
+        "size": 2, "max_overflow": 0, "open": 1, "idle": 1, "checked_out": 0, "total_opened": 1,
+    }
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+
+
+def test_overflow_connections_close_on_release(opened):
+    pool = make_pool(opened, size=1, max_overflow=1)
+    first, extra = pool.acquire(), pool.acquire()
+    pool.release(extra)
+    pool.release(first)
+    assert extra.closed and not first.closed
+    assert pool.stats()["open"] == 1
+
+
+def test_exhausted_pool_times_out(opened):
+    pool = make_pool(opened, size=1, max_overflow=0, timeout=0.05)
+    pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()["open"] == 1
+
+
+def test_waiting_checkout_gets_released_connection(opened):
+    pool = make_pool(opened, size=1, max_overflow=0, timeout=5)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, (conn,)).start()
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+
+
+def test_dead_idle_connection_is_replaced(opened):
+    pool = make_pool(opened, size=1, max_overflow=0, ping_after=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.connected = False
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed
+    assert pool.stats()["open"] == 1 and pool.stats()["total_opened"] == 2
+
+
+def test_failed_reset_discards_connection(opened):
+    pool = make_pool(opened, size=1, max_overflow=0)
+    conn = pool.acquire()
+    conn.fail_rollback = True
+    pool.release(conn)
+    assert conn.closed
+    assert pool.stats()["open"] == 0 and pool.stats()["idle"] == 0
+    assert pool.acquire() is not conn
+
+
+def test_discard_on_release_frees_the_slot(opened):
+    pool = make_pool(opened, size=1, max_overflow=0, timeout=0.05)
+    conn = pool.acquire()
+    pool.release(conn, discard=True)
+    assert conn.closed and pool.stats()["open"] == 0
+    assert pool.acquire() is not conn
+
+
+def test_failed_open_releases_reserved_slot(opened):
+    attempts = []
+
+    def creator():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("refused")
+        return FakeConnection()
+
+    pool = ConnectionPool(creator, size=1, max_overflow=0, timeout=0.05)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert pool.stats()["open"] == 0
+    assert pool.acquire() is not None
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import pytest
+
+from src.services.query_stats import QueryStats, fingerprint
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        (
+            "SELECT * FROM t WHERE a = 'x' AND b = 12 AND c IN (1, 2, 3)",
+            "select * from t where a = ? and b = ? and c in (?+)",
+        ),
+        ("SELECT * FROM t WHERE c IN (%s)", "select * from t where c in (?+)"),
+        ("INSERT INTO t (a, b) VALUES (%s, %s)", "insert into t (a, b) values (?, ?)"),
+        ("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)", "insert into t (a, b) values (?, ?), ..."),
+        ("SELECT a -- note\nFROM t /* hint */ WHERE id=%(uid)s # trailing", "select a from t where id=?"),
+        # Digits inside identifiers are not values.
+        ("SELECT c1Ans, t2.x FROM tb2_topic WHERE topID=%s", "select c1ans, t2.x from tb2_topic where topid=?"),
+        ("SELECT `tb5_passQop`.`c1Ans` FROM `tb5_passQop`", "select `tb5_passqop`.`c1ans` from `tb5_passqop`"),
+        # Quotes, comment markers and placeholders inside strings are values.
+        ("SELECT 'it''s -- #', \"a %s\" FROM t WHERE x = -1.5", "select ?, ? from t where x = ?"),
+        ("  UPDATE t\n\tSET a=1\n  WHERE b=2  ", "update t set a=? where b=?"),
+    ],
+)
+def test_fingerprint(sql, expected):
+    assert fingerprint(sql) == expected
+
+
+def test_statements_differing_only_in_values_share_a_fingerprint():
+    assert fingerprint("SELECT * FROM t WHERE id=1 AND s='a'") == fingerprint("select *  from t\nwhere id=2 and s='b'")
+
+
+def test_record_aggregates_per_fingerprint():
+    stats = QueryStats()
+    stats.record("SELECT * FROM t WHERE id=%s", 0.5, rows=1)
+    stats.record(b"SELECT * FROM t WHERE id=7", 1.5, rows=2)
+    stats.record("DELETE FROM t", 0.25)
+    rows = stats.snapshot()
+    assert [row["fingerprint"] for row in rows] == ["select * from t where id=?", "delete from t"]
+    top = rows[0]
+    assert (top["calls"], top["total_seconds"], top["mean_seconds"], top["max_seconds"], top["rows"]) == (
+        2,
+        2.0,
+        1.0,
+        1.5,
+        3,
+    )
+    assert [row["fingerprint"] for row in stats.snapshot(order="calls", limit=1)] == ["select * from t where id=?"]
+
+
+def test_fingerprints_beyond_the_limit_are_counted_as_other():
+    stats = QueryStats(max_fingerprints=1)
+    stats.record("SELECT a FROM t", 0.1)
+    stats.record("SELECT b FROM t", 0.1)
+    stats.record("SELECT c FROM t", 0.1)
+    calls = {row["fingerprint"]: row["calls"] for row in stats.snapshot()}
+    assert calls == {"select a from t": 1, QueryStats.OTHER: 2}
+
+
+def test_slow_queries_are_logged(tmp_path):
+    log = tmp_path / "slow.log"
+    stats = QueryStats(slow_threshold=1.0, slow_log_path=str(log))
+    stats.record("SELECT * FROM t WHERE id=1", 0.5)
+    stats.record("SELECT * FROM t WHERE id=2", 2.0, rows=4)
+    lines = log.read_text().splitlines()
+    assert len(lines) == 1
+    assert "2.000s rows=4" in lines[0] and lines[0].endswith("sql=select * from t where id=?")
+    assert stats.snapshot()[0]["slow_calls"] == 1
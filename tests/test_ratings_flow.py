@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import pytest
+
+
+PASS_ID = "001102"
+RATINGS = {"c1": "10", "c2": "20", "c3": "30", "c4": "40"}
+
+
+@pytest.fixture
+def client(app, participant):
+    app.config["RATINGS_COMBINED"] = True
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(
+            uid=participant["uid"],
+            sid=participant["sid"],
+            topID="1",
+            practice_topID="1",
+            subtopID="1",
+            conID="1",
+            passID=PASS_ID,
+            passTitle="Test passage",
+        )
+    return client
+
+
+def _stored(run_sql, table: str, participant) -> list:
+    return run_sql(
+        f"SELECT passID, c1Ans, c2Ans, c3Ans, c4Ans FROM {table} WHERE uid=%s AND sid=%s",
+        (participant["uid"], participant["sid"]),
+    )
+
+
+def _form(**overrides) -> dict:
+    form = dict(RATINGS, ans=RATINGS["c4"], fid="done", savepassid=PASS_ID, qid="ratings")
+    form.update(overrides)
+    return {key: value for key, value in form.items() if value is not None}
+
+
+def test_formal_ratings_are_saved_with_one_post(client, run_sql, participant):
+    page = client.get("/task_ratings?fid=done")
+    assert page.status_code == 200
+    assert b'action="/k2?lastPage=c4"' in page.data
+    with client.session_transaction() as sess:
+        assert sess["formal_pending_stage"] == "c1" and sess["formal_pending_passID"] == PASS_ID
+
+    response = client.post("/k2?lastPage=c4", data=_form())
+    assert response.status_code == 200
+    assert _stored(run_sql, "tb5_passQop", participant) == [
+        {"passID": PASS_ID, "c1Ans": 10, "c2Ans": 20, "c3Ans": 30, "c4Ans": 40}
+    ]
+    assert _stored(run_sql, "tb15_prac_passQop", participant) == []
+    with client.session_transaction() as sess:
+        for key in ("formal_pending_stage", "formal_pending_passID", "formal_pending_fid", "formal_last_page"):
+            assert key not in sess
+
+
+def test_practice_ratings_are_saved_with_one_post(client, run_sql, participant):
+    assert client.get("/prac_ratings?fid=done").status_code == 200
+    with client.session_transaction() as sess:
+        assert sess["practice_pending_stage"] == "c1"
+
+    response = client.post("/prac_ratings?fid=done", data=_form())
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/prac_k2?lastPage=c4")
+    assert _stored(run_sql, "tb15_prac_passQop", participant) == [
+        {"passID": PASS_ID, "c1Ans": 10, "c2Ans": 20, "c3Ans": 30, "c4Ans": 40}
+    ]
+    assert _stored(run_sql, "tb5_passQop", participant) == []
+    with client.session_transaction() as sess:
+        for key in ("practice_pending_stage", "practice_pending_passID", "practice_pending_fid", "practice_last_page"):
+            assert key not in sess
+
+
+@pytest.mark.parametrize(
+    "overrides, problem",
+    [
+        ({"c2": "101"}, b"c2 outside 0-100"),
+        ({"c3": "-1"}, b"c3 outside 0-100"),
+        ({"c1": None}, b"c1 missing"),
+        ({"c4": "lots"}, b"c4 not a number"),
+    ],
+)
+@pytest.mark.parametrize(
+    "path, table",
+    [("/k2?lastPage=c4", "tb5_passQop"), ("/prac_ratings?fid=done", "tb15_prac_passQop")],
+)
+def test_invalid_ratings_are_rejected_without_writes(client, run_sql, participant, path, table, overrides, problem):
+    response = client.post(path, data=_form(**overrides))
+    assert response.status_code == 400
+    assert problem in response.data
+    assert _stored(run_sql, table, participant) == []
+    assert run_sql("SELECT conDone FROM tb1_user WHERE uid=%s", (participant["uid"],))[0]["conDone"] == 0
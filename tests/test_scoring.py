@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+from src.services.scoring import (
+    LETTER_COMPARISON_ROUNDS,
+    VOCAB_ANSWER_KEY,
+    VOCAB_NOT_SURE,
+    grade_choice,
+    score_vocab,
+)
+
+
+ALL_WRONG = ["5" if right != "5" else "1" for right in VOCAB_ANSWER_KEY]
+
+
+@pytest.mark.parametrize(
+    "answers, score",
+    [
+        (list(VOCAB_ANSWER_KEY), 15.0),
+        ([VOCAB_NOT_SURE] * 15, 0.0),
+        (ALL_WRONG, -3.0),
+        (list(VOCAB_ANSWER_KEY[:10]) + [VOCAB_NOT_SURE] * 5, 10.0),
+        (list(VOCAB_ANSWER_KEY[:7]) + ALL_WRONG[7:], 5.4),
+        # Answers past the fifteenth are ignored; missing ones do not count.
+        (list(VOCAB_ANSWER_KEY) + ["1", "1"], 15.0),
+        (list(VOCAB_ANSWER_KEY[:3]), 3.0),
+    ],
+)
+def test_score_vocab(answers, score):
+    assert score_vocab(answers) == score
+
+
+@pytest.mark.parametrize(
+    "choice, correct, grade",
+    [
+        ("a", "a", 1),
+        ("A", "a", 1),
+        (" b ", "B", 1),
+        ("c", "d", 0),
+        ("", "a", 0),
+        (3, "3", 1),
+    ],
+)
+def test_grade_choice(choice, correct, grade):
+    assert grade_choice(choice, correct) == grade
+
+
+def test_letter_comparison_rounds_are_consistent():
+    for items in LETTER_COMPARISON_ROUNDS.values():
+        for item in items:
+            same = item["left"] == item["right"]
+            assert item["answer"] == ("S" if same else "D")
+
+
+def _load_rescore():
+    pytest.importorskip("numpy")
+    pytest.importorskip("mysql.connector")
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "rescore.py")
+    spec = importlib.util.spec_from_file_location("rescore", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_rescore_vocab_matches_score_vocab():
+    rescore = _load_rescore()
+    voc_columns = [f"voc{i}" for i in range(1, 16)]
+    participants = {
+        1: list(VOCAB_ANSWER_KEY),
+        2: list(VOCAB_ANSWER_KEY[:7]) + ALL_WRONG[7:],
+        3: [VOCAB_NOT_SURE] * 15,
+    }
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE tb11_profile (uid, sid, {', '.join(voc_columns)}, vocScore)")
+    for uid, answers in participants.items():
+        # Stored scores are all stale except participant 3's.
+        conn.execute(f"INSERT INTO tb11_profile VALUES ({', '.join('?' * 18)})", [uid, "s", *answers, 0])
+    updates = rescore.rescore_vocab(conn.cursor(), rescore.load_scoring())
+    assert sorted(updates, key=lambda row: row[1]) == [
+        (score_vocab(participants[1]), 1, "s"),
+        (score_vocab(participants[2]), 2, "s"),
+    ]
+
+
+def test_rescore_mc_matches_grade_choice():
+    rescore = _load_rescore()
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(
+        """
+        CREATE TABLE tb21_questions (questionID, correctAns);
+        CREATE TABLE tb22_multiQop (tb22id, questionID, choice, isCorrect);
+        INSERT INTO tb21_questions VALUES (1, 'B'), (2, 'c');
+        INSERT INTO tb22_multiQop VALUES (10, 1, 'b', 0), (11, 2, 'C', 1), (12, 2, 'a', 1), (13, 9, 'a', 0);
+        """
+    )
+    assert sorted(rescore.rescore_mc(conn.cursor())) == [
+        (grade_choice("a", "c"), 12),
+        (grade_choice("b", "B"), 10),
+    ]
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import pytest
+from flask import Flask, session
+
+from src.services.session_store import (
+    MemorySessionStore,
+    SQLiteSessionStore,
+    decode_session,
+    encode_session,
+    init_session_store,
+)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {},
+        {"uid": 7, "sid": "1234", "visitedMask": 0b1010, "pass_manifest": {"passages": [["001101", 1, 1]]}},
+        # Large enough to be compressed.
+        {"notes": "x" * 5000, "items": list(range(200))},
+    ],
+)
+def test_encode_round_trip(data):
+    blob = encode_session(data)
+    assert decode_session(blob) == data
+
+
+def test_large_payloads_are_compressed():
+    assert encode_session({"a": 1})[:1] == b"\x00"
+    blob = encode_session({"notes": "x" * 5000})
+    assert blob[:1] == b"\x01"
+    assert len(blob) < 5000
+
+
+def test_decode_rejects_unknown_encoding():
+    with pytest.raises(ValueError):
+        decode_session(b"\x07whatever")
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), purge_every=2)
+
+
+def test_store_set_get_delete(store):
+    assert store.get("a") is None
+    store.set("a", b"\x00one", ttl=60)
+    store.set("a", b"\x00two", ttl=60)
+    assert store.get("a") == b"\x00two"
+    store.delete("a")
+    assert store.get("a") is None
+    store.delete("a")
+
+
+def test_store_expires_entries(store):
+    store.set("old", b"\x00data", ttl=-1)
+    assert store.get("old") is None
+
+
+def test_sqlite_store_purges_expired_rows(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"), purge_every=2)
+    store.set("old", b"\x00data", ttl=-1)
+    store.set("new", b"\x00data", ttl=60)
+    ids = [row[0] for row in store._conn().execute("SELECT id FROM sessions")]
+    assert ids == ["new"]
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_entries=2)
+    store.set("a", b"a", ttl=60)
+    store.set("b", b"b", ttl=60)
+    store.get("a")
+    store.set("c", b"c", ttl=60)
+    assert store.get("b") is None
+    assert store.get("a") == b"a" and store.get("c") == b"c"
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY="test", SESSION_BACKEND="sqlite", SESSION_SQLITE_PATH=str(tmp_path / "sessions.sqlite3")
+    )
+    init_session_store(app)
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["value"] = value
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("value", "-")
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    client = app.test_client()
+    client.store = app.extensions["session_store"]
+    return client
+
+
+def _cookie(client):
+    cookie = client.get_cookie("session")
+    return cookie.value if cookie else None
+
+
+def test_cookie_carries_only_a_signed_id(client):
+    client.get("/set/secret-value")
+    cookie = _cookie(client)
+    assert cookie and "secret-value" not in cookie
+    sid = cookie.rsplit(".", 1)[0]
+    assert decode_session(client.store.get(sid)) == {"value": "secret-value"}
+    assert client.get("/get").text == "secret-value"
+
+
+def test_cookie_is_sent_only_for_a_new_session(client):
+    first = client.get("/set/a")
+    assert "Set-Cookie" in first.headers
+    second = client.get("/set/b")
+    assert "Set-Cookie" not in second.headers
+    assert client.get("/get").text == "b"
+
+
+def test_unmodified_session_is_not_written(client):
+    client.get("/set/a")
+    calls = []
+    original = client.store.set
+    client.store.set = lambda *args: calls.append(args) or original(*args)
+    client.get("/get")
+    assert calls == []
+
+
+def test_tampered_cookie_starts_a_new_session(client):
+    client.get("/set/a")
+    client.set_cookie("session", _cookie(client)[:-2] + "xx")
+    assert client.get("/get").text == "-"
+
+
+def test_clear_deletes_the_stored_session(client):
+    client.get("/set/a")
+    sid = _cookie(client).rsplit(".", 1)[0]
+    client.get("/clear")
+    assert client.store.get(sid) is None
+    assert _cookie(client) is None
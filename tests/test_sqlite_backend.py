@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from src.services.sqlite_backend import SQLiteConnection, translate_sql
+
+
+SCRIPTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+
+LETTER_UPSERT = """
+    INSERT INTO tb27_letter_item
+        (uid, sid, round_number, item_index, response, client_ts_ms)
+    VALUES (%s, %s, %s, %s, %s, %s), (%s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        response = IF((VALUES(client_ts_ms) IS NULL OR VALUES(client_ts_ms) >= client_ts_ms), VALUES(response), response),
+        updated_at = IF(TRUE, CURRENT_TIMESTAMP(6), updated_at),
+        client_ts_ms = IF(VALUES(`client_ts_ms`) >= client_ts_ms, VALUES(client_ts_ms), client_ts_ms)
+"""
+
+PAGE_VIEW_UPDATE = """
+    UPDATE output1_url SET time_interval=%s
+    WHERE sid=%s AND uid=%s AND unixTime=%s AND pageTypeID=%s
+    ORDER BY op1ID DESC LIMIT 1
+"""
+
+TRANSLATIONS = [
+    (
+        LETTER_UPSERT,
+        "INSERT INTO tb27_letter_item (uid, sid, round_number, item_index, response, client_ts_ms) "
+        "VALUES (?, ?, ?, ?, ?, ?), (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT DO UPDATE SET "
+        "response = IIF((excluded.client_ts_ms IS NULL OR excluded.client_ts_ms >= client_ts_ms), "
+        "excluded.response, response), "
+        "updated_at = IIF(TRUE, strftime('%Y-%m-%d %H:%M:%f', 'now'), updated_at), "
+        "client_ts_ms = IIF(excluded.client_ts_ms >= client_ts_ms, excluded.client_ts_ms, client_ts_ms)",
+        True,
+    ),
+    (
+        PAGE_VIEW_UPDATE,
+        "UPDATE output1_url SET time_interval=? WHERE rowid IN (SELECT rowid FROM output1_url "
+        "WHERE sid=? AND uid=? AND unixTime=? AND pageTypeID=? ORDER BY op1ID DESC LIMIT 1)",
+        True,
+    ),
+    (
+        "UPDATE tb11_profile SET lcOneScore=%s WHERE sid=%s LIMIT 1",
+        "UPDATE tb11_profile SET lcOneScore=? WHERE rowid IN (SELECT rowid FROM tb11_profile WHERE sid=? LIMIT 1)",
+        True,
+    ),
+    (
+        "SELECT COALESCE(TIMESTAMPDIFF(SECOND, MIN(created_at), MAX(updated_at)), 0) AS span_seconds FROM t",
+        "SELECT COALESCE(CAST(ROUND((julianday(MAX(updated_at)) - julianday(MIN(created_at))) * 86400000) "
+        "/ 1000 AS INTEGER), 0) AS span_seconds FROM t",
+        False,
+    ),
+    (
+        "SELECT TIMESTAMPDIFF(MINUTE, a, IF(b, c, d)) FROM t",
+        "SELECT CAST(ROUND((julianday(IIF(b, c, d)) - julianday(a)) * 86400000) / 60000 AS INTEGER) FROM t",
+        False,
+    ),
+    (
+        "SELECT * FROM t WHERE a = 'x %s # IF(' AND b = %s",
+        "SELECT * FROM t WHERE a = 'x %s # IF(' AND b = ?",
+        False,
+    ),
+    (
+        "INSERT INTO t (a, b) VALUES ('it''s 100%s', %s)",
+        "INSERT INTO t (a, b) VALUES ('it''s 100%s', ?)",
+        True,
+    ),
+    (
+        "SELECT 'NOW()', %(uid)s, 5 %% 2",
+        "SELECT 'NOW()', :uid, 5 % 2",
+        False,
+    ),
+    ("INSERT IGNORE INTO t (a) VALUES (%s)", "INSERT OR IGNORE INTO t (a) VALUES (?)", True),
+    (
+        "SELECT passID FROM t ORDER BY CAST(subtopID AS UNSIGNED), CAST(passOrder AS SIGNED INTEGER)",
+        "SELECT passID FROM t ORDER BY CAST(subtopID AS INTEGER), CAST(passOrder AS INTEGER)",
+        False,
+    ),
+    ("SAVEPOINT uow_committed", "SAVEPOINT uow_committed", False),
+    ("SELECT 1", "SELECT 1", False),
+]
+
+
+def _normalize(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+@pytest.mark.parametrize("mysql, sqlite, write", TRANSLATIONS)
+def test_translate_sql(mysql, sqlite, write):
+    translated, is_write = translate_sql(mysql)
+    assert _normalize(translated) == sqlite
+    assert is_write is write
+
+
+def test_translate_sql_rejects_unknown_timestampdiff_unit():
+    with pytest.raises(ValueError):
+        translate_sql("SELECT TIMESTAMPDIFF(MICROSECOND, a, b) FROM t")
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = SQLiteConnection(str(tmp_path / "t.sqlite3"))
+    conn.raw().executescript(
+        """
+        CREATE TABLE tb27_letter_item (
+            uid INTEGER, sid TEXT, round_number INTEGER, item_index INTEGER,
+            response TEXT, client_ts_ms INTEGER, updated_at TEXT,
+            UNIQUE (uid, sid, round_number, item_index)
+        );
+        CREATE TABLE output1_url (
+            op1ID INTEGER PRIMARY KEY AUTOINCREMENT, sid TEXT, uid INTEGER,
+            unixTime INTEGER, pageTypeID TEXT, time_interval INTEGER
+        );
+        """
+    )
+    yield conn
+    conn.close()
+
+
+def test_letter_upsert_keeps_the_newer_choice(conn):
+    cursor = conn.cursor()
+    cursor.execute(LETTER_UPSERT, (1, "s", 1, 0, "S", 200, 1, "s", 1, 1, "D", 200))
+    # A stale batch for item 0 and a newer one for item 1 arrive together.
+    cursor.execute(LETTER_UPSERT, (1, "s", 1, 0, "D", 100, 1, "s", 1, 1, "S", 300))
+    conn.commit()
+    cursor.execute("SELECT item_index, response, client_ts_ms FROM tb27_letter_item ORDER BY item_index")
+    assert cursor.fetchall() == [(0, "S", 200), (1, "S", 300)]
+
+
+def test_page_view_update_touches_only_the_latest_row(conn):
+    cursor = conn.cursor()
+    for _ in range(2):
+        cursor.execute(
+            "INSERT INTO output1_url (sid, uid, unixTime, pageTypeID) VALUES (%s, %s, %s, %s)", ("s", 1, 10, "B")
+        )
+    cursor.execute(PAGE_VIEW_UPDATE, (7, "s", 1, 10, "B"))
+    assert cursor.rowcount == 1
+    cursor.execute("SELECT op1ID, time_interval FROM output1_url ORDER BY op1ID")
+    assert cursor.fetchall() == [(1, None), (2, 7)]
+
+
+def test_savepoint_outside_a_transaction_takes_no_write_lock(conn):
+    cursor = conn.cursor()
+    cursor.execute("SAVEPOINT uow_committed")
+    cursor.execute("SELECT COUNT(*) FROM output1_url")
+    assert not conn.raw().in_transaction
+    cursor.execute("ROLLBACK TO SAVEPOINT uow_committed")
+    assert not conn.raw().in_transaction
+
+    # The savepoint is set at the first write, so ROLLBACK TO still undoes it.
+    cursor.execute("INSERT INTO output1_url (sid) VALUES (%s)", ("a",))
+    assert conn.raw().in_transaction
+    cursor.execute("SAVEPOINT uow_committed")
+    cursor.execute("INSERT INTO output1_url (sid) VALUES (%s)", ("b",))
+    cursor.execute("ROLLBACK TO SAVEPOINT uow_committed")
+    conn.commit()
+    cursor.execute("SELECT sid FROM output1_url")
+    assert cursor.fetchall() == [("a",)]
+
+
+def test_savepoint_before_the_first_write_is_kept(conn):
+    cursor = conn.cursor()
+    cursor.execute("SAVEPOINT uow_committed")
+    cursor.execute("INSERT INTO output1_url (sid) VALUES (%s)", ("a",))
+    cursor.execute("ROLLBACK TO SAVEPOINT uow_committed")
+    conn.commit()
+    cursor.execute("SELECT COUNT(*) FROM output1_url")
+    assert cursor.fetchone() == (0,)
+
+
+def test_read_only_request_leaves_no_transaction_open(app):
+    from src.db import get_db_connection
+
+    with app.test_request_context("/"):
+        link = get_db_connection()
+        cursor = link.cursor()
+        cursor.execute("SELECT COUNT(*) FROM tb4_passage")
+        link.commit()
+        assert not link.raw().in_transaction
+
+
+def test_full_study_flow(app):
+    """One virtual participant from consent to /done against a live server."""
+    sys.path.insert(0, SCRIPTS)
+    import loadtest
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        args = loadtest.parse_args(
+            [
+                "--base-url", f"http://127.0.0.1:{server.server_port}",
+                "--participants", "1",
+                "--think-time", "0",
+                "--think-jitter", "0",
+                "--passages", "1",
+                "--sid-base", "4242",
+                "--seed", "1",
+            ]
+        )
+        recorder = loadtest.Recorder()
+        loadtest.Participant(args, 0, recorder).run()
+    finally:
+        server.shutdown()
+        thread.join()
+
+    rows = loadtest.summarize(recorder, 1.0)
+    assert sum(row["errors"] for row in rows) == 0
+    assert any(row["endpoint"].endswith("/done") for row in rows)
+
+    from src.db import flush_page_log, get_pool
+
+    with app.app_context():
+        flush_page_log()
+    conn = get_pool(app).acquire()
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT uid FROM tb1_user WHERE sid=%s", ("4242",))
+        uid = cursor.fetchone()["uid"]
+        cursor.execute("SELECT COUNT(*) AS n FROM tb5_passQop WHERE uid=%s AND c1Ans IS NOT NULL", (uid,))
+        assert cursor.fetchone()["n"] > 0
+        cursor.execute("SELECT COUNT(*) AS n FROM tb27_letter_item WHERE uid=%s", (uid,))
+        assert cursor.fetchone()["n"] > 0
+        cursor.execute("SELECT COUNT(*) AS n FROM output1_url WHERE uid=%s AND pageTypeID='DONE'", (uid,))
+        assert cursor.fetchone()["n"] == 1
+    finally:
+        get_pool(app).release(conn)
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import pytest
+
+
+TOKEN = "s3cret"
+ENDPOINTS = ["/metrics", "/metrics/queries", "/url_log_stats"]
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_stats_endpoints_are_off_by_default(app, client, path):
+    assert not app.config["STATS_ENDPOINTS_ENABLED"]
+    assert client.get(path).status_code == 404
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_stats_endpoints_open_when_enabled(app, client, path):
+    app.config["STATS_ENDPOINTS_ENABLED"] = True
+    assert client.get(path).status_code == 200
+
+
+@pytest.mark.parametrize("path", ENDPOINTS)
+def test_stats_token_is_required_when_set(app, client, path):
+    app.config.update(STATS_ENDPOINTS_ENABLED=True, STATS_TOKEN=TOKEN)
+    assert client.get(path).status_code == 403
+    assert client.get(path, headers={"X-Stats-Token": "wrong"}).status_code == 403
+    assert client.get(path, headers={"X-Stats-Token": TOKEN}).status_code == 200
+
+
+def test_metrics_still_recorded_while_hidden(app, client):
+    client.get("/metrics")
+    app.config["STATS_ENDPOINTS_ENABLED"] = True
+    assert "cogsearch_requests_total" in client.get("/metrics").get_data(as_text=True)
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import pytest
+
+from src.db import get_db_connection
+
+
+@pytest.fixture
+def client(app, run_sql):
+    run_sql("CREATE TABLE uow_probe (name VARCHAR(20))")
+    app.extensions["rolled_back"] = rolled_back = []
+
+    def write(name):
+        link = get_db_connection()
+        cursor = link.cursor()
+        cursor.execute("INSERT INTO uow_probe (name) VALUES (%s)", (name,))
+        cursor.close()
+        link.on_rollback(lambda: rolled_back.append(name))
+        return link
+
+    @app.route("/test/savepoints/<int:status>")
+    def savepoints(status):
+        write("kept").commit()
+        write("undone").rollback()
+        write("trailing")
+        return "", status
+
+    @app.route("/test/fail")
+    def fail():
+        write("first").commit()
+        write("second").commit()
+        return "", 500
+
+    @app.route("/test/raise")
+    def crash():
+        write("first").commit()
+        raise RuntimeError("boom")
+
+    return app.test_client()
+
+
+def stored(run_sql) -> list:
+    return [row["name"] for row in run_sql("SELECT name FROM uow_probe")]
+
+
+@pytest.mark.parametrize("status", [200, 400])
+def test_commit_and_rollback_become_savepoints(app, client, run_sql, status):
+    assert client.get(f"/test/savepoints/{status}").status_code == status
+    # commit() kept "kept", rollback() undid "undone" and the uncommitted
+    # "trailing" write was dropped when the request completed.
+    assert stored(run_sql) == ["kept"]
+    assert app.extensions["rolled_back"] == ["undone", "trailing"]
+
+
+def test_server_error_rolls_back_the_whole_request(app, client, run_sql):
+    assert client.get("/test/fail").status_code == 500
+    assert stored(run_sql) == []
+    assert app.extensions["rolled_back"] == ["first", "second"]
+
+
+def test_unhandled_exception_rolls_back_at_teardown(app, client, run_sql):
+    with pytest.raises(RuntimeError):
+        client.get("/test/raise")
+    assert stored(run_sql) == []
+    assert app.extensions["rolled_back"] == ["first"]
+
+
+def test_without_unit_of_work_commits_are_immediate(app, client, run_sql):
+    app.config["DB_UNIT_OF_WORK"] = False
+    assert client.get("/test/fail").status_code == 500
+    assert stored(run_sql) == ["first", "second"]
+    assert app.extensions["rolled_back"] == []
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from src.services import url_logger
+from src.services.url_logger import PageViewLogger
+
+
+WRITER_THREAD = "page-view-logger"
+
+
+class FakeDatabase:
+    """Records each batch handed to `write_page_views`; can hold the writer thread."""
+
+    def __init__(self, monkeypatch):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.writer_waiting = threading.Event()
+        self.released = []
+        monkeypatch.setattr(url_logger, "write_page_views", self.write)
+
+    def acquire(self):
+        if threading.current_thread().name == WRITER_THREAD and not self.gate.is_set():
+            self.writer_waiting.set()
+            self.gate.wait(5)
+        return object()
+
+    def release(self, conn, discard=False):
+        self.released.append(discard)
+
+    def write(self, conn, views):
+        self.batches.append((threading.current_thread().name, [row[0] for row, _ in views]))
+
+    def rows(self):
+        return [row for _, batch in self.batches for row in batch]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    return FakeDatabase(monkeypatch)
+
+
+@pytest.fixture
+def make_logger(db):
+    loggers = []
+
+    def make(**kwargs):
+        logger = PageViewLogger(db.acquire, db.release, **kwargs)
+        loggers.append(logger)
+        return logger
+
+    yield make
+    db.gate.set()
+    for logger in loggers:
+        logger.stop(timeout=5)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def stall_writer(db, logger):
+    """Leave the writer stuck on row 1 so the (one-slot) queue can be filled."""
+    db.gate.clear()
+    assert logger.log((1,))
+    assert db.writer_waiting.wait(5)
+    assert logger.log((2,))
+
+
+def test_full_batch_is_written_at_once(db, make_logger):
+    logger = make_logger(batch_size=3, flush_interval=60)
+    for n in range(1, 4):
+        assert logger.log((n,))
+    wait_for(lambda: db.batches)
+    assert db.batches == [(WRITER_THREAD, [1, 2, 3])]
+    assert logger.stats()["written"] == 3 and logger.stats()["flushes"] == 1
+    assert db.released == [False]
+
+
+def test_partial_batch_is_written_after_flush_interval(db, make_logger):
+    logger = make_logger(batch_size=100, flush_interval=0.05)
+    logger.log((1,))
+    logger.log((2,))
+    wait_for(lambda: db.batches)
+    assert db.rows() == [1, 2]
+
+
+def test_flush_writes_pending_rows(db, make_logger):
+    logger = make_logger(batch_size=100, flush_interval=60)
+    logger.log((1,))
+    assert logger.flush()
+    assert db.rows() == [1]
+    assert logger.stats()["queue_depth"] == 0
+
+
+def test_failed_write_is_retried_on_a_fresh_connection(db, make_logger, monkeypatch):
+    calls = []
+
+    def flaky(conn, views):
+        calls.append(conn)
+        if len(calls) == 1:
+            raise RuntimeError("server has gone away")
+        db.write(conn, views)
+
+    monkeypatch.setattr(url_logger, "write_page_views", flaky)
+    logger = make_logger(batch_size=1)
+    logger.log((1,))
+    assert logger.flush()
+    assert db.rows() == [1] and db.released == [True, False]
+    assert logger.stats()["failed"] == 0
+
+
+def test_block_policy_waits_for_room(db, make_logger):
+    logger = make_logger(batch_size=1, max_queue=1, full_policy="block", block_timeout=5)
+    stall_writer(db, logger)
+    threading.Timer(0.05, db.gate.set).start()
+    assert logger.log((3,))
+    assert logger.flush()
+    assert db.rows() == [1, 2, 3]
+    assert logger.stats()["dropped"] == 0
+
+
+def test_block_policy_drops_after_timeout(db, make_logger):
+    logger = make_logger(batch_size=1, max_queue=1, full_policy="block", block_timeout=0.05)
+    stall_writer(db, logger)
+    assert not logger.log((3,))
+    db.gate.set()
+    assert logger.flush()
+    assert db.rows() == [1, 2]
+    assert logger.stats()["dropped"] == 1
+
+
+def test_drop_newest_policy_rejects_the_new_row(db, make_logger):
+    logger = make_logger(batch_size=1, max_queue=1, full_policy="drop_newest")
+    stall_writer(db, logger)
+    assert not logger.log((3,))
+    db.gate.set()
+    assert logger.flush()
+    assert db.rows() == [1, 2]
+    assert logger.stats()["dropped"] == 1 and logger.stats()["enqueued"] == 2
+
+
+def test_drop_oldest_policy_evicts_the_queued_row(db, make_logger):
+    logger = make_logger(batch_size=1, max_queue=1, full_policy="drop_oldest")
+    stall_writer(db, logger)
+    assert logger.log((3,))
+    db.gate.set()
+    assert logger.flush()
+    assert db.rows() == [1, 3]
+    assert logger.stats()["dropped"] == 1 and logger.stats()["enqueued"] == 3
+
+
+def test_sync_policy_writes_on_the_caller_thread(db, make_logger):
+    logger = make_logger(batch_size=1, max_queue=1, full_policy="sync")
+    stall_writer(db, logger)
+    assert logger.log((3,))
+    assert db.batches == [(threading.current_thread().name, [3])]
+    db.gate.set()
+    assert logger.flush()
+    assert sorted(db.rows()) == [1, 2, 3]
+    assert logger.stats()["dropped"] == 0
+
+
+def test_unknown_policy_is_rejected(db):
+    with pytest.raises(ValueError):
+        PageViewLogger(db.acquire, db.release, full_policy="ignore")
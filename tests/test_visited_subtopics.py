@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import pytest
+from flask import Flask, session
+
+from src.services.utils import (
+    VisitedSubtopics,
+    load_visited_subtopics,
+    save_visited_subtopics,
+    subtopic_bit,
+    subtopic_mask,
+)
+
+
+@pytest.fixture
+def request_context():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    with app.test_request_context("/"):
+        yield
+
+
+@pytest.mark.parametrize(
+    "subtop_id, bit",
+    [(0, 1), (1, 2), ("3", 8), (" 4 ", 16), ("", 0), ("x", 0), (None, 0), ("-1", 0)],
+)
+def test_subtopic_bit(subtop_id, bit):
+    assert subtopic_bit(subtop_id) == bit
+
+
+def test_membership_accepts_int_and_str_ids():
+    visited = VisitedSubtopics()
+    assert not visited
+    visited.add("2")
+    visited.add(5)
+    visited.add(2)
+    assert 2 in visited and "2" in visited and "5" in visited
+    assert 3 not in visited and "" not in visited
+    assert len(visited) == 2
+    assert list(visited) == ["2", "5"]
+
+
+def test_iterates_in_numeric_order():
+    assert list(VisitedSubtopics(subtopic_mask(["10", "2", "1"]))) == ["1", "2", "10"]
+
+
+def test_covers():
+    full = subtopic_mask(["1", "2", "3"])
+    visited = VisitedSubtopics(subtopic_mask(["1", "3"]))
+    assert not visited.covers(full)
+    visited.add(2)
+    assert visited.covers(full)
+    # Extra subtopics do not matter, an empty full mask is never covered.
+    visited.add(7)
+    assert visited.covers(full)
+    assert not visited.covers(0)
+
+
+def test_legacy_visited_sub_is_converted_once(request_context):
+    session["visitedSub"] = "1,3,12"
+    visited = load_visited_subtopics()
+    assert list(visited) == ["1", "3", "12"]
+    assert "visitedSub" not in session
+    assert session["visitedMask"] == subtopic_mask(["1", "3", "12"])
+
+    # A stale legacy value written later is ignored once the mask exists.
+    session["visitedSub"] = "4"
+    assert list(load_visited_subtopics()) == ["1", "3", "12"]
+
+
+def test_empty_session_starts_empty(request_context):
+    visited = load_visited_subtopics()
+    assert not visited
+    assert session["visitedMask"] == 0
+
+
+def test_save_round_trip(request_context):
+    visited = load_visited_subtopics()
+    visited.add("6")
+    save_visited_subtopics(visited)
+    assert list(load_visited_subtopics()) == ["6"]